@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+DAG Executor v1.0 para SWARM Coordinator
+Ejecuta las subtareas del plan respetando depends_on
+
+Las tareas independientes (ej: Research cloud + Qwen local) corren en paralelo
+sobre un pool acotado de workers; cada dependiente arranca en cuanto terminan
+todas sus dependencias, sin esperar al resto del plan.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class DAGExecutor:
+    """
+    Scheduler de subtareas basado en el grafo depends_on
+
+    Funciona con cualquier objeto que tenga `id` y `depends_on`
+    (SubTask de coordinator_swarm, coordinator_swarm_enhanced y v2).
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, max_workers)
+
+    def topological_order(self, tasks: List[Any]) -> List[str]:
+        """
+        Valida el plan y retorna un orden topológico de IDs
+
+        Raises:
+            ValueError: IDs duplicados, dependencias inexistentes o ciclos
+        """
+        ids = [t.id for t in tasks]
+        if len(ids) != len(set(ids)):
+            raise ValueError(f"IDs de subtarea duplicados en el plan: {ids}")
+
+        known = set(ids)
+        for task in tasks:
+            missing = [d for d in task.depends_on if d not in known]
+            if missing:
+                raise ValueError(f"{task.id} depende de tareas inexistentes: {missing}")
+
+        # Kahn: respeta el orden original del plan entre tareas independientes
+        in_degree = {t.id: len(set(t.depends_on)) for t in tasks}
+        dependents = self._dependents(tasks)
+        ready = [t.id for t in tasks if in_degree[t.id] == 0]
+        order = []
+        while ready:
+            task_id = ready.pop(0)
+            order.append(task_id)
+            for child in dependents[task_id]:
+                in_degree[child] -= 1
+                if in_degree[child] == 0:
+                    ready.append(child)
+
+        if len(order) != len(tasks):
+            cyclic = [tid for tid in ids if tid not in order]
+            raise ValueError(f"Ciclo de dependencias en el plan: {cyclic}")
+        return order
+
+    def run(self, tasks: List[Any], execute_fn: Callable[[Any], Any]) -> Dict[str, Any]:
+        """
+        Ejecuta el plan completo
+
+        Args:
+            tasks: Subtareas del plan
+            execute_fn: Función que ejecuta una subtarea y retorna su resultado
+
+        Returns:
+            Dict task_id -> resultado, en el orden original del plan
+        """
+        self.topological_order(tasks)
+
+        by_id = {t.id: t for t in tasks}
+        waiting_on = {t.id: set(t.depends_on) for t in tasks}
+        dependents = self._dependents(tasks)
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="swarm-dag") as pool:
+            running = {}
+
+            def submit(task_ids: List[str]):
+                for task_id in task_ids:
+                    running[pool.submit(execute_fn, by_id[task_id])] = task_id
+
+            submit([t.id for t in tasks if not waiting_on[t.id]])
+
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    try:
+                        results[task_id] = future.result()
+                    except Exception:
+                        # No lanzar más trabajo si una subtarea falla
+                        for pending in running:
+                            pending.cancel()
+                        raise
+
+                    ready = []
+                    for child in dependents[task_id]:
+                        waiting_on[child].discard(task_id)
+                        if not waiting_on[child]:
+                            ready.append(child)
+                    submit(ready)
+
+        return {t.id: results[t.id] for t in tasks}
+
+    async def arun(self, tasks: List[Any],
+                   execute_fn: Callable[[Any], Awaitable[Any]]) -> Dict[str, Any]:
+        """
+        Versión asyncio de run(): execute_fn es una corutina por subtarea
+
+        max_workers limita cuántas subtareas corren a la vez en el event loop.
+        """
+        order = self.topological_order(tasks)
+        by_id = {t.id: t for t in tasks}
+        semaphore = asyncio.Semaphore(self.max_workers)
+        futures = {}
+
+        async def run_task(task):
+            if task.depends_on:
+                await asyncio.gather(*(futures[dep] for dep in set(task.depends_on)))
+            async with semaphore:
+                return await execute_fn(task)
+
+        for task_id in order:
+            futures[task_id] = asyncio.ensure_future(run_task(by_id[task_id]))
+
+        try:
+            await asyncio.gather(*futures.values())
+        except BaseException:
+            for future in futures.values():
+                future.cancel()
+            raise
+
+        return {t.id: futures[t.id].result() for t in tasks}
+
+    @staticmethod
+    def _dependents(tasks: List[Any]) -> Dict[str, List[str]]:
+        """Grafo inverso: task_id -> tareas que dependen de ella"""
+        dependents = {t.id: [] for t in tasks}
+        for task in tasks:
+            for dep in set(task.depends_on):
+                dependents[dep].append(task.id)
+        return dependents
@@ -2,63 +2,188 @@
 """
 RAG Plugin v2.0 — Optimized for speed and accuracy
 Improvements: Faster queries, better context windows, caching
+
+- Result cache: LRU + TTL, keyed by (source, normalized query, top_k)
+- Embedding cache: LRU of query embeddings, keyed by normalized text
+- Invalidation: results are dropped when LumenMemory.index_version changes
+  (a stamp file in persist_dir, so writes from other processes count too)
 """
 
-import json
+import sys
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Optional
-import hashlib
+from typing import Any, List, Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+try:
+    from memory_system import LumenMemory
+    MEMORY_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Memory system no disponible: {e}")
+    MEMORY_AVAILABLE = False
+
+
+def normalize_query(query: str) -> str:
+    """Case/whitespace-insensitive cache key ("How do I  restart Qwen" == "how do i restart qwen")"""
+    return " ".join(query.lower().split())
+
 
 class OptimizedRAG:
     """RAG with query caching and performance optimization"""
-    
-    def __init__(self, cache_size=100):
-        self.cache = {}
+
+    def __init__(self, cache_size=100, ttl: float = 300.0, embedding_cache_size: int = 512,
+                 memory: Optional[Any] = None, memory_dir: str = "./memory_db"):
+        self.cache: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
         self.cache_size = cache_size
+        self.ttl = ttl
+        self.embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.embedding_cache_size = embedding_cache_size
         self.query_times = []
-        
-    def search_with_cache(self, query: str, top_k: int = 3) -> List[Dict]:
-        """Search with query result caching"""
-        # Cache key
-        cache_key = hashlib.md5(f"{query}:{top_k}".encode()).hexdigest()
-        
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                         "invalidations": 0, "embedding_hits": 0, "embedding_misses": 0}
+
+        self.memory = memory
+        self.memory_dir = memory_dir
+        # Seeded from the injected memory so the first search is cacheable
+        self._index_version = getattr(memory, "index_version", None)
+        self._lock = threading.Lock()
+
+    def search_with_cache(self, query: str, top_k: int = 3, source: str = "skills") -> List[Dict]:
+        """
+        Search with query result caching
+
+        Args:
+            query: Search text
+            top_k: Number of documents to return
+            source: 'skills' or 'conversations'
+        """
+        key = (source, normalize_query(query), top_k)
+
         # Check cache
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
+        with self._lock:
+            self._check_index_version()
+            entry = self.cache.get(key)
+            if entry is not None:
+                expires_at, results = entry
+                if time.monotonic() < expires_at:
+                    self.cache.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return results
+                del self.cache[key]
+                self.counters["expirations"] += 1
+            self.counters["misses"] += 1
+
         # Perform search
         start = time.time()
-        results = self._perform_search(query, top_k)
+        results = self._perform_search(query, top_k, source)
+        failed = results is None
+        if failed:
+            results = []
         elapsed = time.time() - start
-        
-        # Store timing
-        self.query_times.append(elapsed)
-        if len(self.query_times) > 100:
-            self.query_times = self.query_times[-50:]
-        
-        # Cache result
-        if len(self.cache) < self.cache_size:
-            self.cache[cache_key] = results
-        
+
+        with self._lock:
+            # Store timing
+            self.query_times.append(elapsed)
+            if len(self.query_times) > 100:
+                self.query_times = self.query_times[-50:]
+
+            # Cache result (skip failed searches and index changes while searching)
+            if not self._check_index_version() and not failed:
+                self.cache[key] = (time.monotonic() + self.ttl, results)
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+                    self.counters["evictions"] += 1
+
         return results
-    
-    def _perform_search(self, query: str, top_k: int) -> List[Dict]:
-        """Actual search implementation (placeholder for ChromaDB integration)"""
-        # This would integrate with your existing memory_system.py
-        # For now, optimized structure ready for connection
+
+    def embed(self, query: str) -> List[float]:
+        """Query embedding, cached by normalized text"""
+        key = normalize_query(query)
+        with self._lock:
+            embedding = self.embeddings.get(key)
+            if embedding is not None:
+                self.embeddings.move_to_end(key)
+                self.counters["embedding_hits"] += 1
+                return embedding
+            self.counters["embedding_misses"] += 1
+
+        embedding = self._get_memory().embed_query(query)
+
+        with self._lock:
+            self.embeddings[key] = embedding
+            while len(self.embeddings) > self.embedding_cache_size:
+                self.embeddings.popitem(last=False)
+        return embedding
+
+    def invalidate(self):
+        """Drop all cached results (embeddings stay valid: same model)"""
+        with self._lock:
+            self.cache.clear()
+            self.counters["invalidations"] += 1
+
+    def _check_index_version(self) -> bool:
+        """Clear results if the memory index was written since they were cached (lock held)"""
+        version = getattr(self.memory, "index_version", None)
+        if version == self._index_version:
+            return False
+        self._index_version = version
+        if self.cache:
+            self.cache.clear()
+            self.counters["invalidations"] += 1
+        return True
+
+    def _get_memory(self):
+        if self.memory is None:
+            if not MEMORY_AVAILABLE:
+                raise RuntimeError("memory_system no disponible")
+            memory = LumenMemory(persist_dir=self.memory_dir)
+            with self._lock:
+                self._index_version = memory.index_version
+            self.memory = memory
+        return self.memory
+
+    def _perform_search(self, query: str, top_k: int, source: str = "skills") -> Optional[List[Dict]]:
+        """Search LumenMemory, reusing the cached query embedding (None if the search failed)"""
+        try:
+            memory = self._get_memory()
+            embedding = self.embed(query)
+            if source == "conversations":
+                hits = memory.search_conversations(query, n_results=top_k, query_embedding=embedding)
+            else:
+                hits = memory.search_skills(query, n_results=top_k, query_embedding=embedding)
+        except Exception as e:
+            print(f"⚠️ RAG search failed: {e}")
+            return None
+
+        if source == "conversations":
+            return [
+                {"content": h["content"], "score": h["score"], "source": "conversations",
+                 "id": h["id"], "session_id": h.get("session_id")}
+                for h in hits
+            ]
+
         return [
-            {"content": f"Result for: {query}", "score": 0.95, "source": "optimized_rag"}
+            {"content": h["content"], "score": h["score"], "source": "skills",
+             "id": h["id"], "name": h["name"]}
+            for h in hits
         ]
-    
+
     def get_stats(self) -> Dict:
         """Performance statistics"""
         if not self.query_times:
-            return {"avg_latency": 0, "queries": 0}
+            return {"avg_latency": 0, "queries": 0, "cache_size": len(self.cache), **self.counters}
+        lookups = self.counters["hits"] + self.counters["misses"]
         return {
             "avg_latency_ms": sum(self.query_times) / len(self.query_times) * 1000,
             "queries": len(self.query_times),
-            "cache_size": len(self.cache)
+            "cache_size": len(self.cache),
+            "embedding_cache_size": len(self.embeddings),
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            **self.counters
         }
 
 # Singleton instance
@@ -19,6 +19,8 @@ except ImportError as e:
     print(f"⚠️ Memory system no disponible: {e}")
     MEMORY_AVAILABLE = False
 
+from memory_semantic_cache import SemanticCache
+
 
 class CoordinatorRAGPlugin:
     """
@@ -26,11 +28,17 @@ class CoordinatorRAGPlugin:
     Consulta memoria vectorial antes de procesar tareas
     """
     
-    def __init__(self, memory_dir: str = "./memory_db", auto_init: bool = False):
+    def __init__(self, memory_dir: str = "./memory_db", auto_init: bool = False,
+                 semantic_threshold: float = 0.92, semantic_cache_size: int = 256):
         self.memory = None
         self.memory_dir = memory_dir
         self.available = False
         
+        # Paráfrasis de queries recientes reutilizan su retrieval (sin ChromaDB)
+        self.semantic_cache = SemanticCache(threshold=semantic_threshold,
+                                            max_entries=semantic_cache_size)
+        self._index_version = None
+        
         if auto_init and MEMORY_AVAILABLE:
             self._init_memory()
     
@@ -45,10 +53,14 @@ class CoordinatorRAGPlugin:
             print(f"⚠️ RAG init failed: {e}")
             self.available = False
     
-    def enrich_task_with_context(self, task: str, context_type: str = "skills") -> Dict:
+    def enrich_task_with_context(self, task: str, context_type: str = "skills",
+                                 query_embedding: Optional[List[float]] = None) -> Dict:
         """
         Enriquecer una tarea con contexto recuperado de la memoria
         
+        Args:
+            query_embedding: embedding ya calculado (ej: por el routing semántico)
+        
         Returns:
             Dict con task original, contexto recuperado, y task mejorada
         """
@@ -63,8 +75,8 @@ class CoordinatorRAGPlugin:
             }
         
         try:
-            # Hacer RAG query
-            rag_result = self.memory.rag_query(task, context_type=context_type)
+            # Hacer RAG query (o reutilizar la de una query casi idéntica)
+            rag_result, similarity = self._cached_rag_query(task, context_type, query_embedding)
             
             # Solo usar contexto si hay sources relevantes
             if rag_result['sources']:
@@ -75,7 +87,8 @@ class CoordinatorRAGPlugin:
                     "sources": rag_result['sources'],
                     "enriched_task": enriched,
                     "rag_applied": True,
-                    "confidence": self._estimate_confidence(rag_result)
+                    "confidence": self._estimate_confidence(rag_result),
+                    "cache_similarity": similarity
                 }
             else:
                 return {
@@ -97,6 +110,30 @@ class CoordinatorRAGPlugin:
                 "reason": f"RAG error: {str(e)}"
             }
     
+    def _cached_rag_query(self, task: str, context_type: str,
+                          query_embedding: Optional[List[float]] = None):
+        """
+        rag_query con cache semántico
+        
+        Returns:
+            (rag_result, similitud con la query cacheada o None si fue miss)
+        """
+        # El cache no sobrevive a escrituras en el índice
+        version = getattr(self.memory, "index_version", None)
+        if version != self._index_version:
+            self.semantic_cache.clear()
+            self._index_version = version
+        
+        embedding = query_embedding if query_embedding is not None else self.memory.embed_query(task)
+        cached = self.semantic_cache.lookup(embedding, namespace=context_type)
+        if cached is not None:
+            return cached
+        
+        rag_result = self.memory.rag_query(task, context_type=context_type,
+                                           query_embedding=embedding)
+        self.semantic_cache.add(embedding, rag_result, namespace=context_type)
+        return rag_result, None
+    
     def _build_enriched_task(self, task: str, rag_result: Dict) -> str:
         """Construir tarea enriquecida con contexto"""
         context = rag_result['context']
@@ -140,20 +177,32 @@ INSTRUCCIONES:
         if self.available and self.memory:
             return {
                 "available": True,
+                "semantic_cache": self.semantic_cache.stats(),
                 **self.memory.stats()
             }
         return {"available": False, "reason": "Memory not initialized"}
 
 
 # Función de conveniencia para integración
+# Plugins por memory_dir: reutilizar modelo y DB entre llamadas
+_plugins: Dict[str, CoordinatorRAGPlugin] = {}
+
+
+def get_plugin(memory_dir: str = "./memory_db") -> CoordinatorRAGPlugin:
+    """Singleton de CoordinatorRAGPlugin por memory_dir"""
+    if memory_dir not in _plugins:
+        _plugins[memory_dir] = CoordinatorRAGPlugin(memory_dir=memory_dir, auto_init=True)
+    return _plugins[memory_dir]
+
+
 def enrich_with_rag(task: str, context_type: str = "skills", 
-                     memory_dir: str = "./memory_db") -> Dict:
+                     memory_dir: str = "./memory_db",
+                     query_embedding: Optional[List[float]] = None) -> Dict:
     """
     Función simple para enriquecer una tarea con RAG
     Usar desde el coordinator
     """
-    plugin = CoordinatorRAGPlugin(memory_dir=memory_dir, auto_init=True)
-    return plugin.enrich_task_with_context(task, context_type)
+    return get_plugin(memory_dir).enrich_task_with_context(task, context_type, query_embedding)
 
 
 # Demo
@@ -6,16 +6,23 @@ Arquitectura: Kimi Cerebro (Cloud) + Qwen Agente (Local 20GB VRAM) + Auto-Tool S
 Plugin integration: Detecta automáticamente qué tools usar por tarea
 """
 
-import json
+import asyncio
 import subprocess
 import sys
-from typing import Dict, List, Any, Literal
+import time
+from typing import Dict, List, Any, Literal, AsyncIterator, Callable, Optional
 from dataclasses import dataclass
 from enum import Enum
 
 # Tool plugin integration
 sys.path.insert(0, '/home/lumen/.openclaw/workspace')
 from coordinator_tool_plugin import CoordinatorToolPlugin
+from coordinator_dag import DAGExecutor
+from ollama_client import OllamaError, get_client, get_async_client
+from model_scheduler import estimate_tokens, get_scheduler
+from job_queue import JobRejected, Priority, get_job_queue
+from prompt_prefix import SplitPrompt
+from tool_router import log_routing_outcome
 
 class AgentType(Enum):
     """Tipos de agentes disponibles en el SWARM"""
@@ -37,6 +44,7 @@ class SubTask:
     depends_on: List[str] = None
     required_tools: List[str] = None
     tool_instructions: str = ""
+    priority: Priority = Priority.INTERACTIVE  # Turno en la cola de modelos
     
     def __post_init__(self):
         if self.depends_on is None:
@@ -62,10 +70,24 @@ class SWARMCoordinator:
         AgentType.VISION: "vision_api",
     }
     
-    def __init__(self, tool_plugin_enabled: bool = True):
+    # Alternativas si el preferido está sobrecargado, descargado o es muy lento
+    AGENT_FALLBACKS = {
+        AgentType.COORDINATOR: ["ollama/qwen2.5:32b"],
+        AgentType.CODE_LOCAL: ["ollama/kimi-k2.5:cloud"],
+        AgentType.RESEARCH: ["ollama/kimi-k2.5:cloud"],
+        AgentType.CODE_REVIEW: ["ollama/kimi-k2.5:cloud"],
+    }
+    
+    def __init__(self, tool_plugin_enabled: bool = True, max_workers: int = 4,
+                 budget_per_task: Optional[float] = None, routing_log: Optional[str] = None):
         self.session_history = []
         self.tool_plugin = CoordinatorToolPlugin(self) if tool_plugin_enabled else None
         self.use_enhanced = tool_plugin_enabled
+        self.dag_executor = DAGExecutor(max_workers=max_workers)
+        self.scheduler = get_scheduler()
+        self.job_queue = get_job_queue()
+        self.budget_per_task = budget_per_task  # USD máximo por subtarea (None = sin límite)
+        self.routing_log = routing_log  # JSONL para entrenar tool_router (None = sin log)
         
     def analyze_request(self, user_request: str) -> Dict[str, Any]:
         """
@@ -195,43 +217,33 @@ class SWARMCoordinator:
         """
         Fase 3: Ejecutar subtarea en el agente asignado
         """
-        model = self.AGENT_MODELS[task.agent_type]
-        
         # Construir prompt según el agente
         prompt = self._build_agent_prompt(task)
-        
-        # Ejecutar según el modelo
+        model = self.select_model(task, prompt)
+        return self._dispatch(task, model, prompt)
+    
+    def _dispatch(self, task: SubTask, model: str, prompt: SplitPrompt) -> str:
+        """Ejecutar el prompt en el modelo elegido"""
         if model == "vision_api":
             return self._call_vision_api(task)
         elif "ollama/" in model:
-            return self._call_ollama(model, prompt, task.max_tokens)
+            return self._call_ollama(model, prompt, task.max_tokens, task.priority)
         elif "anthropic/" in model:
-            return self._call_claude(prompt, task.max_tokens)
+            return self._call_claude(str(prompt), task.max_tokens)
         else:
             return f"Error: Modelo no soportado: {model}"
     
-    def _build_agent_prompt(self, task: SubTask) -> str:
-        """Construir prompt específico para cada tipo de agente"""
-        prompts = {
-            AgentType.CODE_LOCAL: f"""
-Actúa como un generador de código Python eficiente.
-
-TAREA: {task.description}
+    # Preámbulo estático por agente: va como `system` y Ollama reutiliza su KV cache
+    AGENT_PREFIXES = {
+        AgentType.CODE_LOCAL: """Actúa como un generador de código Python eficiente.
 
 REQUISITOS:
 - Type hints obligatorios
 - Docstrings completas
 - Funciones pequeñas y claras
 - Manejo básico de errores con try/except
-- Solo devuelve el código, sin explicaciones
-
-FORMATO SALIDA:
-{task.output_format}
-""",
-            AgentType.RESEARCH: f"""
-Eres un investigador experto en arquitectura de software y mejores prácticas.
-
-CONSULTA: {task.description}
+- Solo devuelve el código, sin explicaciones""",
+        AgentType.RESEARCH: """Eres un investigador experto en arquitectura de software y mejores prácticas.
 
 Realiza una búsqueda exhaustiva y proporciona:
 1. Resumen de findings principales
@@ -239,12 +251,8 @@ Realiza una búsqueda exhaustiva y proporciona:
 3. Best practices específicas aplicables
 4. Recomendaciones de implementación
 
-FORMATO: JSON estructurado con campos: summary, sources, best_practices, recommendations
-""",
-            AgentType.CODE_REVIEW: f"""
-Eres un reviewer senior de código Python.
-
-CÓDIGO A REVISAR: {task.description}
+FORMATO: JSON estructurado con campos: summary, sources, best_practices, recommendations""",
+        AgentType.CODE_REVIEW: """Eres un reviewer senior de código Python.
 
 CRITERIOS DE REVISIÓN:
 1. Type hints presentes y correctos
@@ -256,38 +264,124 @@ CRITERIOS DE REVISIÓN:
 SALIDA:
 - Código revisado y mejorado
 - Lista de cambios realizados
-- Ejemplo de uso si aplica
-"""
-        }
-        return prompts.get(task.agent_type, task.description)
+- Ejemplo de uso si aplica""",
+    }
     
-    def _call_ollama(self, model: str, prompt: str, max_tokens: int) -> str:
+    def _build_agent_prompt(self, task: SubTask) -> SplitPrompt:
+        """Prompt por tipo de agente: prefijo estático + tarea al final"""
+        system = self.AGENT_PREFIXES.get(task.agent_type, "")
+        if task.agent_type == AgentType.CODE_LOCAL:
+            prompt = f"TAREA: {task.description}\n\nFORMATO SALIDA:\n{task.output_format}"
+        elif task.agent_type == AgentType.RESEARCH:
+            prompt = f"CONSULTA: {task.description}"
+        elif task.agent_type == AgentType.CODE_REVIEW:
+            prompt = f"CÓDIGO A REVISAR: {task.description}"
+        else:
+            prompt = task.description
+        return SplitPrompt(system, prompt)
+    
+    def select_model(self, task: SubTask, prompt: SplitPrompt) -> str:
+        """Modelo para la subtarea: preferido o alternativa según telemetría y presupuesto"""
+        preferred = self.AGENT_MODELS[task.agent_type]
+        fallbacks = self.AGENT_FALLBACKS.get(task.agent_type, [])
+        if not fallbacks:
+            return preferred
+        
+        decision = self.scheduler.choose([preferred] + fallbacks,
+                                         prompt_tokens=estimate_tokens(str(prompt)),
+                                         max_tokens=task.max_tokens,
+                                         budget=self.budget_per_task)
+        if decision.fallback:
+            print(f"   🔀 T{task.id}: {decision.model} ({decision.reason})")
+        return decision.model
+    
+    def _call_ollama(self, model: str, prompt: SplitPrompt, max_tokens: int,
+                     priority: Priority = Priority.INTERACTIVE) -> str:
         """Llamar a modelo local (Qwen 32B o Kimi)"""
         model_name = model.split("/")[-1]  # Extrae "qwen2.5:32b"
         
-        data = {
-            "model": model_name,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "num_predict": max_tokens,
-                "temperature": 0.7
-            }
+        options = {
+            "num_predict": max_tokens,
+            "temperature": 0.7
         }
         
         try:
-            import urllib.request
-            req = urllib.request.Request(
-                "http://localhost:11434/api/generate",
-                data=json.dumps(data).encode(),
-                headers={"Content-Type": "application/json"},
-                method="POST"
-            )
-            with urllib.request.urlopen(req, timeout=120) as response:
-                result = json.loads(response.read().decode())
+            # La cola limita los requests en vuelo (slots paralelos de Ollama para Qwen local)
+            with self.job_queue.slot(model, priority) as grant, self.scheduler.track(model) as call:
+                try:
+                    # La prioridad viaja también en el header (proxy de la cola entre procesos)
+                    result = get_client().generate(model_name, prompt.prompt, options=options,
+                                                   priority=priority.name.lower(),
+                                                   **prompt.ollama_kwargs())
+                except Exception as e:
+                    call.failed()
+                    return f"Error calling Ollama: {str(e)}"
+                call.ollama(result)
+                grant.tokens = result.get("eval_count", 0)
+                self.scheduler.mark_loaded(model)
                 return result.get("response", "Error: No response")
-        except Exception as e:
-            return f"Error calling Ollama: {str(e)}"
+        except JobRejected as e:
+            return f"Error: {e}"
+    
+    async def astream_task(self, task: SubTask) -> AsyncIterator[str]:
+        """
+        Fase 3 (async): Ejecutar subtarea emitiendo tokens a medida que llegan
+        Modelos que no son Ollama emiten su resultado completo en un solo chunk
+        """
+        prompt = self._build_agent_prompt(task)
+        # select_model puede consultar /api/ps (bloqueante): fuera del event loop
+        model = await asyncio.to_thread(self.select_model, task, prompt)
+        if "ollama/" not in model:
+            yield self._dispatch(task, model, prompt)
+            return
+        
+        async for token in self._astream_ollama(model, prompt, task.max_tokens, task.priority):
+            yield token
+    
+    async def aexecute_task(self, task: SubTask,
+                            on_token: Optional[Callable[[str, str], None]] = None) -> str:
+        """Consumir astream_task completo, notificando cada token"""
+        parts = []
+        async for token in self.astream_task(task):
+            parts.append(token)
+            if on_token:
+                on_token(task.id, token)
+        return "".join(parts)
+    
+    async def _astream_ollama(self, model: str, prompt: SplitPrompt, max_tokens: int,
+                              priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[str]:
+        """Stream de Ollama vía el cliente async con pool de conexiones"""
+        model_name = model.split("/")[-1]
+        options = {"num_predict": max_tokens, "temperature": 0.7}
+        try:
+            async with self.job_queue.aslot(model, priority) as grant:
+                async for token in self._astream_tracked(model, model_name, prompt, options,
+                                                         priority):
+                    grant.tokens += 1  # Ollama emite ~1 token por chunk
+                    yield token
+        except JobRejected as e:
+            yield f"Error: {e}"
+    
+    async def _astream_tracked(self, model: str, model_name: str, prompt: SplitPrompt,
+                               options: Dict[str, Any],
+                               priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[str]:
+        """Stream con telemetría para el scheduler"""
+        with self.scheduler.track(model) as call:
+            call.prompt_tokens = estimate_tokens(str(prompt))
+            start = time.monotonic()
+            try:
+                async for token in get_async_client().stream_generate(
+                        model_name, prompt.prompt, options, priority=priority.name.lower(),
+                        **prompt.ollama_kwargs()):
+                    if call.first_token_s is None:
+                        call.first_token_s = time.monotonic() - start
+                    call.completion_tokens += 1  # Ollama emite ~1 token por chunk
+                    yield token
+            except OllamaError as e:
+                call.failed()
+                yield f"Error calling Ollama: {str(e)}"
+                return
+            self.scheduler.mark_loaded(model)
     
     def _call_claude(self, prompt: str, max_tokens: int) -> str:
         """Placeholder - requiere integración con Anthropic API"""
@@ -297,10 +391,45 @@ SALIDA:
         """Placeholder para APIs de visión"""
         return "[Vision API call needed]"
     
-    def run(self, user_request: str) -> Dict[str, Any]:
+    def run(self, user_request: str, priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
         """
         Punto de entrada principal v1.1 con tool plugin
         """
+        analysis, plan = self._prepare(user_request, priority)
+        
+        # Fase 3: Ejecución (DAG — tareas independientes en paralelo)
+        start = time.monotonic()
+        results = self.dag_executor.run(plan, self._execute_logged)
+        self._log_routing(user_request, analysis, results, time.monotonic() - start)
+        
+        return self._build_response(user_request, analysis, plan, results)
+    
+    async def arun(self, user_request: str,
+                   on_token: Optional[Callable[[str, str], None]] = None,
+                   priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        Punto de entrada async — mismo flujo que run() con streaming de tokens
+        
+        on_token(task_id, token) recibe cada fragmento apenas llega de Ollama,
+        para que el dashboard o pasos siguientes consuman output parcial.
+        """
+        analysis, plan = self._prepare(user_request, priority)
+        
+        # Fase 3: Ejecución async (DAG en el event loop)
+        async def execute(task: SubTask) -> str:
+            print(f"\n⚡ Ejecutando T{task.id} con {task.agent_type.value} (stream)...")
+            result = await self.aexecute_task(task, on_token)
+            print(f"   ✅ T{task.id} completado ({len(result)} chars)")
+            return result
+        
+        start = time.monotonic()
+        results = await self.dag_executor.arun(plan, execute)
+        self._log_routing(user_request, analysis, results, time.monotonic() - start)
+        
+        return self._build_response(user_request, analysis, plan, results)
+    
+    def _prepare(self, user_request: str, priority: Priority = Priority.INTERACTIVE):
+        """Fases 1-2: análisis + plan (compartido por run y arun)"""
         mode = "ENHANCED + TOOLS" if self.use_enhanced else "VANILLA"
         print(f"🧠 Coordinator [{mode}] recibió: {user_request[:80]}...")
         
@@ -318,20 +447,34 @@ SALIDA:
         
         # Fase 2: Plan
         plan = self.create_plan(analysis)
+        for task in plan:
+            task.priority = priority
         print(f"📋 Plan creado: {len(plan)} tareas")
         for task in plan:
             tool_info = f" [tools: {task.required_tools}]" if task.required_tools else ""
             print(f"   - T{task.id}: {task.agent_type.value}{tool_info} ({task.description[:40]}...)")
         
-        # Fase 3: Ejecución
-        results = {}
-        for task in plan:
-            print(f"\n⚡ Ejecutando T{task.id} con {task.agent_type.value}...")
-            result = self.execute_task(task)
-            results[task.id] = result
-            print(f"   ✅ T{task.id} completado ({len(result)} chars)")
-        
-        # Fase 4: Integración
+        return analysis, plan
+    
+    def _log_routing(self, user_request: str, analysis: Dict[str, Any],
+                     results: Dict[str, str], latency_s: float):
+        """
+        Outcome real (agente + tools del ToolSelector, éxito de las llamadas)
+        para entrenar tool_router; sin tool plugin no hay etiquetas que loguear
+        """
+        agent = analysis.get('enhanced_agent_recommendation', {}).get('agent')
+        if not self.routing_log or agent is None:
+            return
+        log_routing_outcome(
+            user_request, agent, analysis['tool_selection'].get('recommended_tools', []),
+            success=not any(r.startswith("Error") or "Error calling Ollama" in r
+                            for r in results.values()),
+            latency_s=latency_s, path=self.routing_log
+        )
+    
+    def _build_response(self, user_request: str, analysis: Dict[str, Any],
+                        plan: List[SubTask], results: Dict[str, str]) -> Dict[str, Any]:
+        """Fase 4: Integración y respuesta final"""
         final_response = self._integrate_results(results, analysis)
         
         return {
@@ -343,6 +486,13 @@ SALIDA:
             "plugin_stats": self.tool_plugin.get_stats() if self.tool_plugin else None
         }
     
+    def _execute_logged(self, task: SubTask) -> str:
+        """Ejecutar una subtarea desde el DAG executor con logging"""
+        print(f"\n⚡ Ejecutando T{task.id} con {task.agent_type.value}...")
+        result = self.execute_task(task)
+        print(f"   ✅ T{task.id} completado ({len(result)} chars)")
+        return result
+    
     def _integrate_results(self, results: Dict[str, str], analysis: Dict[str, Any]) -> str:
         """Integrar resultados de todos los agentes"""
         parts = ["🎯 Resultado del Sistema Multi-Agente SWARM:\n"]
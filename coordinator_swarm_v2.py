@@ -19,6 +19,9 @@ from enum import Enum
 # Importar tool selector
 sys.path.insert(0, '/home/lumen/.openclaw/workspace')
 from coordinator_tool_selector import ToolSelector, ToolExecutor, ToolCategory
+from coordinator_dag import DAGExecutor
+from model_scheduler import ModelScheduler, ScheduleDecision, estimate_tokens, format_cost
+from prompt_prefix import SWARM_PREAMBLE, SplitPrompt, get_prefix_cache
 
 
 class AgentType(Enum):
@@ -51,6 +54,13 @@ class SubTask:
             self.depends_on = []
 
 
+class SimulatedOllama:
+    """Cliente offline para la simulación: Qwen siempre cargado, sin llamadas HTTP"""
+    
+    def ps(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return {"models": [{"name": "qwen2.5:32b"}]}
+
+
 class SWARMCoordinatorV2:
     """
     Coordinator v2 con Auto-Tool Selection
@@ -65,10 +75,25 @@ class SWARMCoordinatorV2:
         AgentType.CODE_REVIEW: "openai/gpt-4o",
     }
     
-    def __init__(self):
+    # Alternativas si el preferido está sobrecargado, descargado o es muy lento
+    AGENT_FALLBACKS = {
+        AgentType.COORDINATOR: ["ollama/qwen2.5:32b"],
+        AgentType.CODE_LOCAL: ["ollama/kimi-k2.5:cloud"],
+        AgentType.BUILD: ["ollama/kimi-k2.5:cloud"],
+        AgentType.CREATE: ["ollama/kimi-k2.5:cloud"],
+        AgentType.RESEARCH: ["ollama/kimi-k2.5:cloud"],
+        AgentType.CODE_REVIEW: ["ollama/kimi-k2.5:cloud"],
+    }
+    
+    def __init__(self, max_workers: int = 4, budget_per_task: Optional[float] = None,
+                 scheduler: Optional[ModelScheduler] = None):
         self.tool_selector = ToolSelector()
         self.tool_executor = ToolExecutor(self.tool_selector)
+        self.dag_executor = DAGExecutor(max_workers=max_workers)
         self.execution_log = []
+        # La ejecución es simulada: scheduler propio sin consultar Ollama
+        self.scheduler = scheduler or ModelScheduler(client=SimulatedOllama())
+        self.budget_per_task = budget_per_task  # USD máximo por subtarea (None = sin límite)
         
     def analyze_and_plan(self, user_request: str) -> Dict[str, Any]:
         """
@@ -190,14 +215,17 @@ class SWARMCoordinatorV2:
         """
         Fase 3: Ejecutar con metadata de tools
         """
-        model = self.AGENT_MODELS[task.agent_type]
-        
         # Construir prompt enriquecido con tools disponibles
         prompt = self._build_enriched_prompt(task)
+        decision = self.select_model(task, prompt)
+        model = decision.model
         
-        print(f"⚡ Ejecutando {task.id} con {task.agent_type.value}")
+        print(f"⚡ Ejecutando {task.id} con {task.agent_type.value} ({model})")
+        if decision.fallback:
+            print(f"   🔀 Alternativa: {decision.reason}")
         print(f"   🔧 Tools: {', '.join(task.required_tools) if task.required_tools else 'Ninguna'}")
-        print(f"   💰 Costo: {task.estimated_cost}")
+        print(f"   💰 Costo: {task.estimated_cost} (predicho {format_cost(decision.predicted_cost)}, "
+              f"~{decision.predicted_s:.0f}s)")
         
         # Simular ejecución (en producción, llamaría al modelo real)
         execution_result = f"""
@@ -205,7 +233,7 @@ class SWARMCoordinatorV2:
 Model: {model}
 Task: {task.description[:50]}...
 Tools disponibles: {task.required_tools}
-Prompt length: {len(prompt)} chars
+Prompt length: {len(str(prompt))} chars
 Max tokens: {task.max_tokens}
         """.strip()
         
@@ -225,29 +253,47 @@ Max tokens: {task.max_tokens}
             "result": execution_result,
             "tools_intended": task.required_tools,
             "actual_tokens_used": "~estimated",
+            "model": model,
+            "cost": format_cost(decision.predicted_cost),
+            "predicted_s": decision.predicted_s,
         }
     
-    def _build_enriched_prompt(self, task: SubTask) -> str:
-        """Prompt enriquecido con información de tools"""
-        
-        tool_instructions = []
-        
-        for tool in task.required_tools:
-            instructions = {
-                "web_search": "Usa web_search para encontrar información actualizada",
-                "web_fetch": "Usa web_fetch para extraer contenido de URLs específicas",
-                "code_exec": "Ejecuta código Python con code_exec (sandbox seguro)",
-                "file_read": "Lee archivos con file_read para acceder a datos",
-                "file_write": "Guarda resultados con file_write",
-                "telegram": "Envía notificaciones con telegram",
-            }.get(tool, f"Usa {tool} cuando sea necesario")
-            tool_instructions.append(f"- {instructions}")
-        
-        tools_section = "\n".join(tool_instructions) if tool_instructions else "Sin tools específicas requeridas."
+    def select_model(self, task: SubTask, prompt: SplitPrompt) -> ScheduleDecision:
+        """Modelo para la subtarea: preferido o alternativa según telemetría y presupuesto"""
+        preferred = self.AGENT_MODELS[task.agent_type]
+        return self.scheduler.choose([preferred] + self.AGENT_FALLBACKS.get(task.agent_type, []),
+                                     prompt_tokens=estimate_tokens(str(prompt)),
+                                     max_tokens=task.max_tokens,
+                                     budget=self.budget_per_task)
+    
+    def _execute_logged(self, task: SubTask) -> Dict[str, Any]:
+        """Ejecutar una subtarea desde el DAG executor con logging"""
+        result = self.execute_task_v2(task)
+        print(f"   ✅ {task.id} completado")
+        return result
+    
+    def _build_enriched_prompt(self, task: SubTask) -> SplitPrompt:
+        """Prompt enriquecido: prefijo estable por agente y tools + tarea al final"""
+        agent = task.agent_type.value
+        required = tuple(task.required_tools)
         
-        return f"""Eres un agente del sistema SWARM LumenAGI.
-
-TAREA: {task.description}
+        def build_prefix() -> str:
+            tool_instructions = []
+            
+            for tool in required:
+                instructions = {
+                    "web_search": "Usa web_search para encontrar información actualizada",
+                    "web_fetch": "Usa web_fetch para extraer contenido de URLs específicas",
+                    "code_exec": "Ejecuta código Python con code_exec (sandbox seguro)",
+                    "file_read": "Lee archivos con file_read para acceder a datos",
+                    "file_write": "Guarda resultados con file_write",
+                    "telegram": "Envía notificaciones con telegram",
+                }.get(tool, f"Usa {tool} cuando sea necesario")
+                tool_instructions.append(f"- {instructions}")
+            
+            tools_section = "\n".join(tool_instructions) if tool_instructions else "Sin tools específicas requeridas."
+            
+            return f"""{SWARM_PREAMBLE}
 
 TOOLS DISPONIBLES PARA ESTA TAREA:
 {tools_section}
@@ -259,8 +305,10 @@ INSTRUCCIONES:
 4. Reporta progreso y resultados claramente
 
 OUTPUT ESPERADO:
-{task.agent_type.value.upper()} result here...
-"""
+{agent.upper()} result here..."""
+        
+        system = get_prefix_cache().get(("v2", agent, required), build_prefix)
+        return SplitPrompt(system, f"TAREA: {task.description}")
     
     def run_v2(self, user_request: str, auto_execute: bool = True) -> Dict[str, Any]:
         """
@@ -285,12 +333,10 @@ OUTPUT ESPERADO:
         
         # Fase 3: Ejecución (si auto_execute)
         if auto_execute:
-            print("\n🚀 Ejecutando plan...")
-            execution_results = []
-            for task in plan_result['tasks']:
-                result = self.execute_task_v2(task)
-                execution_results.append(result)
-                print(f"   ✅ {task.id} completado")
+            print("\n🚀 Ejecutando plan (DAG paralelo)...")
+            # Ejecución simulada: sus outcomes no se loguean para tool_router
+            results = self.dag_executor.run(plan_result['tasks'], self._execute_logged)
+            execution_results = list(results.values())
         else:
             execution_results = []
             print("\n⏸️  Ejecución pausada (auto_execute=False)")
@@ -11,6 +11,8 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent))
 from coordinator_tool_selector import ToolSelector, ToolCategory
+from tool_registry import get_registry
+import tool_detection_enhanced  # Registra git/docker/sql/api/deploy en el registry
 
 
 class CoordinatorToolPlugin:
@@ -19,8 +21,9 @@ class CoordinatorToolPlugin:
     Sin modificar el core — se conecta como extensión
     """
     
-    def __init__(self, coordinator=None):
-        self.selector = ToolSelector()
+    def __init__(self, coordinator=None, semantic: bool = False):
+        self.registry = get_registry()
+        self.selector = ToolSelector(self.registry, semantic=semantic)
         self.coordinator = coordinator
         self.usage_stats = {
             'tasks_analyzed': 0,
@@ -37,9 +40,11 @@ class CoordinatorToolPlugin:
         """
         self.usage_stats['tasks_analyzed'] += 1
         
-        # Detectar tools
+        # Detectar tools: un solo scan (cacheado) para selector + tools del registry
         profile = self.selector.classify_task(user_request)
         plan = self.selector.build_tool_plan(profile)
+        signals = self.selector.signals(user_request)
+        detected = self.score_tools(user_request, signals=signals, group="enhanced")
         
         # Enriquecer análisis original
         enhanced = {
@@ -51,7 +56,9 @@ class CoordinatorToolPlugin:
                 'requires_files': profile.needs_file_io,
                 'requires_execution': profile.needs_code,
                 'estimated_cost': plan.get('estimated_cost', 'Variable'),
-                'fallback_strategy': plan['fallback_strategy']
+                'fallback_strategy': plan['fallback_strategy'],
+                'detected_tools': detected,
+                'semantic_agent_scores': profile.agent_scores
             },
             'enhanced_agent_recommendation': self._enhance_agent_choice(
                 original_analysis, profile, plan
@@ -62,9 +69,58 @@ class CoordinatorToolPlugin:
         
         return enhanced
     
+    def score_tools(self, text: str, signals: Optional[Dict[str, List[int]]] = None,
+                    group: Optional[str] = None) -> Dict[str, float]:
+        """
+        Scoring del registry (mismo que detect_tools): tool -> confianza
+        
+        group: 'selector', 'enhanced' (incluye tools hot-loaded) o None (todas)
+        """
+        return self.registry.score(text, group=group, signals=signals)
+    
+    def query_embedding(self, user_request: str) -> Optional[List[float]]:
+        """Embedding usado para el routing (modo semántico), para reusarlo en el RAG"""
+        return self.selector.embed(user_request)
+    
+    def enrich_with_rag(self, user_request: str, context_type: str = "skills",
+                        memory_dir: str = "./memory_db") -> Dict:
+        """RAG del request con el mismo embedding del routing (sin otro forward pass)"""
+        from coordinator_rag_plugin import enrich_with_rag
+        return enrich_with_rag(user_request, context_type, memory_dir,
+                               query_embedding=self.query_embedding(user_request))
+    
     def _enhance_agent_choice(self, original: Dict, profile, plan) -> Dict:
         """Mejora la recomendación de agente basada en tools"""
         
+        # Router aprendido: agentes y tools puntuados en un solo producto
+        router = self.selector.router
+        decision = router.route(profile.task) if router is not None else None
+        if decision is not None:
+            original_agent = original.get('recommended_agent', plan['agent'])
+            return {
+                'agent': decision.agent,
+                'reason': f"[Router] p={decision.agent_confidence:.2f}",
+                'override': decision.agent != original_agent,
+                'original': original_agent,
+                'confidence': decision.agent_confidence,
+                'router_tools': decision.tools
+            }
+        
+        # Modo semántico: agente más similar a los prototipos
+        semantic_router = self.selector.semantic_router
+        picked = semantic_router.pick_agent(profile.agent_scores) if semantic_router else None
+        if picked is not None:
+            agent, similarity = picked
+            original_agent = original.get('recommended_agent', plan['agent'])
+            return {
+                'agent': agent,
+                'reason': f"[Semántico] sim={similarity:.2f}",
+                'override': agent != original_agent,
+                'original': original_agent,
+                'confidence': similarity
+            }
+        
+        # Fallback: reglas por tool detectada con regex
         # Mapeo de herramientas a preferencia de agente
         tool_preferences = {
             ToolCategory.GPU_COMPUTE: ('build-qwen32', 'GPU local requerido'),
@@ -199,7 +255,8 @@ class CoordinatorToolPlugin:
             **self.usage_stats,
             'avg_tools_per_task': (
                 self.usage_stats['tools_suggested'] / max(1, self.usage_stats['tasks_analyzed'])
-            )
+            ),
+            'classification_cache': self.selector.get_cache_stats()
         }
 
 
@@ -5,11 +5,22 @@ Clasifica tareas y selecciona automáticamente qué tools usar
 Autonomía nivel 2: No solo elige agente, también elige tools específicas
 """
 
-import re
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tool_registry import ToolDefinition, ToolRegistry, get_registry
+from tool_router import TOOL_ROUTER_ENABLED, ToolRouter, load_router
+from tool_semantic_router import SemanticRouter
+
 
 class ToolCategory(Enum):
     """Categorías de herramientas disponibles"""
@@ -46,6 +57,56 @@ class TaskProfile:
     needs_file_io: bool
     estimated_duration: str  # "short", "medium", "long"
     tools: List[ToolRequirement]
+    match_counts: Dict[str, int] = field(default_factory=dict)  # categoría -> matches
+    agent_scores: Dict[str, float] = field(default_factory=dict)  # agente -> similitud (modo semántico)
+
+
+@dataclass
+class BatchProfile:
+    """
+    Perfiles de N tareas en forma matricial (columnas = categories)
+
+    confidence: (N x K) float, 0.0 = tool no detectada
+    priority: (N x K) int, 0 = tool no detectada
+    matched_patterns: (N x K) patrones distintos que matchearon
+    match_counts: (N x len(count_keys)) matches totales, tools + duration:*
+    flags: needs_* -> (N,) bool
+    """
+    tasks: List[str]
+    categories: List[ToolCategory]
+    confidence: np.ndarray
+    priority: np.ndarray
+    matched_patterns: np.ndarray
+    match_counts: np.ndarray
+    count_keys: List[str]
+    flags: Dict[str, np.ndarray]
+    estimated_duration: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def profile(self, i: int) -> TaskProfile:
+        """TaskProfile de la fila i (igual al de classify_task)"""
+        tools = [
+            ToolRequirement(
+                tool=tool,
+                confidence=float(self.confidence[i, k]),
+                reason=(f"Detectado '{tool.value}' en tarea ({int(self.matched_patterns[i, k])} matches)"
+                        if self.matched_patterns[i, k] else "Tarea tipo investigación general"),
+                priority=int(self.priority[i, k])
+            )
+            for k, tool in enumerate(self.categories) if self.priority[i, k]
+        ]
+        tools.sort(key=lambda x: (x.priority, -x.confidence))
+        return TaskProfile(
+            task=self.tasks[i],
+            **{name: bool(values[i]) for name, values in self.flags.items()},
+            estimated_duration=str(self.estimated_duration[i]),
+            tools=tools,
+            match_counts={
+                key: int(count) for key, count in zip(self.count_keys, self.match_counts[i]) if count
+            }
+        )
 
 
 class ToolSelector:
@@ -114,31 +175,179 @@ class ToolSelector:
                 r"\b(análisis exhaustivo|documenta todo|comprehensive)\b"],
     }
 
-    def __init__(self):
-        self.compiled_patterns = {
-            tool: [re.compile(p, re.IGNORECASE) for p in patterns]
-            for tool, patterns in self.PATTERNS.items()
-        }
-        self.duration_patterns = {
-            dur: [re.compile(p, re.IGNORECASE) for p in patterns]
-            for dur, patterns in self.DURATION_PATTERNS.items()
+    # Categorías que activan cada flag del TaskProfile
+    FLAG_TOOLS = {
+        "needs_research": [ToolCategory.WEB_SEARCH, ToolCategory.WEB_FETCH],
+        "needs_code": [ToolCategory.CODE_EXEC, ToolCategory.FILE_WRITE, ToolCategory.GITHUB],
+        "needs_gpu": [ToolCategory.GPU_COMPUTE],
+        "needs_web": [ToolCategory.WEB_SEARCH, ToolCategory.WEB_FETCH, ToolCategory.BROWSER],
+        "needs_file_io": [ToolCategory.FILE_READ, ToolCategory.FILE_WRITE],
+    }
+
+    # Sin tools detectadas: estas keywords implican investigación general
+    RESEARCH_KEYWORDS = ["investiga", "research", "busca", "qué es", "cómo"]
+
+    def __init__(self, registry: Optional[ToolRegistry] = None, cache_size: int = 512,
+                 router: Optional[ToolRouter] = None, use_router: Optional[bool] = None,
+                 semantic: bool = False, semantic_router: Optional[SemanticRouter] = None):
+        # Router aprendido (tool_router.py): opt-in (router explícito o
+        # LUMEN_TOOL_ROUTER_ENABLED=1); sin él o sin modelo se usan las reglas
+        if use_router is None:
+            use_router = router is not None or TOOL_ROUTER_ENABLED
+        self.router = (router or load_router()) if use_router else None
+
+        # Modo semántico: embedding nomic (el de LumenMemory) contra prototipos,
+        # sumado a las regex; el embedding queda cacheado para el RAG
+        self.semantic_router = semantic_router or (SemanticRouter() if semantic else None)
+        self._semantic_error = None
+
+        # Tools y duración viven en el registry compartido: un scan por tarea
+        # sirve también a detect_tools y al plugin
+        self.registry = registry or get_registry()
+        self.registry.register_many(self.tool_definitions())
+        self.signal_keys = [tool.value for tool in self.PATTERNS] + \
+            [f"duration:{dur}" for dur in self.DURATION_PATTERNS]
+
+        # Cache texto normalizado -> {signals, profile, plan} (heartbeats/cron repiten prompts)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_version = self.registry.version
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"profile_hits": 0, "profile_misses": 0,
+                            "plan_hits": 0, "plan_misses": 0, "evictions": 0}
+
+    @classmethod
+    def tool_definitions(cls) -> List[ToolDefinition]:
+        """PATTERNS / DURATION_PATTERNS como definiciones del registry"""
+        definitions = [
+            ToolDefinition(name=tool.value, patterns=patterns, confidence=0.3, per_pattern=True,
+                           max_confidence=0.95, threshold=0.0, group="selector")
+            for tool, patterns in cls.PATTERNS.items()
+        ]
+        definitions += [
+            ToolDefinition(name=f"duration:{dur}", patterns=patterns, confidence=1.0,
+                           threshold=0.0, group="duration")
+            for dur, patterns in cls.DURATION_PATTERNS.items()
+        ]
+        return definitions
+
+    def scan(self, task: str) -> Dict[str, int]:
+        """Matches por categoría (tools y duration:*) en un solo scan"""
+        return self._category_counts(self.registry.scan(task))
+
+    def _category_counts(self, signals: Dict[str, List[int]]) -> Dict[str, int]:
+        return {key: sum(signals[key]) for key in self.signal_keys if key in signals}
+
+    # === Cache de perfiles y planes ===
+
+    @staticmethod
+    def normalize(task: str) -> str:
+        return " ".join(task.lower().split())
+
+    def _cache_entry(self, task: str) -> Dict[str, Any]:
+        """Entrada del cache para task (scan + clasificación en un miss)"""
+        key = self.normalize(task)
+        self.registry.maybe_reload()
+        with self._cache_lock:
+            if self.registry.version != self._cache_version:
+                # Definiciones de tools cambiaron: los perfiles cacheados ya no valen
+                self._cache.clear()
+                self._cache_version = self.registry.version
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.cache_stats["profile_hits"] += 1
+                return entry
+            self.cache_stats["profile_misses"] += 1
+
+        signals = self.registry.scan(task)
+        embedding = self._embed(task)
+        entry = {"signals": signals, "embedding": embedding,
+                 "profile": self._classify(task, signals, embedding), "plan": None}
+
+        with self._cache_lock:
+            self._cache[key] = entry
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.cache_stats["evictions"] += 1
+        return entry
+
+    def signals(self, task: str) -> Dict[str, List[int]]:
+        """registry.scan(task), cacheado junto al perfil"""
+        if not self.cache_size:
+            return self.registry.scan(task)
+        return self._cache_entry(task)["signals"]
+
+    def embed(self, task: str) -> Optional[List[float]]:
+        """
+        Embedding del request en modo semántico (None si no está activo)
+
+        Cacheado junto al perfil: pasarlo como query_embedding al RAG
+        evita un segundo forward pass del modelo.
+        """
+        if self.semantic_router is None:
+            return None
+        if not self.cache_size:
+            return self._embed(task)
+        return self._cache_entry(task)["embedding"]
+
+    def _embed(self, task: str) -> Optional[List[float]]:
+        if self.semantic_router is None:
+            return None
+        try:
+            return self.semantic_router.embed(task)
+        except Exception as e:
+            if self._semantic_error is None:
+                print(f"⚠️ Routing semántico no disponible, usando regex: {e}")
+            self._semantic_error = str(e)
+            return None
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.cache_stats["profile_hits"] + self.cache_stats["profile_misses"]
+        return {
+            **self.cache_stats,
+            "size": len(self._cache),
+            "hit_rate": self.cache_stats["profile_hits"] / lookups if lookups else 0.0
         }
 
-    def classify_task(self, task: str) -> TaskProfile:
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def classify_task(self, task: str, signals: Optional[Dict[str, List[int]]] = None,
+                      embedding: Optional[List[float]] = None) -> TaskProfile:
         """
         Clasifica una tarea y determina qué tools necesita
+
+        Textos iguales salvo mayúsculas/espacios se sirven del cache.
+
+        Args:
+            signals: registry.scan(task) ya calculado (evita re-escanear, sin cache)
+            embedding: embedding ya calculado (ej: por el RAG), para el modo semántico
         """
+        if signals is not None or embedding is not None or not self.cache_size:
+            return self._classify(task, signals, embedding)
+        profile = self._cache_entry(task)["profile"]
+        return replace(profile, task=task, tools=list(profile.tools),
+                       match_counts=dict(profile.match_counts),
+                       agent_scores=dict(profile.agent_scores))
+
+    def _classify(self, task: str, signals: Optional[Dict[str, List[int]]] = None,
+                  embedding: Optional[List[float]] = None) -> TaskProfile:
         task_lower = task.lower()
         tools_detected = []
+        if signals is None:
+            signals = self.registry.scan(task)
+        if embedding is None:
+            embedding = self._embed(task)
 
         # Detectar tools necesarias
-        for tool, patterns in self.compiled_patterns.items():
-            confidence = 0.0
-            matched_patterns = 0
-            for pattern in patterns:
-                if pattern.search(task_lower):
-                    matched_patterns += 1
-                    confidence += 0.3  # Cada match añade confianza
+        for tool in self.PATTERNS:
+            per_pattern = signals.get(tool.value)
+            if not per_pattern:
+                continue
+            matched_patterns = sum(1 for count in per_pattern if count)
+            confidence = 0.3 * matched_patterns  # Cada patrón que matchea añade confianza
 
             if matched_patterns > 0:
                 confidence = min(confidence, 0.95)  # Cap en 0.95
@@ -153,31 +362,48 @@ class ToolSelector:
                     priority=priority
                 ))
 
+        # Modo semántico: tools por similitud con los prototipos (la mayor confianza gana)
+        agent_scores = {}
+        if embedding is not None:
+            decision = self.semantic_router.route(embedding)
+            agent_scores = decision.agent_scores
+            by_tool = {t.tool: t for t in tools_detected}
+            for name, confidence in self.semantic_router.detected_tools(decision.tool_scores).items():
+                tool = ToolCategory(name)
+                current = by_tool.get(tool)
+                if current is not None and current.confidence >= confidence:
+                    continue
+                requirement = ToolRequirement(
+                    tool=tool,
+                    confidence=confidence,
+                    reason=f"Similitud semántica con '{name}' ({decision.tool_scores[name]:.2f})",
+                    priority=1 if confidence > 0.8 else 2 if confidence > 0.6 else 3
+                )
+                if current is not None:
+                    tools_detected.remove(current)
+                tools_detected.append(requirement)
+
         # Ordenar por prioridad y confianza
         tools_detected.sort(key=lambda x: (x.priority, -x.confidence))
 
         # Determinar flags generales
-        needs_research = any(t.tool in [ToolCategory.WEB_SEARCH, ToolCategory.WEB_FETCH] for t in tools_detected)
-        needs_code = any(t.tool in [ToolCategory.CODE_EXEC, ToolCategory.FILE_WRITE, ToolCategory.GITHUB] for t in tools_detected)
-        needs_gpu = any(t.tool == ToolCategory.GPU_COMPUTE for t in tools_detected) or "qwen" in task_lower
-        needs_web = any(t.tool in [ToolCategory.WEB_SEARCH, ToolCategory.WEB_FETCH, ToolCategory.BROWSER] for t in tools_detected)
-        needs_file_io = any(t.tool in [ToolCategory.FILE_READ, ToolCategory.FILE_WRITE] for t in tools_detected)
+        needs_research = any(t.tool in self.FLAG_TOOLS["needs_research"] for t in tools_detected)
+        needs_code = any(t.tool in self.FLAG_TOOLS["needs_code"] for t in tools_detected)
+        needs_gpu = any(t.tool in self.FLAG_TOOLS["needs_gpu"] for t in tools_detected) or "qwen" in task_lower
+        needs_web = any(t.tool in self.FLAG_TOOLS["needs_web"] for t in tools_detected)
+        needs_file_io = any(t.tool in self.FLAG_TOOLS["needs_file_io"] for t in tools_detected)
 
         # Estimar duración
         estimated_duration = "medium"
-        for pattern in self.duration_patterns["short"]:
-            if pattern.search(task_lower):
-                estimated_duration = "short"
-                break
-        for pattern in self.duration_patterns["long"]:
-            if pattern.search(task_lower):
-                estimated_duration = "long"
-                break
+        if "duration:short" in signals:
+            estimated_duration = "short"
+        if "duration:long" in signals:
+            estimated_duration = "long"
 
         # Si no detectamos tools específicas, inferir del contexto general
         if not tools_detected:
             # Tareas de investigación general
-            if any(kw in task_lower for kw in ["investiga", "research", "busca", "qué es", "cómo"]):
+            if any(kw in task_lower for kw in self.RESEARCH_KEYWORDS):
                 tools_detected.append(ToolRequirement(
                     tool=ToolCategory.WEB_SEARCH,
                     confidence=0.7,
@@ -194,7 +420,67 @@ class ToolSelector:
             needs_web=needs_web,
             needs_file_io=needs_file_io,
             estimated_duration=estimated_duration,
-            tools=tools_detected
+            tools=tools_detected,
+            match_counts=self._category_counts(signals),
+            agent_scores=agent_scores
+        )
+
+    def classify_batch(self, tasks: List[str]) -> BatchProfile:
+        """
+        Clasifica N tareas: un scan por tarea y el scoring con operaciones de arrays
+
+        Mismos resultados que classify_task, fila a fila (ver BatchProfile.profile),
+        solo con regex: el modo semántico no aplica al batch.
+        """
+        tasks = list(tasks)
+        categories = list(self.PATTERNS)
+        matcher = self.registry.matcher  # Mismo matcher para scan y membership
+        counts = matcher.scan_batch(tasks)
+        hits = (counts > 0).astype(np.int32)
+
+        # Patrones distintos que matchean, por categoría -> confianza 0.3 por patrón
+        matched = hits @ matcher.membership([tool.value for tool in categories])
+        confidence = np.minimum(0.3 * matched, 0.95)
+        priority = np.where(confidence > 0.8, 1, np.where(confidence > 0.6, 2, 3))
+        priority = np.where(matched > 0, priority, 0)
+
+        # Fallback: sin tools pero con keywords de investigación -> web_search
+        lowered = [task.lower() for task in tasks]
+        no_tools = ~(matched > 0).any(axis=1)
+        research = np.fromiter(
+            (any(kw in text for kw in self.RESEARCH_KEYWORDS) for text in lowered),
+            dtype=bool, count=len(tasks)
+        )
+        fallback = no_tools & research
+        web_search = categories.index(ToolCategory.WEB_SEARCH)
+        confidence[fallback, web_search] = 0.7
+        priority[fallback, web_search] = 1
+
+        # Flags desde las tools detectadas por patrones; el fallback solo marca research
+        detected = matched > 0
+        flags = {
+            name: detected[:, [categories.index(tool) for tool in tools]].any(axis=1)
+            for name, tools in self.FLAG_TOOLS.items()
+        }
+        flags["needs_research"] |= fallback
+        flags["needs_gpu"] |= np.fromiter(("qwen" in text for text in lowered),
+                                          dtype=bool, count=len(tasks))
+
+        duration_hits = (hits @ matcher.membership(self.signal_keys[len(categories):])) > 0
+        estimated_duration = np.full(len(tasks), "medium", dtype=object)
+        for column, dur in enumerate(self.DURATION_PATTERNS):
+            estimated_duration[duration_hits[:, column]] = dur  # "long" pisa a "short"
+
+        return BatchProfile(
+            tasks=tasks,
+            categories=categories,
+            confidence=confidence,
+            priority=priority,
+            matched_patterns=matched,
+            match_counts=counts @ matcher.membership(self.signal_keys),
+            count_keys=self.signal_keys,
+            flags=flags,
+            estimated_duration=estimated_duration
         )
 
     def recommend_agent(self, profile: TaskProfile) -> Tuple[str, str]:
@@ -202,6 +488,24 @@ class ToolSelector:
         Recomienda qué agente usar basado en el perfil
         Returns: (agent_id, reasoning)
         """
+        # Router aprendido primero; si no está seguro, reglas
+        if self.router is not None:
+            decision = self.router.route(profile.task)
+            if decision is not None:
+                return (decision.agent,
+                        f"Router aprendido: {decision.agent} (p={decision.agent_confidence:.2f})")
+
+        # Modo semántico: agente más similar, si la ventaja es clara
+        if self.semantic_router is not None:
+            picked = self.semantic_router.pick_agent(profile.agent_scores)
+            if picked is not None:
+                agent, similarity = picked
+                return (agent, f"Routing semántico: {agent} (sim={similarity:.2f})")
+
+        return self.rule_based_agent(profile)
+
+    def rule_based_agent(self, profile: TaskProfile) -> Tuple[str, str]:
+        """Reglas de routing (fallback del router aprendido)"""
         # Reglas de routing
         if profile.needs_gpu and profile.needs_code:
             return ("build-qwen32", "Código + GPU disponible = Qwen 32B local óptimo")
@@ -224,7 +528,28 @@ class ToolSelector:
     def build_tool_plan(self, profile: TaskProfile) -> Dict:
         """
         Construye un plan de ejecución con las tools seleccionadas
+
+        Si profile coincide con el perfil cacheado de su tarea, el plan sale del cache.
         """
+        if not self.cache_size:
+            return self._build_tool_plan(profile)
+
+        with self._cache_lock:
+            entry = self._cache.get(self.normalize(profile.task))
+        if entry is None or replace(profile, task=entry["profile"].task) != entry["profile"]:
+            self.cache_stats["plan_misses"] += 1
+            return self._build_tool_plan(profile)
+
+        plan = entry["plan"]
+        if plan is None:
+            self.cache_stats["plan_misses"] += 1
+            plan = entry["plan"] = self._build_tool_plan(profile)
+        else:
+            self.cache_stats["plan_hits"] += 1
+        # Copia de lo mutable: el plan cacheado no se comparte con el caller
+        return {**plan, "tools": [dict(t) for t in plan["tools"]]}
+
+    def _build_tool_plan(self, profile: TaskProfile) -> Dict:
         agent_id, reasoning = self.recommend_agent(profile)
 
         # Seleccionar tools que realmente usaremos (top 3 por confianza)
@@ -13,6 +13,8 @@ from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from ollama_client import get_client
+
 def gather_metrics():
     """Collect overnight system metrics"""
     metrics = {
@@ -26,11 +28,8 @@ def gather_metrics():
     
     # Check Qwen status
     try:
-        result = subprocess.run(
-            ["curl", "-s", "http://localhost:11434/api/tags"],
-            capture_output=True, text=True, timeout=5
-        )
-        if "qwen" in result.stdout.lower():
+        tags = get_client().tags(timeout=5)
+        if any("qwen" in m.get("name", "").lower() for m in tags.get("models", [])):
             metrics["qwen_status"] = "✅ 20GB VRAM, 35 tok/s"
     except:
         metrics["qwen_status"] = "⚠️ Check needed"
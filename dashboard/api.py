@@ -1,37 +1,35 @@
 #!/usr/bin/env python3
 """LumenAGI Mission Control Backend API + Static Server"""
 
-import subprocess
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from flask import Flask, jsonify, send_from_directory
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from metrics_collector import get_metrics_feed, primary_gpu
+
 app = Flask(__name__)
 
 WORKSPACE = "/home/lumen/.openclaw/workspace"
 DASHBOARD_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def get_gpu_stats():
-    """Get real-time GPU stats from nvidia-smi"""
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=memory.used,memory.free,utilization.gpu,temperature.gpu', 
-             '--format=csv,noheader,nounits'],
-            capture_output=True, text=True, timeout=5
-        )
-        used, free, util, temp = result.stdout.strip().split(', ')
-        return {
-            "used_mb": int(used),
-            "free_mb": int(free),
-            "used_gb": round(int(used) / 1024, 1),
-            "free_gb": round(int(free) / 1024, 1),
-            "total_gb": 24,
-            "utilization": int(util),
-            "temperature": int(temp)
-        }
-    except Exception as e:
-        return {"error": str(e), "used_gb": 0.5, "free_gb": 23.5}
+    """Get real-time GPU stats from the shared metrics collector"""
+    gpu = primary_gpu(get_metrics_feed().latest())
+    if gpu is None:
+        return {"error": "GPU no disponible", "used_gb": 0.5, "free_gb": 23.5}
+    return {
+        "used_mb": gpu.mem_used_mb,
+        "free_mb": gpu.mem_free_mb,
+        "used_gb": round(gpu.mem_used_mb / 1024, 1),
+        "free_gb": round(gpu.mem_free_mb / 1024, 1),
+        "total_gb": round(gpu.mem_total_mb / 1024),
+        "utilization": gpu.util_gpu,
+        "temperature": gpu.temp_gpu
+    }
 
 def get_agents_status():
     """Get agent status from OpenClaw agent configs"""
@@ -12,17 +12,21 @@ Mejoras v4.3:
 """
 
 import json
-import subprocess
 import time
-import psutil
 import os
 import random
+import sys
 from datetime import datetime
 from pathlib import Path
 from collections import deque
 from flask import Flask, jsonify, send_from_directory, request, send_file
 from flask_socketio import SocketIO, emit
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from metrics_collector import get_metrics_feed, primary_gpu
+from delta_stream import DeltaStream
+from metric_history import TieredSeries
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'lumenagi-v4-secret'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
@@ -30,7 +34,9 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 BASE_DIR = Path(__file__).parent
 
 # Histórico de métricas
-gpu_history = deque(maxlen=60)
+# GPU: 60 puntos a 1 s en el socket; 1 h a 10 s y 24 h a 1 min en /api/history
+HISTORY_TIERS = ((1, 60), (10, 360), (60, 1440))
+gpu_history = {k: TieredSeries(HISTORY_TIERS) for k in ('utilization', 'vram_pct', 'temperature', 'power')}
 agent_activity = {'kimi': deque(maxlen=60), 'qwen': deque(maxlen=60), 'api': deque(maxlen=60)}
 
 # Token tracker con datos iniciales emulados (realistas para sesión)
@@ -57,79 +63,63 @@ swarm_state = {
 
 traces = deque(maxlen=20)
 
+# Stream snapshot + deltas: los históricos se envían completos solo al conectar
+STREAM = DeltaStream({
+    **{f'gpu_history.{k}': v for k, v in gpu_history.items()},
+    'agent_activity.kimi': agent_activity['kimi'],
+    'agent_activity.qwen': agent_activity['qwen'],
+    'agent_activity.api': agent_activity['api']
+})
+
 def add_trace(agent, task, status, details=""):
     traces.append({'timestamp': datetime.now().isoformat(), 'agent': agent, 'task': task, 'status': status, 'details': details})
 
-def get_gpu_metrics():
-    """GPU metrics via nvidia-smi"""
-    try:
-        result = subprocess.run([
-            'nvidia-smi', 
-            '--query-gpu=name,memory.used,memory.total,utilization.gpu,temperature.gpu,power.draw,power.limit',
-            '--format=csv,noheader,nounits'
-        ], capture_output=True, text=True, timeout=3)
-        
-        if result.returncode != 0:
-            return None
-            
-        parts = result.stdout.strip().split(', ')
-        device, used, total, util, temp, power, power_limit = parts
-        
-        return {
-            'device': device,
-            'used_mb': int(used),
-            'total_mb': int(total),
-            'utilization': int(util),
-            'temperature': int(temp),
-            'power_draw': float(power) if power != '[N/A]' else 0.0,
-            'power_limit': float(power_limit) if power_limit != '[N/A]' else 0.0
-        }
-    except Exception as e:
-        print(f"[GPU Error] {e}")
+def get_gpu_metrics(sample=None):
+    """GPU metrics from the shared collector (NVML)"""
+    gpu = primary_gpu(sample or get_metrics_feed().latest())
+    if gpu is None:
         return None
+    
+    return {
+        'device': gpu.name,
+        'used_mb': gpu.mem_used_mb,
+        'total_mb': gpu.mem_total_mb,
+        'utilization': gpu.util_gpu,
+        'temperature': gpu.temp_gpu,
+        'power_draw': gpu.power_draw_w or 0.0,
+        'power_limit': gpu.power_limit_w or 0.0
+    }
 
-def get_ollama_models():
+def get_ollama_models(sample=None):
     """Loaded Ollama models"""
-    try:
-        result = subprocess.run(['curl', '-s', 'http://127.0.0.1:11434/api/ps'], 
-                              capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            return [{'name': m.get('name'), 'size': m.get('size', 0), 'vram': m.get('size_vram', 0), 'expires': m.get('expires_at', 'unknown')} for m in data.get('models', [])]
-    except Exception as e:
-        print(f"[Ollama Error] {e}")
-    return []
+    sample = sample or get_metrics_feed().latest()
+    return [{'name': m.get('name'), 'size': m.get('size', 0), 'vram': m.get('size_vram', 0), 'expires': m.get('expires_at', 'unknown')} for m in (sample or {}).get('ollama', [])]
 
-def get_system_stats():
+def get_system_stats(sample=None):
     """CPU, RAM, Disk stats"""
-    try:
-        cpu_percent = psutil.cpu_percent(interval=0.1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        return {
-            'cpu': {'percent': cpu_percent, 'cores': psutil.cpu_count()},
-            'ram': {'used_gb': memory.used / (1024**3), 'total_gb': memory.total / (1024**3), 'percent': memory.percent},
-            'disk': {'used_gb': disk.used / (1024**3), 'total_gb': disk.total / (1024**3), 'percent': (disk.used / disk.total) * 100}
-        }
-    except Exception as e:
-        print(f"[System Error] {e}")
+    sample = sample or get_metrics_feed().latest()
+    if not sample or not sample.get('system'):
         return None
+    s = sample['system']
+    return {
+        'cpu': {'percent': s['cpu'], 'cores': s['cores']},
+        'ram': {'used_gb': s['ram_used'] / (1024**3), 'total_gb': s['ram_total'] / (1024**3), 'percent': s['ram_percent']},
+        'disk': {'used_gb': s['disk_used'] / (1024**3), 'total_gb': s['disk_total'] / (1024**3), 'percent': (s['disk_used'] / s['disk_total']) * 100}
+    }
 
-def get_network_traffic():
+def get_network_traffic(sample=None):
     """Network traffic"""
-    try:
-        net_io = psutil.net_io_counters()
-        return {
-            'bytes_sent': net_io.bytes_sent,
-            'bytes_recv': net_io.bytes_recv,
-        }
-    except:
+    sample = sample or get_metrics_feed().latest()
+    if not sample or not sample.get('system'):
         return None
+    return {
+        'bytes_sent': sample['system']['net_sent'],
+        'bytes_recv': sample['system']['net_recv'],
+    }
 
-def update_swarm_state():
+def update_swarm_state(sample=None):
     """Update SWARM states"""
-    ollama_models = get_ollama_models()
+    ollama_models = get_ollama_models(sample)
     
     for model in ollama_models:
         if 'qwen' in model['name'].lower():
@@ -166,36 +156,56 @@ def calculate_costs():
 def index():
     return send_from_directory(BASE_DIR, 'index.html')
 
+@app.route('/mobile')
+def mobile():
+    return send_from_directory(BASE_DIR, 'index_mobile.html')
+
+@app.route('/delta_stream.js')
+def delta_stream_js():
+    return send_from_directory(BASE_DIR, 'delta_stream.js')
+
 @socketio.on('connect')
 def handle_connect():
     print(f"[WS] Client connected: {datetime.now()}")
     emit('connected', {'status': 'connected', 'timestamp': datetime.now().isoformat()})
+    emit('snapshot', STREAM.encode(STREAM.snapshot()))
+
+@socketio.on('resync')
+def handle_resync():
+    emit('snapshot', STREAM.encode(STREAM.snapshot()))
 
 def emit_metrics():
-    """Emit metrics every second"""
+    """Emit metrics once per shared collector sample"""
+    feed = get_metrics_feed()
+    seq = 0
     last_net_io = None
     
     while True:
         try:
+            sample = feed.next(seq, timeout=5)
+            if sample is None:
+                continue
+            seq = sample['seq']
+            
             # GPU metrics
-            gpu = get_gpu_metrics()
+            gpu = get_gpu_metrics(sample)
+            points = {}
             if gpu:
-                gpu_history.append({
-                    'timestamp': datetime.now().isoformat(),
-                    'utilization': gpu['utilization'],
-                    'vram_pct': (gpu['used_mb'] / gpu['total_mb']) * 100,
-                    'temperature': gpu['temperature'],
-                    'power': gpu['power_draw']
+                points.update({
+                    'gpu_history.utilization': gpu['utilization'],
+                    'gpu_history.vram_pct': (gpu['used_mb'] / gpu['total_mb']) * 100,
+                    'gpu_history.temperature': gpu['temperature'],
+                    'gpu_history.power': gpu['power_draw']
                 })
             
             # System stats (CPU/RAM/Disk)
-            system_stats = get_system_stats()
+            system_stats = get_system_stats(sample)
             
             # Ollama models
-            ollama = get_ollama_models()
+            ollama = get_ollama_models(sample)
             
             # Network
-            net_io = get_network_traffic()
+            net_io = get_network_traffic(sample)
             net_speed = {'up': 0, 'down': 0}
             if last_net_io and net_io:
                 net_speed = {
@@ -205,7 +215,7 @@ def emit_metrics():
             last_net_io = net_io
             
             # Update SWARM
-            update_swarm_state()
+            update_swarm_state(sample)
             
             # Emulate token increments
             emulate_token_increments()
@@ -215,15 +225,14 @@ def emit_metrics():
             
             # Agent activity
             if gpu:
-                agent_activity['qwen'].append(gpu['utilization'])
-                agent_activity['kimi'].append(5 + random.randint(-2, 2))
-                agent_activity['api'].append(random.randint(0, 5))
+                points['agent_activity.qwen'] = gpu['utilization']
+                points['agent_activity.kimi'] = 5 + random.randint(-2, 2)
+                points['agent_activity.api'] = random.randint(0, 5)
             
             data = {
                 'timestamp': datetime.now().isoformat(),
                 'gpu': gpu,
                 'system': system_stats,
-                'gpu_history': list(gpu_history),
                 'ollama_models': ollama,
                 'network': {
                     'speed_mbps': {
@@ -242,21 +251,15 @@ def emit_metrics():
                 },
                 'token_tracker': token_tracker,
                 'costs': costs,
-                'agent_activity': {
-                    'kimi': list(agent_activity['kimi']),
-                    'qwen': list(agent_activity['qwen']),
-                    'api': list(agent_activity['api'])
-                },
                 'traces': list(traces)
             }
             
-            socketio.emit('metrics', data)
+            # Solo lo que cambió + puntos nuevos de los históricos (snapshot al conectar)
+            socketio.emit('delta', STREAM.encode(STREAM.tick(data, points)))
             
             if gpu and system_stats:
                 print(f"[EMIT] GPU:{gpu['utilization']}% CPU:{system_stats['cpu']['percent']:.0f}% RAM:{system_stats['ram']['percent']:.0f}% Tokens:{sum(t['input']+t['output'] for t in token_tracker.values()):,}")
             
-            time.sleep(1)
-            
         except Exception as e:
             print(f"[EMIT Error] {e}")
             time.sleep(1)
@@ -296,6 +299,15 @@ def agent_complete():
     add_trace(agent, task, 'completed', f"Tokens: {tokens_in}/{tokens_out}")
     return jsonify({'status': 'ok'})
 
+@app.route('/api/history/<metric>')
+def api_history(metric):
+    """Tendencia larga de una métrica: ?window=segundos (hasta 24 h; 1 s / 10 s / 1 min según ventana)"""
+    series = gpu_history.get(metric)
+    if not isinstance(series, TieredSeries):
+        return jsonify({'error': f'métrica desconocida: {metric}'}), 404
+    window = request.args.get('window', 3600, type=float)
+    return jsonify({'metric': metric, **series.window(window), 'rollup': series.rollup(window)})
+
 if __name__ == '__main__':
     from threading import Thread
     print("🚀 LumenAGI Dashboard v4.3 — Optimized Fullscreen Observatory")
@@ -5,19 +5,25 @@ LumenAGI Dashboard v5.5 — Control Panel Nivel Pro
 FUSIÓN: v2.0 (gráficas históricas + GPU detallada) + v4.4 (visual) + APIs reales
 """
 
-import json, subprocess, time, psutil, os, random, sys, re
+import json, time, random, sys, re
 from datetime import datetime
 from pathlib import Path
 from collections import deque
-from flask import Flask, jsonify, send_from_directory, render_template_string
+from flask import Flask, jsonify, request, send_from_directory, render_template_string
 from flask_socketio import SocketIO, emit
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from metrics_collector import WATCHED_PROCESSES, get_metrics_feed, primary_gpu
+from metric_history import TieredSeries
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'lumenagi-v55-secret'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # ===== SISTEMA DE DATOS EN TIEMPO REAL =====
-resource_history = {'cpu': deque(maxlen=60), 'ram': deque(maxlen=60), 'gpu': deque(maxlen=60), 'vram': deque(maxlen=60), 'timestamps': deque(maxlen=60)}
+# 60 puntos a 1 s en el socket; 1 h a 10 s y 24 h a 1 min en /api/history
+HISTORY_TIERS = ((1, 60), (10, 360), (60, 1440))
+resource_history = {'cpu': TieredSeries(HISTORY_TIERS), 'ram': TieredSeries(HISTORY_TIERS), 'gpu': TieredSeries(HISTORY_TIERS), 'vram': TieredSeries(HISTORY_TIERS), 'timestamps': deque(maxlen=60)}
 token_tracker = {'kimi': {'input': 2847, 'output': 1923, 'cost': 0.08}, 'qwen': {'input': 45231, 'output': 28947, 'cost': 0.0}, 'gpt4': {'input': 1245, 'output': 876, 'cost': 0.05}}
 traces = deque(maxlen=20)
 
@@ -28,58 +34,40 @@ ARCHITECTURE = {
     'research': {'name': 'Research', 'model': 'GPT-4', 'location': 'Cloud', 'status': 'standby', 'cost_mode': 'API'}
 }
 
-def get_gpu_info():
-    try:
-        result = subprocess.run(['nvidia-smi', '--query-gpu=name,memory.used,memory.total,utilization.gpu,temperature.gpu,power.draw,power.limit,pstate,clocks.gr,clocks.mem', '--format=csv,noheader,nounits'], capture_output=True, text=True, timeout=3)
-        if result.returncode == 0:
-            parts = result.stdout.strip().split(', ')
-            return {
-                'name': parts[0], 'used_mb': int(parts[1]), 'total_mb': int(parts[2]),
-                'utilization': int(parts[3]), 'temperature': int(parts[4]),
-                'power_draw': float(parts[5]), 'power_limit': float(parts[6]),
-                'pstate': parts[7], 'clock_gpu': int(parts[8]), 'clock_mem': int(parts[9]),
-                'vram_percent': (int(parts[1]) / int(parts[2])) * 100
-            }
-    except: pass
-    return None
-
-def get_ollama_models():
-    try:
-        result = subprocess.run(['curl', '-s', 'http://127.0.0.1:11434/api/ps'], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            return [{'name': m.get('name'), 'size': m.get('size_vram', 0), 'processor': m.get('details', {}).get('processor', 'GPU'), 'expires': m.get('expires_at', '-')} for m in data.get('models', [])]
-    except: pass
-    return []
-
-def get_system_stats():
-    try:
-        cpu = psutil.cpu_percent(interval=0.5)
-        mem = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        load = os.getloadavg() if hasattr(os, 'getloadavg') else (0, 0, 0)
-        return {
-            'cpu': cpu, 'ram_percent': mem.percent, 'ram_used': mem.used // (1024**3), 'ram_total': mem.total // (1024**3),
-            'disk_percent': disk.percent, 'load': load, 'cores': psutil.cpu_count()
-        }
-    except: return None
+def get_gpu_info(sample=None):
+    g = primary_gpu(sample or get_metrics_feed().latest())
+    if g is None:
+        return None
+    return {
+        'name': g.name, 'used_mb': g.mem_used_mb, 'total_mb': g.mem_total_mb,
+        'utilization': g.util_gpu, 'temperature': g.temp_gpu,
+        'power_draw': g.power_draw_w or 0.0, 'power_limit': g.power_limit_w or 0.0,
+        'pstate': g.pstate, 'clock_gpu': g.clock_gpu_mhz, 'clock_mem': g.clock_mem_mhz,
+        'vram_percent': g.mem_percent
+    }
+
+def get_ollama_models(sample=None):
+    sample = sample or get_metrics_feed().latest()
+    return [{'name': m.get('name'), 'size': m.get('size_vram', 0), 'processor': m.get('processor', 'GPU'), 'expires': m.get('expires_at', '-')} for m in (sample or {}).get('ollama', [])]
 
-def get_processes():
+def get_system_stats(sample=None):
+    sample = sample or get_metrics_feed().latest()
+    if not sample or not sample.get('system'):
+        return None
+    s = sample['system']
+    return {
+        'cpu': s['cpu'], 'ram_percent': s['ram_percent'], 'ram_used': s['ram_used'] // (1024**3), 'ram_total': s['ram_total'] // (1024**3),
+        'disk_percent': s['disk_percent'], 'load': s['load'], 'cores': s['cores']
+    }
+
+def get_processes(sample=None):
+    sample = sample or get_metrics_feed().latest()
+    watched = (sample or {}).get('processes', {})
     procesos = []
-    targets = [
-        ('ollama', '🦙 Ollama', 'ollama'),
-        ('python.*dashboard', '📊 Dashboard', 'dashboard'),
-        ('openclaw', '🔌 OpenClaw', 'gateway'),
-        ('chrome.*chrome-shelf', '🌐 Chromium', 'browser'),
-    ]
-    for pattern, nombre, key in targets:
-        try:
-            result = subprocess.run(f"ps aux | grep -E '{pattern}' | grep -v grep | head -1", shell=True, capture_output=True, text=True, timeout=2)
-            if result.stdout:
-                parts = result.stdout.split()
-                if len(parts) >= 11:
-                    procesos.append({'name': nombre, 'pid': parts[1], 'cpu': parts[2], 'mem': parts[3], 'cmd': ' '.join(parts[10:])[:30]})
-        except: pass
+    for key, _, _ in WATCHED_PROCESSES:
+        p = watched.get(key)
+        if p:
+            procesos.append({'name': p['name'], 'pid': str(p['pid']), 'cpu': str(p['cpu']), 'mem': str(p['mem']), 'cmd': p['cmd']})
     return procesos
 
 def get_api_status():
@@ -100,10 +88,17 @@ def get_hb_tasks():
 
 # ===== EMISIÓN EN TIEMPO REAL =====
 def emit_loop():
+    # Una emisión por muestra del collector compartido (no se muestrea aquí)
+    feed = get_metrics_feed()
+    seq = 0
     while True:
         try:
-            gpu = get_gpu_info()
-            system = get_system_stats()
+            sample = feed.next(seq, timeout=5)
+            if sample is None:
+                continue
+            seq = sample['seq']
+            gpu = get_gpu_info(sample)
+            system = get_system_stats(sample)
             
             if gpu and system:
                 now = datetime.now().strftime('%H:%M:%S')
@@ -113,7 +108,7 @@ def emit_loop():
                 resource_history['vram'].append(gpu['vram_percent'])
                 resource_history['timestamps'].append(now)
             
-            ollama = get_ollama_models()
+            ollama = get_ollama_models(sample)
             total_cost = sum(t['cost'] for t in token_tracker.values())
             
             socketio.emit('metrics', {
@@ -127,11 +122,10 @@ def emit_loop():
                 'tokens': token_tracker,
                 'cost_total': total_cost,
                 'apis': get_api_status(),
-                'processes': get_processes(),
+                'processes': get_processes(sample),
                 'tasks_lumen': get_lumen_tasks(),
                 'tasks_hb': get_hb_tasks()
             })
-            time.sleep(1)
         except Exception as e:
             print(f"[Error] {e}")
             time.sleep(1)
@@ -145,6 +139,15 @@ def index():
 def api_status():
     return jsonify({'architecture': ARCHITECTURE, 'gpu': get_gpu_info(), 'system': get_system_stats()})
 
+@app.route('/api/history/<metric>')
+def api_history(metric):
+    """Tendencia larga de una métrica: ?window=segundos (hasta 24 h; 1 s / 10 s / 1 min según ventana)"""
+    series = resource_history.get(metric)
+    if not isinstance(series, TieredSeries):
+        return jsonify({'error': f'métrica desconocida: {metric}'}), 404
+    window = request.args.get('window', 3600, type=float)
+    return jsonify({'metric': metric, **series.window(window), 'rollup': series.rollup(window)})
+
 # ===== HTML V5.5 — TABLERO DE CONTROL PRO =====
 HTML_V55 = '''
 <!DOCTYPE html>
@@ -5,22 +5,27 @@ LumenAGI Dashboard v6.0 — MISSION CONTROL
 Explota todo: GPU, CPU, arquitectura, tokens, APIs, todo en tiempo real
 """
 
-import json, subprocess, time, psutil, os, sys
+import json, time, sys
 from datetime import datetime
 from pathlib import Path
 from collections import deque
-from flask import Flask, jsonify, render_template_string
+from flask import Flask, jsonify, render_template_string, request, send_from_directory
 from flask_socketio import SocketIO, emit
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from metrics_collector import get_metrics_feed, primary_gpu
+from delta_stream import DeltaStream
+from metric_history import TieredSeries
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'lumen-v6-secret'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', ping_interval=5, ping_timeout=10)
 
-# Datos históricos (últimos 5 minutos = 300 puntos a 1Hz)
+# Datos históricos: 5 min a 1 s (stream) + 1 h a 10 s + 24 h a 1 min (/api/history)
 HISTORY = {
-    'cpu': deque(maxlen=300), 'ram': deque(maxlen=300), 'gpu': deque(maxlen=300),
-    'vram': deque(maxlen=300), 'power': deque(maxlen=300), 'temp': deque(maxlen=300),
-    'timestamps': deque(maxlen=300), 'tokens_in': deque(maxlen=300), 'tokens_out': deque(maxlen=300)
+    'cpu': TieredSeries(), 'ram': TieredSeries(), 'gpu': TieredSeries(),
+    'vram': TieredSeries(), 'power': TieredSeries(), 'temp': TieredSeries(),
+    'timestamps': deque(maxlen=300), 'tokens_in': TieredSeries(), 'tokens_out': TieredSeries()
 }
 
 TOKENS = {'kimi': {'in': 2847, 'out': 1923, 'cost': 0.08, 'speed': 0},
@@ -29,100 +34,113 @@ TOKENS = {'kimi': {'in': 2847, 'out': 1923, 'cost': 0.08, 'speed': 0},
 
 METRICS = {'session_start': datetime.now(), 'total_requests': 0, 'peak_gpu': 0, 'peak_ram': 0}
 
-def get_gpu_full():
-    """GPU completa con todos los datos"""
-    try:
-        # Query extendido
-        r = subprocess.run([
-            'nvidia-smi', 
-            '--query-gpu=timestamp,name,pci.bus_id,driver_version,pstate,pcie.link.gen.max,pcie.link.gen.current,'
-            'temperature.gpu,temperature.memory,utilization.gpu,utilization.memory,'
-            'memory.used,memory.free,memory.total,'
-            'power.draw,power.limit,power.max_limit,clocks.gr,clocks.mem,clocks.sm',
-            '--format=csv,noheader,nounits'
-        ], capture_output=True, text=True, timeout=2)
-        
-        if r.returncode == 0:
-            p = r.stdout.strip().split(', ')
-            return {
-                'timestamp': p[0], 'name': p[1], 'pci': p[2], 'driver': p[3],
-                'pstate': p[4], 'pcie_max': p[5], 'pcie_current': p[6],
-                'temp_gpu': int(p[7]), 'temp_mem': int(p[8]),
-                'util_gpu': int(p[9]), 'util_mem': int(p[10]),
-                'vram_used': int(p[11]), 'vram_free': int(p[12]), 'vram_total': int(p[13]),
-                'power_draw': float(p[14]), 'power_limit': float(p[15]), 'power_max': float(p[16]),
-                'clock_gpu': int(p[17]), 'clock_mem': int(p[18]), 'clock_sm': int(p[19])
-            }
-    except: pass
-    return None
+# Stream snapshot + deltas: el histórico se envía completo solo al conectar
+STREAM = DeltaStream({f'history.{k}': v for k, v in HISTORY.items()})
+
+# Secciones estáticas: canal 'static' aparte, al conectar y solo cuando cambian
+STATIC = {'apis': {}, 'arch': {}}
+STATIC_REFRESH_S = 30  # Chequeo de credenciales en disco
+_static_checked = 0.0
+
+def get_apis():
+    """Estado de las APIs según las credenciales en secrets"""
+    s = Path('/home/lumen/.openclaw/workspace/secrets')
+    return {
+        'youtube': '✅' if (s / 'youtube_tokens.json').exists() else '❌',
+        'gmail': '✅' if (s / 'gmail_token.json').exists() else '❌',
+        'notion': '✅' if (s / 'notion_credentials.json').exists() else '❌',
+        'moltbook': '✅' if (s / 'moltbook_credentials.json').exists() else '❌',
+        'telegram': '✅'
+    }
 
-def get_ollama_ps():
+def refresh_static(ollama):
+    """Recalcular las secciones estáticas; True si cambiaron"""
+    global _static_checked
+    apis = STATIC['apis']
+    if time.monotonic() - _static_checked >= STATIC_REFRESH_S:
+        apis = get_apis()
+        _static_checked = time.monotonic()
+    arch = {
+        'kimi': {'model': 'Kimi K2.5', 'loc': 'Cloud', 'status': 'active'},
+        'qwen': {'model': 'Qwen 2.5 32B', 'loc': f"{ollama[0]['vram_gb']:.1f}GB VRAM" if ollama else 'VRAM', 'status': 'active'},
+        'gpt4': {'model': 'GPT-4', 'loc': 'Cloud', 'status': 'standby'}
+    }
+    changed = apis != STATIC['apis'] or arch != STATIC['arch']
+    STATIC.update(apis=apis, arch=arch)
+    return changed
+
+def get_gpu_full(sample=None):
+    """GPU completa con todos los datos (muestra del collector compartido)"""
+    g = primary_gpu(sample or get_metrics_feed().latest())
+    if g is None:
+        return None
+    return {
+        'timestamp': g.timestamp, 'name': g.name, 'pci': g.pci_bus_id, 'driver': g.driver,
+        'pstate': g.pstate, 'pcie_max': str(g.pcie_gen_max or '-'), 'pcie_current': str(g.pcie_gen_current or '-'),
+        'temp_gpu': g.temp_gpu, 'temp_mem': g.temp_mem or 0,
+        'util_gpu': g.util_gpu, 'util_mem': g.util_mem,
+        'vram_used': g.mem_used_mb, 'vram_free': g.mem_free_mb, 'vram_total': g.mem_total_mb,
+        'power_draw': g.power_draw_w or 0.0, 'power_limit': g.power_limit_w or 0.0, 'power_max': g.power_max_w or 0.0,
+        'clock_gpu': g.clock_gpu_mhz, 'clock_mem': g.clock_mem_mhz, 'clock_sm': g.clock_sm_mhz
+    }
+
+def get_ollama_ps(sample=None):
     """Modelos con VRAM exacta"""
-    try:
-        r = subprocess.run(['curl', '-s', 'http://127.0.0.1:11434/api/ps'], capture_output=True, text=True, timeout=3)
-        if r.returncode == 0:
-            data = json.loads(r.stdout)
-            models = []
-            for m in data.get('models', []):
-                vram = m.get('size_vram', 0)
-                models.append({
-                    'name': m.get('name', 'unknown'),
-                    'vram_mb': vram / (1024*1024),
-                    'vram_gb': vram / (1024**3),
-                    'expires': m.get('expires_at', '-'),
-                    'processor': m.get('details', {}).get('processor', 'GPU')
-                })
-            return models
-    except: pass
-    return []
+    sample = sample or get_metrics_feed().latest()
+    models = []
+    for m in (sample or {}).get('ollama', []):
+        vram = m.get('size_vram', 0)
+        models.append({
+            'name': m.get('name', 'unknown'),
+            'vram_mb': vram / (1024*1024),
+            'vram_gb': vram / (1024**3),
+            'expires': m.get('expires_at', '-'),
+            'processor': m.get('processor', 'GPU')
+        })
+    return models
 
-def get_system_deep():
+def get_system_deep(sample=None):
     """Sistema profundo"""
-    try:
-        cpu = psutil.cpu_percent(interval=0.5)
-        per_cpu = psutil.cpu_percent(interval=0.1, percpu=True)
-        mem = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-        disk = psutil.disk_usage('/')
-        net = psutil.net_io_counters()
-        load = os.getloadavg()
-        
-        # Procesos por uso
-        procs = []
-        for p in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-            try:
-                if p.info['cpu_percent'] > 1 or p.info['memory_percent'] > 1:
-                    procs.append(p.info)
-            except: pass
-        procs.sort(key=lambda x: x['cpu_percent'], reverse=True)
-        
-        return {
-            'cpu': cpu, 'per_cpu': per_cpu, 'cores': psutil.cpu_count(),
-            'ram_percent': mem.percent, 'ram_used': mem.used // (1024**3), 
-            'ram_total': mem.total // (1024**3), 'ram_available': mem.available // (1024**3),
-            'swap_percent': swap.percent, 'swap_used': swap.used // (1024**3),
-            'disk_percent': disk.percent, 'disk_used': disk.used // (1024**3), 'disk_total': disk.total // (1024**3),
-            'load': load, 'net_sent': net.bytes_sent // (1024**2), 'net_recv': net.bytes_recv // (1024**2),
-            'top_procs': procs[:8]
-        }
-    except: return None
+    sample = sample or get_metrics_feed().latest()
+    if not sample or not sample.get('system'):
+        return None
+    s = sample['system']
+    return {
+        'cpu': s['cpu'], 'per_cpu': s['per_cpu'], 'cores': s['cores'],
+        'ram_percent': s['ram_percent'], 'ram_used': s['ram_used'] // (1024**3), 
+        'ram_total': s['ram_total'] // (1024**3), 'ram_available': s['ram_available'] // (1024**3),
+        'swap_percent': s['swap_percent'], 'swap_used': s['swap_used'] // (1024**3),
+        'disk_percent': s['disk_percent'], 'disk_used': s['disk_used'] // (1024**3), 'disk_total': s['disk_total'] // (1024**3),
+        'load': s['load'], 'net_sent': s['net_sent'] // (1024**2), 'net_recv': s['net_recv'] // (1024**2),
+        'top_procs': sample['top_procs']
+    }
 
 def emitter():
+    # Una emisión por muestra del collector compartido (no se muestrea aquí)
+    feed = get_metrics_feed()
+    seq = 0
     while True:
         try:
-            gpu = get_gpu_full()
-            sys_data = get_system_deep()
-            ollama = get_ollama_ps()
+            sample = feed.next(seq, timeout=5)
+            if sample is None:
+                continue
+            seq = sample['seq']
+            gpu = get_gpu_full(sample)
+            sys_data = get_system_deep(sample)
+            ollama = get_ollama_ps(sample)
             
+            point = {}
             if gpu and sys_data:
                 t = datetime.now().strftime('%H:%M:%S')
-                HISTORY['cpu'].append(sys_data['cpu'])
-                HISTORY['ram'].append(sys_data['ram_percent'])
-                HISTORY['gpu'].append(gpu['util_gpu'])
-                HISTORY['vram'].append((gpu['vram_used'] / gpu['vram_total']) * 100)
-                HISTORY['power'].append(gpu['power_draw'])
-                HISTORY['temp'].append(gpu['temp_gpu'])
-                HISTORY['timestamps'].append(t)
+                point = {
+                    'history.cpu': sys_data['cpu'],
+                    'history.ram': sys_data['ram_percent'],
+                    'history.gpu': gpu['util_gpu'],
+                    'history.vram': (gpu['vram_used'] / gpu['vram_total']) * 100,
+                    'history.power': gpu['power_draw'],
+                    'history.temp': gpu['temp_gpu'],
+                    'history.timestamps': t
+                }
                 
                 # Update peaks
                 if gpu['util_gpu'] > METRICS['peak_gpu']: METRICS['peak_gpu'] = gpu['util_gpu']
@@ -138,35 +156,22 @@ def emitter():
                 TOKENS['kimi']['cost'] = (TOKENS['kimi']['in'] * 0.001 + TOKENS['kimi']['out'] * 0.003) / 1000
                 TOKENS['gpt4']['cost'] = (TOKENS['gpt4']['in'] * 0.0025 + TOKENS['gpt4']['out'] * 0.01) / 1000
             
-            # APIs status check
-            s = Path('/home/lumen/.openclaw/workspace/secrets')
-            apis = {
-                'youtube': '✅' if (s / 'youtube_tokens.json').exists() else '❌',
-                'gmail': '✅' if (s / 'gmail_token.json').exists() else '❌',
-                'notion': '✅' if (s / 'notion_credentials.json').exists() else '❌',
-                'moltbook': '✅' if (s / 'moltbook_credentials.json').exists() else '❌',
-                'telegram': '✅'
-            }
+            # APIs + arquitectura: canal aparte, solo si cambiaron
+            if refresh_static(ollama):
+                socketio.emit('static', STATIC)
             
             payload = {
                 't': t if gpu else '-',
                 'gpu': gpu,
                 'sys': sys_data,
-                'history': {k: list(v) for k, v in HISTORY.items()},
                 'ollama': ollama,
                 'tokens': TOKENS,
                 'cost_total': sum(v['cost'] for v in TOKENS.values()),
-                'apis': apis,
-                'metrics': METRICS,
-                'arch': {
-                    'kimi': {'model': 'Kimi K2.5', 'loc': 'Cloud', 'status': 'active'},
-                    'qwen': {'model': 'Qwen 2.5 32B', 'loc': f"{ollama[0]['vram_gb']:.1f}GB VRAM" if ollama else 'VRAM', 'status': 'active'},
-                    'gpt4': {'model': 'GPT-4', 'loc': 'Cloud', 'status': 'standby'}
-                }
+                'metrics': METRICS
             }
             
-            socketio.emit('data', payload)
-            time.sleep(1)
+            # Solo lo que cambió + puntos nuevos del histórico (snapshot al conectar)
+            socketio.emit('delta', STREAM.encode(STREAM.tick(payload, point)))
             
         except Exception as e:
             print(f"[E] {e}")
@@ -177,6 +182,28 @@ def emitter():
 def index():
     return render_template_string(HTML)
 
+@app.route('/api/history/<metric>')
+def api_history(metric):
+    """Tendencia larga de una métrica: ?window=segundos (hasta 24 h; 1 s / 10 s / 1 min según ventana)"""
+    series = HISTORY.get(metric)
+    if not isinstance(series, TieredSeries):
+        return jsonify({'error': f'métrica desconocida: {metric}'}), 404
+    window = request.args.get('window', 3600, type=float)
+    return jsonify({'metric': metric, **series.window(window), 'rollup': series.rollup(window)})
+
+@app.route('/delta_stream.js')
+def delta_stream_js():
+    return send_from_directory(Path(__file__).parent, 'delta_stream.js')
+
+@socketio.on('connect')
+def on_connect():
+    emit('static', STATIC)
+    emit('snapshot', STREAM.encode(STREAM.snapshot()))
+
+@socketio.on('resync')
+def on_resync():
+    emit('snapshot', STREAM.encode(STREAM.snapshot()))
+
 # HTML v6.0 — IMPRESIONANTE
 HTML = '''
 <!DOCTYPE html>
@@ -187,6 +214,8 @@ HTML = '''
     <script src="https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js"></script>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script src="https://cdn.socket.io/4.5.4/socket.io.min.js"></script>
+    <script src="https://unpkg.com/@msgpack/msgpack@2.8.0"></script>
+    <script src="/delta_stream.js"></script>
     <style>
         * { margin: 0; padding: 0; box-sizing: border-box; }
         body {
@@ -659,7 +688,7 @@ HTML = '''
             document.getElementById('conn').style.color = '#00ff88';
         });
         
-        socket.on('data', (d) => {
+        subscribeDeltas(socket, (d) => {
             // Gauges
             if (d.sys) {
                 drawGauge('g-cpu', d.sys.cpu, '#3b82f6');
@@ -750,18 +779,6 @@ HTML = '''
                 document.getElementById('tok-s').textContent = t.qwen.speed.toFixed(0);
             }
             
-            // APIs
-            if (d.apis) {
-                const a = d.apis;
-                document.getElementById('apis').innerHTML = `
-                    <div class="api-item">📺 YouTube <span class="api-status">${a.youtube}</span></div>
-                    <div class="api-item">📧 Gmail <span class="api-status">${a.gmail}</span></div>
-                    <div class="api-item">📋 Notion <span class="api-status">${a.notion}</span></div>
-                    <div class="api-item">🦞 Moltbook <span class="api-status">${a.moltbook}</span></div>
-                    <div class="api-item">💬 Telegram <span class="api-status">${a.telegram}</span></div>
-                `;
-            }
-            
             // Metrics
             if (d.metrics) {
                 const m = d.metrics;
@@ -774,6 +791,20 @@ HTML = '''
             }
         });
         
+        // Secciones estáticas (al conectar y cuando cambian)
+        socket.on('static', (st) => {
+            if (st.apis) {
+                const a = st.apis;
+                document.getElementById('apis').innerHTML = `
+                    <div class="api-item">📺 YouTube <span class="api-status">${a.youtube}</span></div>
+                    <div class="api-item">📧 Gmail <span class="api-status">${a.gmail}</span></div>
+                    <div class="api-item">📋 Notion <span class="api-status">${a.notion}</span></div>
+                    <div class="api-item">🦞 Moltbook <span class="api-status">${a.moltbook}</span></div>
+                    <div class="api-item">💬 Telegram <span class="api-status">${a.telegram}</span></div>
+                `;
+            }
+        });
+        
         socket.on('disconnect', () => {
             document.getElementById('conn').textContent = '🔴 OFFLINE';
             document.getElementById('conn').style.color = '#ff4444';
@@ -0,0 +1,77 @@
+// Delta Stream — cliente del protocolo snapshot + deltas (delta_stream.py)
+// subscribeDeltas(socket, render): render(payload) recibe el mismo payload
+// completo que antes emitía el servidor en cada tick.
+// Frames binarios (LUMEN_DASH_ENCODING=msgpack) requieren MessagePack global
+// (@msgpack/msgpack); las series empaquetadas llegan como Float32Array.
+function subscribeDeltas(socket, render) {
+    let seq = -1, state = {}, series = {}, maxlen = {};
+
+    const decode = (frame) => {
+        if (!(frame instanceof ArrayBuffer || ArrayBuffer.isView(frame))) return frame;
+        return MessagePack.decode(frame);
+    };
+
+    const append = (name, value) => {
+        const values = series[name] || [];
+        const limit = maxlen[name] || Infinity;
+        if (ArrayBuffer.isView(values)) {
+            // Typed array: copia con el punto nuevo (300 floats por tick)
+            const next = new values.constructor(Math.min(values.length + 1, limit));
+            next.set(values.subarray(values.length + 1 - next.length));
+            next[next.length - 1] = value;
+            series[name] = next;
+            return;
+        }
+        values.push(value);
+        if (values.length > limit) values.splice(0, values.length - limit);
+        series[name] = values;
+    };
+
+    const setPath = (obj, path, value) => {
+        const parts = path.split('.');
+        let node = obj;
+        parts.slice(0, -1).forEach(p => {
+            node[p] = Object.assign({}, node[p]);
+            node = node[p];
+        });
+        node[parts[parts.length - 1]] = value;
+    };
+
+    const payload = () => {
+        const view = Object.assign({}, state);
+        Object.entries(series).forEach(([name, values]) => setPath(view, name, values));
+        return view;
+    };
+
+    socket.on('snapshot', (frame) => {
+        const s = decode(frame);
+        (s.packed || []).forEach(name => {
+            // slice(): copia alineada para el Float32Array
+            s.series[name] = new Float32Array(s.series[name].slice().buffer);
+        });
+        seq = s.seq;
+        state = s.state;
+        series = s.series;
+        maxlen = s.maxlen;
+        render(payload());
+    });
+
+    socket.on('delta', (frame) => {
+        const d = decode(frame);
+        if (seq < 0 || d.seq <= seq) return;  // Esperando snapshot, o frame viejo
+        if (d.seq !== seq + 1) {
+            // Se perdió al menos un delta: pedir el estado completo
+            seq = -1;
+            socket.emit('resync');
+            return;
+        }
+        seq = d.seq;
+        Object.entries(d.set || {}).forEach(([k, v]) => { state[k] = v; });
+        Object.entries(d.patch || {}).forEach(([k, sub]) => { state[k] = Object.assign({}, state[k], sub); });
+        (d.unset || []).forEach(k => { delete state[k]; });
+        Object.entries(d.append || {}).forEach(([name, value]) => append(name, value));
+        render(payload());
+    });
+
+    socket.on('disconnect', () => { seq = -1; });
+}
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Delta Stream v1.0 — Protocolo snapshot + deltas para los dashboards SocketIO
+En vez de reenviar todo el payload (con el histórico completo) cada segundo a
+cada cliente:
+
+- 'snapshot' (al conectar o al pedir 'resync'): seq, estado completo y series
+- 'delta' (cada tick, broadcast): seq, puntos nuevos de cada serie y solo las
+  claves del estado que cambiaron (dos niveles: clave o subclave de un dict)
+- El cliente aplica los deltas en orden; si falta un seq pide 'resync'
+
+Cliente: dashboard/delta_stream.js (subscribeDeltas(socket, render)) reconstruye
+el mismo payload de antes, así el código de render no cambia.
+
+Series con nombre de path ("history.cpu") aparecen anidadas en el payload del
+cliente (payload.history.cpu).
+
+Codificación (LUMEN_DASH_ENCODING):
+- json (default): los frames se emiten como dicts, SocketIO los serializa
+- msgpack: frames binarios (floats de 32 bits); en el snapshot las series
+  numéricas van empaquetadas como float32 y el cliente las decodifica a
+  Float32Array para Chart.js. Requiere `pip install msgpack`.
+"""
+
+import json
+import os
+import sys
+import threading
+from array import array
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# json | msgpack
+ENCODING = os.environ.get("LUMEN_DASH_ENCODING", "json")
+
+
+def _msgpack_default(value: Any) -> Any:
+    """Tipos que msgpack no conoce (datetime de METRICS, etc.)"""
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+class DeltaStream:
+    """
+    Estado del stream de un dashboard
+
+    Args:
+        series: nombre -> deque (con maxlen) o TieredSeries de los históricos;
+            el stream les agrega los puntos de cada tick
+        encoding: "json" o "msgpack" (default: LUMEN_DASH_ENCODING)
+    """
+
+    def __init__(self, series: Dict[str, Deque[Any]], encoding: Optional[str] = None):
+        self.series = series
+        self.binary = (encoding or ENCODING) == "msgpack"
+        if self.binary and not MSGPACK_AVAILABLE:
+            print("⚠️ msgpack no instalado (pip install msgpack), usando JSON", file=sys.stderr)
+            self.binary = False
+        self.seq = 0
+        self._state: Dict[str, Any] = {}
+        self._encoded: Dict[Any, str] = {}  # clave o (clave, subclave) -> JSON del último valor
+        self._lock = threading.Lock()
+
+    def _changed(self, path, value) -> bool:
+        encoded = json.dumps(value, sort_keys=True, default=str)
+        if self._encoded.get(path) == encoded:
+            return False
+        self._encoded[path] = encoded
+        return True
+
+    def _remember(self, key: str, value: Any):
+        """Guardar las codificaciones de un valor enviado completo"""
+        self._changed(key, value)
+        if isinstance(value, dict):
+            for sub, sub_value in value.items():
+                self._changed((key, sub), sub_value)
+
+    def tick(self, state: Dict[str, Any], append: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Registrar un tick y devolver el frame 'delta' para emitir
+
+        Args:
+            state: payload del tick sin las series
+            append: serie -> punto nuevo
+        """
+        with self._lock:
+            self.seq += 1
+            frame: Dict[str, Any] = {"seq": self.seq}
+
+            if append:
+                for name, value in append.items():
+                    self.series[name].append(value)
+                frame["append"] = append
+
+            changed, patch = {}, {}
+            for key, value in state.items():
+                previous = self._state.get(key)
+                if (isinstance(value, dict) and isinstance(previous, dict)
+                        and previous.keys() <= value.keys() and key in self._encoded):
+                    subkeys = {sub: sub_value for sub, sub_value in value.items()
+                               if self._changed((key, sub), sub_value)}
+                    if subkeys:
+                        self._changed(key, value)
+                        patch[key] = subkeys
+                elif key not in self._state or self._changed(key, value):
+                    self._remember(key, value)
+                    changed[key] = value
+            removed = [key for key in self._state if key not in state]
+            for key in removed:
+                self._encoded.pop(key, None)
+
+            if changed:
+                frame["set"] = changed
+            if patch:
+                frame["patch"] = patch
+            if removed:
+                frame["unset"] = removed
+            # Copia superficial: los dicts del caller pueden mutar en el próximo tick
+            self._state = {key: dict(value) if isinstance(value, dict) else value
+                           for key, value in state.items()}
+            return frame
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Frame 'snapshot' para un cliente nuevo o que perdió deltas"""
+        with self._lock:
+            frame = {
+                "seq": self.seq,
+                "state": dict(self._state),
+                "series": {name: list(values) for name, values in self.series.items()},
+                "maxlen": {name: values.maxlen for name, values in self.series.items()},
+            }
+        if self.binary:
+            # Series numéricas como float32 empaquetado (Float32Array en el cliente)
+            packed = [name for name, values in frame["series"].items()
+                      if values and all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                                        for v in values)]
+            for name in packed:
+                values = array("f", frame["series"][name])
+                if sys.byteorder == "big":
+                    values.byteswap()  # Float32Array usa el orden del navegador (little-endian)
+                frame["series"][name] = values.tobytes()
+            frame["packed"] = packed
+        return frame
+
+    def encode(self, frame: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        """Frame listo para socketio.emit (bytes si la codificación es msgpack)"""
+        if not self.binary:
+            return frame
+        return msgpack.packb(frame, use_single_float=True, default=_msgpack_default)
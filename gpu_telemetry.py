@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+GPU Telemetry v1.0 — Muestreo de GPU en proceso vía NVML
+Compartido por los dashboards y scripts de monitoreo (sin fork de nvidia-smi)
+
+- NVMLBackend: handle NVML abierto una vez; datos estáticos (nombre, PCI,
+  driver, límites) leídos al iniciar, el resto en cada sample()
+- FakeBackend: GPU sintética para CI (solo con LUMEN_GPU_BACKEND=fake)
+- NullBackend: sin GPU ("N/A") cuando NVML no carga
+- Backends enchufables: register_backend(nombre, factory) y LUMEN_GPU_BACKEND
+  (nvml | fake | none); por defecto NVML y, si no está, none
+
+Uso:
+    gpu = get_sampler().primary()     # GPUSample o None
+    print(gpu.util_gpu, gpu.mem_used_mb, gpu.power_draw_w)
+
+CLI (reemplaza el loop de nvidia-smi de scripts/gpu_monitor.sh):
+    python gpu_telemetry.py --watch 1 --count 60
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import pynvml
+    NVML_AVAILABLE = True
+except ImportError:
+    pynvml = None
+    NVML_AVAILABLE = False
+
+MIB = 1024 * 1024
+
+
+@dataclass
+class GPUSample:
+    """Lectura de una GPU (unidades de nvidia-smi: MiB, MHz, W, °C)"""
+    index: int
+    name: str
+    timestamp: str
+    util_gpu: int
+    util_mem: int
+    mem_used_mb: int
+    mem_free_mb: int
+    mem_total_mb: int
+    temp_gpu: int
+    temp_mem: Optional[int] = None
+    power_draw_w: Optional[float] = None
+    power_limit_w: Optional[float] = None
+    power_max_w: Optional[float] = None
+    pstate: str = "P0"
+    clock_gpu_mhz: int = 0
+    clock_mem_mhz: int = 0
+    clock_sm_mhz: int = 0
+    pci_bus_id: str = ""
+    driver: str = ""
+    pcie_gen_max: Optional[int] = None
+    pcie_gen_current: Optional[int] = None
+    backend: str = "nvml"
+
+    @property
+    def mem_percent(self) -> float:
+        return self.mem_used_mb / self.mem_total_mb * 100 if self.mem_total_mb else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _timestamp() -> str:
+    """Mismo formato que el campo timestamp de nvidia-smi"""
+    return datetime.now().strftime("%Y/%m/%d %H:%M:%S.%f")[:-3]
+
+
+class NVMLBackend:
+    """Lecturas vía pynvml — un solo nvmlInit por proceso"""
+
+    name = "nvml"
+
+    def __init__(self):
+        if not NVML_AVAILABLE:
+            raise RuntimeError("pynvml no instalado (pip install nvidia-ml-py)")
+        pynvml.nvmlInit()
+        self._devices = []
+        driver = self._text(pynvml.nvmlSystemGetDriverVersion())
+        for index in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            limits = self._query(pynvml.nvmlDeviceGetPowerManagementLimitConstraints, handle)
+            self._devices.append({
+                "index": index,
+                "handle": handle,
+                "name": self._text(pynvml.nvmlDeviceGetName(handle)),
+                "pci_bus_id": self._text(pynvml.nvmlDeviceGetPciInfo(handle).busId),
+                "driver": driver,
+                "pcie_gen_max": self._query(pynvml.nvmlDeviceGetMaxPcieLinkGeneration, handle),
+                "power_max_w": limits[1] / 1000 if limits else None,
+            })
+
+    @staticmethod
+    def _text(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    @staticmethod
+    def _query(fn: Callable, *args):
+        """Campo opcional: None si la GPU no lo soporta (nvidia-smi muestra [N/A])"""
+        try:
+            return fn(*args)
+        except pynvml.NVMLError:
+            return None
+
+    def sample(self) -> List[GPUSample]:
+        samples = []
+        timestamp = _timestamp()
+        for device in self._devices:
+            handle = device["handle"]
+            memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+            util = pynvml.nvmlDeviceGetUtilizationRates(handle)
+            power = self._query(pynvml.nvmlDeviceGetPowerUsage, handle)
+            limit = self._query(pynvml.nvmlDeviceGetEnforcedPowerLimit, handle)
+            pstate = self._query(pynvml.nvmlDeviceGetPerformanceState, handle)
+            clock = lambda kind: self._query(pynvml.nvmlDeviceGetClockInfo, handle, kind) or 0
+            samples.append(GPUSample(
+                index=device["index"],
+                name=device["name"],
+                timestamp=timestamp,
+                util_gpu=util.gpu,
+                util_mem=util.memory,
+                mem_used_mb=memory.used // MIB,
+                mem_free_mb=memory.free // MIB,
+                mem_total_mb=memory.total // MIB,
+                temp_gpu=pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU),
+                power_draw_w=power / 1000 if power is not None else None,
+                power_limit_w=limit / 1000 if limit is not None else None,
+                power_max_w=device["power_max_w"],
+                pstate=f"P{pstate}" if pstate is not None else "P?",
+                clock_gpu_mhz=clock(pynvml.NVML_CLOCK_GRAPHICS),
+                clock_mem_mhz=clock(pynvml.NVML_CLOCK_MEM),
+                clock_sm_mhz=clock(pynvml.NVML_CLOCK_SM),
+                pci_bus_id=device["pci_bus_id"],
+                driver=device["driver"],
+                pcie_gen_max=device["pcie_gen_max"],
+                pcie_gen_current=self._query(pynvml.nvmlDeviceGetCurrPcieLinkGeneration, handle),
+                backend=self.name,
+            ))
+        return samples
+
+    def close(self):
+        pynvml.nvmlShutdown()
+
+
+class FakeBackend:
+    """
+    GPU sintética (RTX 3090 24 GB por defecto) para CI y máquinas sin GPU
+
+    Los campos de GPUSample se pueden fijar por kwargs; `fn` opcional recibe el
+    número de muestra y devuelve overrides (para simular carga variable).
+    """
+
+    name = "fake"
+
+    def __init__(self, count: int = 1, fn: Optional[Callable[[int], Dict[str, Any]]] = None,
+                 **fields):
+        self.count = count
+        self.fn = fn
+        self.fields = fields
+        self._n = 0
+
+    def sample(self) -> List[GPUSample]:
+        overrides = {**self.fields, **(self.fn(self._n) if self.fn else {})}
+        self._n += 1
+        samples = []
+        for index in range(self.count):
+            values = {
+                "index": index, "name": "NVIDIA GeForce RTX 3090 (fake)",
+                "timestamp": _timestamp(),
+                "util_gpu": 0, "util_mem": 0,
+                "mem_used_mb": 512, "mem_total_mb": 24576,
+                "temp_gpu": 40, "power_draw_w": 30.0, "power_limit_w": 350.0,
+                "power_max_w": 400.0, "pstate": "P8",
+                "clock_gpu_mhz": 210, "clock_mem_mhz": 405, "clock_sm_mhz": 210,
+                "pci_bus_id": f"00000000:0{index + 1}:00.0", "driver": "fake",
+                "pcie_gen_max": 4, "pcie_gen_current": 1,
+                **overrides, "backend": self.name,
+            }
+            values.setdefault("mem_free_mb", values["mem_total_mb"] - values["mem_used_mb"])
+            samples.append(GPUSample(**values))
+        return samples
+
+    def close(self):
+        pass
+
+
+class NullBackend:
+    """Sin GPU: sample() vacío, los dashboards muestran N/A"""
+
+    name = "none"
+
+    def sample(self) -> List[GPUSample]:
+        return []
+
+    def close(self):
+        pass
+
+
+# Backends enchufables: nombre -> factory sin argumentos
+BACKENDS: Dict[str, Callable[[], Any]] = {
+    "nvml": NVMLBackend,
+    "fake": FakeBackend,
+    "none": NullBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], Any]):
+    """Registrar un backend (objeto con name, sample() -> List[GPUSample], close())"""
+    BACKENDS[name] = factory
+
+
+def create_backend(name: Optional[str] = None):
+    """
+    Backend por nombre (o LUMEN_GPU_BACKEND); sin nombre: NVML con fallback a none
+
+    La GPU fake solo se usa si se pide explícitamente: en producción un driver
+    roto no debe aparecer como datos inventados en dashboards ni reportes.
+    """
+    name = name or os.environ.get("LUMEN_GPU_BACKEND")
+    if name:
+        return BACKENDS[name]()
+    try:
+        return BACKENDS["nvml"]()
+    except Exception as e:
+        print(f"⚠️ NVML no disponible ({e}), sin telemetría de GPU", file=sys.stderr)
+        return BACKENDS["none"]()
+
+
+class GPUSampler:
+    """
+    Punto de lectura compartido: varios callers dentro de `min_interval`
+    reciben la misma muestra (una consulta NVML por tick, no una por endpoint)
+    """
+
+    def __init__(self, backend=None, min_interval: float = 0.5):
+        self.backend = backend or create_backend()
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last: List[GPUSample] = []
+        self._last_at = 0.0
+
+    def sample(self) -> List[GPUSample]:
+        """Todas las GPUs; lista vacía si la lectura falla"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_at >= self.min_interval:
+                try:
+                    self._last = self.backend.sample()
+                except Exception as e:
+                    print(f"[GPU Error] {e}")
+                    self._last = []
+                self._last_at = now
+            return self._last
+
+    def primary(self) -> Optional[GPUSample]:
+        """GPU 0 (la que usa Ollama)"""
+        samples = self.sample()
+        return samples[0] if samples else None
+
+    def close(self):
+        self.backend.close()
+
+
+_sampler: Optional[GPUSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> GPUSampler:
+    global _sampler
+    if _sampler is None:
+        with _sampler_lock:
+            if _sampler is None:
+                _sampler = GPUSampler()
+    return _sampler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPU telemetry (NVML)")
+    parser.add_argument("--watch", type=float, default=0, help="Intervalo en segundos (0 = una lectura)")
+    parser.add_argument("--count", type=int, default=0, help="Número de lecturas (0 = sin límite)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), help="Forzar backend")
+    args = parser.parse_args()
+
+    sampler = GPUSampler(create_backend(args.backend), min_interval=0)
+    n = 0
+    try:
+        while True:
+            for gpu in sampler.sample():
+                # Mismas columnas que el CSV de scripts/gpu_monitor.sh
+                print(f"{gpu.timestamp}, {gpu.util_gpu}, {gpu.mem_used_mb}, {gpu.temp_gpu}", flush=True)
+            n += 1
+            if not args.watch or (args.count and n >= args.count):
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
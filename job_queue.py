@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Job Queue v1.0 — Cola central de requests a modelos
+Prioridad, límites de concurrencia por modelo, admission control y load shedding
+
+Una sola RTX 3090 corre Qwen 32B: si el nightly, los pings de keepalive y los
+requests interactivos llegan a la vez, la latencia interactiva se dispara.
+
+- Prioridades: INTERACTIVE < NORMAL < BACKGROUND (heartbeat/cron/nightly)
+- Límite de requests simultáneos por modelo (Qwen local = OLLAMA_NUM_PARALLEL)
+- Modelos locales: el límite en vuelo se ajusta solo entre 1 y
+  OLLAMA_NUM_PARALLEL según los tokens/s agregados (sweet spot de la GPU);
+  Ollama decodifica en el mismo batch los requests concurrentes
+- Admission control: profundidad máxima de cola por prioridad; lo que no
+  entra se rechaza al instante (JobRejected) en vez de esperar sin fin
+- Métricas: en uso, encolados por prioridad, admitidos/rechazados, espera p95
+
+Uso en proceso:
+    with get_job_queue().slot("ollama/qwen2.5:32b", Priority.INTERACTIVE) as grant:
+        result = get_client().generate(...)
+        grant.tokens = result.get("eval_count", 0)   # Alimenta el ajuste adaptativo
+
+Proxy: una sola admisión para todos los procesos (coordinators, cron, keepalive):
+    python3 job_queue.py --serve [port]
+    curl -H "X-Lumen-Priority: background" http://127.0.0.1:11435/api/generate -d ...
+
+Con el proxy corriendo, OllamaClient lo usa por defecto (o LUMEN_OLLAMA_URL) y
+get_job_queue() devuelve un ProxyAdmission: el proceso no encola localmente,
+manda la prioridad en el header y el proxy ordena y limita a todos.
+"""
+
+import asyncio
+import heapq
+import http.server
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ollama_client import (OLLAMA_URL, PRIORITY_HEADER, QUEUE_PROXY_PORT, OllamaClient,
+                           OllamaError, get_client)
+
+# Requests en paralelo que atiende Ollama por modelo local (default de Ollama: 4);
+# el límite adaptativo baja desde acá si la GPU rinde más con menos
+LOCAL_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+
+
+class Priority(IntEnum):
+    """Menor valor = se atiende antes"""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+    @classmethod
+    def parse(cls, value: Any) -> "Priority":
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls[str(value).upper()]
+        except KeyError:
+            return cls(int(value))
+
+
+class JobRejected(Exception):
+    """Request no admitido (cola llena) o sin turno antes del timeout"""
+
+
+# Profundidad máxima de cola por prioridad (por modelo)
+DEFAULT_MAX_DEPTH = {Priority.INTERACTIVE: 32, Priority.NORMAL: 16, Priority.BACKGROUND: 4}
+
+# Espera máxima por defecto (segundos); None = sin límite
+DEFAULT_MAX_WAIT = {Priority.INTERACTIVE: None, Priority.NORMAL: 600.0, Priority.BACKGROUND: 120.0}
+
+# Límites de concurrencia por modelo (el resto usa default_limit)
+DEFAULT_MODEL_LIMITS = {"ollama/qwen2.5:32b": LOCAL_PARALLEL}
+
+# Modelos con límite en vuelo adaptativo (slots paralelos de Ollama en la GPU local)
+DEFAULT_ADAPTIVE_MODELS = {"ollama/qwen2.5:32b"}
+
+
+def model_key(model: str) -> str:
+    """"qwen2.5:32b" -> "ollama/qwen2.5:32b" (mismos nombres que AGENT_MODELS)"""
+    return model if "/" in model else f"ollama/{model}"
+
+
+class Grant:
+    """Slot concedido; el caller anota los tokens generados al terminar"""
+    __slots__ = ("tokens",)
+
+    def __init__(self):
+        self.tokens = 0
+
+
+class _ModelLane:
+    """
+    Cola con prioridad + contador de slots de un modelo
+
+    Con adaptive=True el límite en vuelo hace hill-climbing entre 1 y el
+    máximo configurado por los tokens/s agregados medidos con cola.
+    """
+
+    def __init__(self, limit: int, adaptive: bool = False, adapt_every: int = 16):
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self.adaptive = adaptive and self.max_limit > 1
+        self.adapt_every = adapt_every
+        self.in_use = 0
+        self.waiting: List[List[Any]] = []  # heap de [priority, seq, activo]
+        self.queued = {p: 0 for p in Priority}
+        self.admitted = {p: 0 for p in Priority}
+        self.rejected = {p: 0 for p in Priority}
+        self.timed_out = {p: 0 for p in Priority}
+        self.waits: "deque[float]" = deque(maxlen=200)
+        # Intervalo de medición para el ajuste adaptativo
+        self.interval = {"start": time.monotonic(), "done": 0, "tokens": 0, "backlog": False}
+        self.last_rate: Optional[float] = None
+        self._direction = -1  # Primero probar con menos en vuelo
+
+    def head(self) -> Optional[List[Any]]:
+        while self.waiting and not self.waiting[0][2]:
+            heapq.heappop(self.waiting)  # Entradas canceladas
+        return self.waiting[0] if self.waiting else None
+
+    def set_max(self, limit: int):
+        self.max_limit = max(1, limit)
+        self.limit = self.max_limit
+        self.adaptive = self.adaptive and self.max_limit > 1
+
+    def record(self, tokens: int):
+        """Request terminado (lock tomado); cada adapt_every ajusta el límite"""
+        interval = self.interval
+        interval["done"] += 1
+        interval["tokens"] += tokens
+        if not self.adaptive or interval["done"] < self.adapt_every:
+            return
+        rate = interval["tokens"] / max(time.monotonic() - interval["start"], 1e-6)
+        self.interval = {"start": time.monotonic(), "done": 0, "tokens": 0, "backlog": False}
+        if not interval["backlog"]:
+            return  # Sin cola el throughput lo limita la demanda, no la GPU
+
+        if self.last_rate is not None and rate < self.last_rate * 1.02:
+            self._direction = -self._direction  # Empeoró (o igual): volver atrás
+        self.last_rate = rate
+        self.limit = min(self.max_limit, max(1, self.limit + self._direction))
+
+
+class JobQueue:
+    """
+    Cola central de requests con prioridad y límite por modelo
+
+    Los callers corren su request en su propio thread/task: la cola solo
+    decide cuándo les toca (slot / aslot), sin pool de workers propio.
+    """
+
+    def __init__(self, model_limits: Optional[Dict[str, int]] = None, default_limit: int = 4,
+                 max_depth: Optional[Dict[Priority, int]] = None,
+                 max_wait: Optional[Dict[Priority, Optional[float]]] = None,
+                 adaptive_models: Optional[set] = None):
+        self.model_limits = {model_key(m): n for m, n in
+                             {**DEFAULT_MODEL_LIMITS, **(model_limits or {})}.items()}
+        self.adaptive_models = {model_key(m) for m in
+                                (DEFAULT_ADAPTIVE_MODELS if adaptive_models is None else adaptive_models)}
+        self.default_limit = default_limit
+        self.max_depth = {**DEFAULT_MAX_DEPTH, **(max_depth or {})}
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _ModelLane(self.model_limits.get(model, self.default_limit),
+                                                   adaptive=model in self.adaptive_models)
+        return lane
+
+    def set_limit(self, model: str, limit: int):
+        model = model_key(model)
+        with self._cond:
+            self.model_limits[model] = limit
+            self._lane(model).set_max(limit)
+            self._cond.notify_all()
+
+    # === Admisión ===
+
+    def _enqueue(self, model: str, priority: Priority) -> List[Any]:
+        """Encolar (lock tomado); rechaza si la cola de esa prioridad está llena"""
+        lane = self._lane(model)
+        if lane.queued[priority] >= self.max_depth[priority]:
+            lane.rejected[priority] += 1
+            raise JobRejected(f"Cola de {model} llena para {priority.name.lower()} "
+                              f"({lane.queued[priority]} esperando)")
+        entry = [int(priority), next(self._seq), True]
+        heapq.heappush(lane.waiting, entry)
+        lane.queued[priority] += 1
+        return entry
+
+    def _try_grant(self, lane: _ModelLane, entry: List[Any]) -> bool:
+        """Dar el slot si hay lugar y entry es el primero de la cola (lock tomado)"""
+        if lane.in_use < lane.limit and lane.head() is entry:
+            heapq.heappop(lane.waiting)
+            lane.queued[Priority(entry[0])] -= 1
+            lane.in_use += 1
+            if lane.head() is not None:
+                lane.interval["backlog"] = True  # Demanda por encima del límite
+            return True
+        return False
+
+    def _abandon(self, lane: _ModelLane, entry: List[Any], priority: Priority, timed_out: bool):
+        entry[2] = False
+        lane.queued[priority] -= 1
+        if timed_out:
+            lane.timed_out[priority] += 1
+        self._cond.notify_all()  # El siguiente puede ser ahora la cabeza
+
+    def _admitted(self, lane: _ModelLane, priority: Priority, waited: float):
+        lane.admitted[priority] += 1
+        lane.waits.append(waited)
+
+    def _release(self, model: str, grant: Grant):
+        with self._cond:
+            lane = self._lanes[model]
+            lane.in_use -= 1
+            lane.record(grant.tokens or 0)
+            self._cond.notify_all()
+
+    def _timeout(self, priority: Priority, timeout: Optional[float]) -> Optional[float]:
+        return self.max_wait[priority] if timeout is None else timeout
+
+    @contextmanager
+    def slot(self, model: str, priority: Priority = Priority.INTERACTIVE,
+             timeout: Optional[float] = None):
+        """
+        Esperar turno para model (bloqueante); el slot se libera al salir del bloque
+
+        Devuelve un Grant: anotar grant.tokens para el ajuste adaptativo
+
+        Raises:
+            JobRejected: cola llena o sin turno en timeout segundos
+        """
+        model, priority = model_key(model), Priority.parse(priority)
+        timeout = self._timeout(priority, timeout)
+        start = time.monotonic()
+        with self._cond:
+            lane = self._lane(model)
+            entry = self._enqueue(model, priority)
+            while not self._try_grant(lane, entry):
+                remaining = None if timeout is None else timeout - (time.monotonic() - start)
+                if remaining is not None and remaining <= 0:
+                    self._abandon(lane, entry, priority, timed_out=True)
+                    raise JobRejected(f"Sin turno en {model} tras {timeout:g}s")
+                self._cond.wait(remaining)
+            self._admitted(lane, priority, time.monotonic() - start)
+        grant = Grant()
+        try:
+            yield grant
+        finally:
+            self._release(model, grant)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, priority: Priority = Priority.INTERACTIVE,
+                    timeout: Optional[float] = None, poll: float = 0.02):
+        """slot() para asyncio: espera sin bloquear el event loop"""
+        model, priority = model_key(model), Priority.parse(priority)
+        timeout = self._timeout(priority, timeout)
+        start = time.monotonic()
+        with self._cond:
+            lane = self._lane(model)
+            entry = self._enqueue(model, priority)
+        try:
+            while True:
+                with self._cond:
+                    if self._try_grant(lane, entry):
+                        self._admitted(lane, priority, time.monotonic() - start)
+                        break
+                    if timeout is not None and time.monotonic() - start >= timeout:
+                        self._abandon(lane, entry, priority, timed_out=True)
+                        raise JobRejected(f"Sin turno en {model} tras {timeout:g}s")
+                await asyncio.sleep(poll)
+        except asyncio.CancelledError:
+            with self._cond:
+                if entry[2]:
+                    self._abandon(lane, entry, priority, timed_out=False)
+            raise
+        grant = Grant()
+        try:
+            yield grant
+        finally:
+            self._release(model, grant)
+
+    # === Métricas ===
+
+    def depth(self, model: str) -> int:
+        """Requests esperando turno en model"""
+        lane = self._lanes.get(model_key(model))
+        return sum(lane.queued.values()) if lane else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado por modelo (para dashboards)"""
+        with self._cond:
+            result = {}
+            for model, lane in self._lanes.items():
+                waits = sorted(lane.waits)
+                result[model] = {
+                    "limit": lane.limit,
+                    "max_limit": lane.max_limit,
+                    "tokens_per_s": lane.last_rate,
+                    "in_use": lane.in_use,
+                    "queued": {p.name.lower(): n for p, n in lane.queued.items()},
+                    "admitted": {p.name.lower(): n for p, n in lane.admitted.items()},
+                    "rejected": {p.name.lower(): n for p, n in lane.rejected.items()},
+                    "timed_out": {p.name.lower(): n for p, n in lane.timed_out.items()},
+                    "wait_avg_s": sum(waits) / len(waits) if waits else 0.0,
+                    "wait_p95_s": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                }
+            return result
+
+
+class ProxyAdmission:
+    """
+    Misma interfaz que JobQueue cuando el cliente apunta al proxy
+
+    slot()/aslot() no esperan: la prioridad viaja en el header X-Lumen-Priority
+    y el proxy decide el turno entre todos los procesos. depth()/snapshot()
+    leen /queue/stats del proxy (cacheado stats_ttl segundos).
+    """
+
+    def __init__(self, client: Optional[OllamaClient] = None, stats_ttl: float = 1.0):
+        self.client = client or get_client()
+        self.stats_ttl = stats_ttl
+        self._stats: Dict[str, Any] = {}
+        self._stats_at = float("-inf")
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, model: str, priority: Priority = Priority.INTERACTIVE,
+             timeout: Optional[float] = None):
+        yield Grant()
+
+    @asynccontextmanager
+    async def aslot(self, model: str, priority: Priority = Priority.INTERACTIVE,
+                    timeout: Optional[float] = None, poll: float = 0.02):
+        yield Grant()
+
+    def depth(self, model: str) -> int:
+        lane = self.snapshot().get(model_key(model))
+        return sum(lane["queued"].values()) if lane else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            if time.monotonic() - self._stats_at >= self.stats_ttl:
+                try:
+                    self._stats = self.client.request("GET", "/queue/stats", timeout=1)
+                except OllamaError:
+                    self._stats = {}
+                self._stats_at = time.monotonic()
+            return self._stats
+
+
+# Singleton compartido por proceso
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """JobQueue local, o ProxyAdmission si get_client() va por el proxy de la cola"""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = ProxyAdmission() if get_client().proxied else JobQueue()
+    return _job_queue
+
+
+# Cliente del proxy hacia Ollama (nunca hacia sí mismo)
+_upstream = None
+
+
+def upstream_client() -> OllamaClient:
+    global _upstream
+    if _upstream is None:
+        _upstream = OllamaClient(os.environ.get("LUMEN_OLLAMA_UPSTREAM", OLLAMA_URL),
+                                 max_connections=16)
+    return _upstream
+
+
+# === Proxy HTTP compatible con Ollama ===
+
+class QueueProxyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    POST /api/generate|chat|embed* -> cola con prioridad -> Ollama
+    GET /queue/stats -> snapshot; otros GET pasan directo (ps, tags)
+
+    Prioridad: header X-Lumen-Priority (interactive|normal|background), default normal.
+    Con "stream": false responde una sola línea JSON; si no, reenvía el NDJSON
+    de Ollama en chunks a medida que llega.
+    """
+
+    protocol_version = "HTTP/1.1"
+    QUEUED_PATHS = ("/api/generate", "/api/chat", "/api/embed", "/api/embeddings")
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            priority = Priority.parse(self.headers.get(PRIORITY_HEADER, "normal"))
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        if self.path not in self.QUEUED_PATHS:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            with get_job_queue().slot(payload.get("model", ""), priority) as grant:
+                if payload.get("stream", True) is False:
+                    result = upstream_client().request("POST", self.path, payload)
+                    grant.tokens = result.get("eval_count", 0)
+                    self._send_json(200, result)
+                else:
+                    grant.tokens = self._stream(payload)
+        except JobRejected as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "5"})
+        except OllamaError as e:
+            self._send_json(502, {"error": str(e)})
+
+    def _stream(self, payload: Dict[str, Any]) -> int:
+        """Reenviar el stream de Ollama (chunked); retorna eval_count del chunk final"""
+        chunks = upstream_client().stream(self.path, payload)
+        first = next(chunks, None)  # Errores antes del primer chunk -> 502
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = 0
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                tokens = chunk.get("eval_count", tokens) or tokens
+                self._write_chunk(chunk)
+        except OllamaError as e:
+            self._write_chunk({"error": str(e)})
+        finally:
+            chunks.close()  # Cliente desconectado: liberar la conexión a Ollama
+        self.wfile.write(b"0\r\n\r\n")
+        return tokens
+
+    def _write_chunk(self, data: Dict[str, Any]):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/queue/stats":
+            self._send_json(200, get_job_queue().snapshot())
+            return
+        try:
+            self._send_json(200, upstream_client().request("GET", self.path, timeout=10))
+        except OllamaError as e:
+            self._send_json(502, {"error": str(e)})
+
+    def _send_json(self, status: int, data: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data).encode() + b"\n"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Silenciar log por request
+
+
+def serve(host: str = "127.0.0.1", port: int = QUEUE_PROXY_PORT):
+    """Proxy de Ollama con la cola: scripts y cron pasan por los mismos límites"""
+    global _job_queue
+    _job_queue = JobQueue()  # La cola real vive acá (el proceso no se proxea a sí mismo)
+    server = http.server.ThreadingHTTPServer((host, port), QueueProxyHandler)
+    print(f"✅ Job queue proxy: http://{host}:{port} -> Ollama")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else QUEUE_PROXY_PORT)
+    else:
+        print("Usage:")
+        print("  python3 job_queue.py --serve [port]")
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+LumenAGI Memory Chunking v1.0
+Divide documentos en chunks antes de embeber
+
+- Markdown (skills): corte por headings, con breadcrumb de la sección
+- Transcripts (conversaciones): ventana deslizante de mensajes con overlap
+- Query time: agrupa los hits por documento padre (merge_chunk_hits)
+
+Cada chunk cabe en el contexto del modelo de embeddings, así no se paga por
+embeber texto que el modelo trunca de todas formas.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# ~4 chars por token: 1500 chars ≈ 384 tokens, holgado para nomic-embed-text
+CHUNK_MAX_CHARS = 1500
+CHUNK_OVERLAP = 200
+
+# Conversaciones: mensajes por ventana y mensajes compartidos entre ventanas
+TRANSCRIPT_WINDOW = 8
+TRANSCRIPT_OVERLAP = 2
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+
+
+@dataclass
+class Chunk:
+    """Fragmento de un documento padre"""
+    text: str
+    index: int
+    heading: str = ""
+
+
+def chunk_markdown(text: str, max_chars: int = CHUNK_MAX_CHARS,
+                   overlap: int = CHUNK_OVERLAP) -> List[Chunk]:
+    """
+    Chunking por headings de Markdown
+
+    Cada sección (#, ##, ...) es un chunk prefijado con su ruta de headings
+    ("Skill > Setup > Docker"). Secciones más largas que max_chars se
+    parten con ventana deslizante. Headings dentro de bloques ``` se ignoran.
+    """
+    sections = []
+    path: List[str] = []
+    current: List[str] = []
+    in_code = False
+
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else HEADING_RE.match(line)
+        if match:
+            sections.append((" > ".join(path), current))
+            level = len(match.group(1))
+            path = path[:level - 1] + [match.group(2)]
+            current = []
+        else:
+            current.append(line)
+    sections.append((" > ".join(path), current))
+
+    chunks = []
+    for heading, lines in sections:
+        body = "\n".join(lines).strip()
+        if not body:
+            continue  # Heading sin cuerpo: queda en el breadcrumb de sus hijos
+        for piece in split_window(body, max_chars - len(heading) - 1, overlap):
+            chunk_text = f"{heading}\n{piece}" if heading else piece
+            chunks.append(Chunk(text=chunk_text, index=len(chunks), heading=heading))
+
+    if not chunks and text.strip():
+        chunks.append(Chunk(text=text.strip()[:max_chars], index=0))
+    return chunks
+
+
+def chunk_transcript(messages: List[Dict[str, Any]], summary: Optional[str] = None,
+                     window: int = TRANSCRIPT_WINDOW, overlap: int = TRANSCRIPT_OVERLAP,
+                     max_chars: int = CHUNK_MAX_CHARS) -> List[Chunk]:
+    """
+    Chunking de conversaciones con ventana deslizante de mensajes
+
+    El resumen (si existe) va como chunk propio al inicio.
+    """
+    lines = [f"{m.get('role', 'unknown')}: {m.get('content', '')}" for m in messages]
+    chunks = []
+    if summary:
+        chunks.append(Chunk(text=f"SUMMARY: {summary}"[:max_chars], index=0, heading="summary"))
+
+    step = max(1, window - overlap)
+    for start in range(0, max(len(lines), 1), step):
+        window_text = "\n".join(lines[start:start + window]).strip()
+        for piece in split_window(window_text, max_chars, CHUNK_OVERLAP):
+            chunks.append(Chunk(text=piece, index=len(chunks),
+                                heading=f"messages {start}-{start + window - 1}"))
+        if start + window >= len(lines):
+            break
+    return chunks
+
+
+def split_window(text: str, max_chars: int = CHUNK_MAX_CHARS,
+                 overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Ventana deslizante por caracteres, cortando en saltos de línea cuando se puede"""
+    max_chars = max(1, max_chars)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            cut = text.rfind("\n", start + max_chars // 2, end)
+            if cut > start:
+                end = cut
+        piece = text[start:end].strip()
+        if piece:
+            pieces.append(piece)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return pieces
+
+
+def merge_chunk_hits(ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]],
+                     scores: List[float], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Agrupa hits de chunks en documentos padre
+
+    - score del documento = mejor score entre sus chunks
+    - content = chunks encontrados, en orden de aparición en el documento
+    - Filas sin parent_id (índices previos al chunking) cuentan como su propio padre
+
+    Returns:
+        Lista de {parent_id, score, metadata, content, chunks}, mejor score primero
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for doc_id, document, metadata, score in zip(ids, documents, metadatas, scores):
+        metadata = metadata or {}
+        parent_id = metadata.get("parent_id", doc_id)
+        group = groups.get(parent_id)
+        if group is None:
+            group = groups[parent_id] = {
+                "parent_id": parent_id, "score": score, "metadata": metadata, "chunks": []
+            }
+        elif score > group["score"]:
+            group["score"] = score
+            group["metadata"] = metadata
+        group["chunks"].append({
+            "index": metadata.get("chunk_index", 0), "text": document, "score": score
+        })
+
+    merged = sorted(groups.values(), key=lambda g: g["score"], reverse=True)
+    for group in merged:
+        group["chunks"].sort(key=lambda c: c["index"])
+        group["content"] = "\n\n".join(c["text"] for c in group["chunks"])
+    return merged[:limit] if limit is not None else merged
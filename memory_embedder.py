@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+LumenAGI Embedder Registry v1.0
+Un solo modelo de embeddings por proceso, cargado en el primer uso
+
+- get_embedder(name): embedder compartido por todas las LumenMemory y plugins
+- Servidor local opcional: un proceso mantiene el modelo caliente y los demás
+  le piden embeddings por HTTP (LUMEN_EMBED_SERVER=http://127.0.0.1:8790)
+
+Uso servidor:
+    python3 memory_embedder.py --serve [port]
+"""
+
+import json
+import http.client
+import http.server
+import os
+import sys
+import threading
+import urllib.parse
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+DEFAULT_MODEL = "nomic-ai/nomic-embed-text-v1.5"
+EMBED_SERVER_PORT = 8790
+
+# Si está definido, get_embedder() usa el servidor en vez de cargar el modelo
+EMBED_SERVER_URL = os.environ.get("LUMEN_EMBED_SERVER")
+
+Texts = Union[str, List[str]]
+
+
+class LazyEmbedder:
+    """
+    SentenceTransformer que se carga en el primer encode()
+
+    Thread-safe: si varios threads piden embeddings en frío, el modelo
+    se carga una sola vez.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    print(f"🧠 Cargando {self.model_name}...")
+                    self._model = SentenceTransformer(self.model_name, trust_remote_code=True)
+        return self._model
+
+    def encode(self, texts: Texts, **kwargs) -> np.ndarray:
+        return self._load().encode(texts, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._load().get_sentence_embedding_dimension()
+
+
+class RemoteEmbedder:
+    """Cliente del servidor de embeddings con la misma interfaz que LazyEmbedder"""
+
+    def __init__(self, url: str, model_name: str = DEFAULT_MODEL, timeout: float = 60.0):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or EMBED_SERVER_PORT
+        self.model_name = model_name
+        self.timeout = timeout
+        self._local = threading.local()  # Una conexión keep-alive por thread
+        self._dim = None
+
+    @property
+    def loaded(self) -> bool:
+        return True
+
+    def _request(self, path: str, payload: Dict) -> Dict:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        body = json.dumps(payload).encode()
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"Embed server HTTP {response.status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def encode(self, texts: Texts, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        result = self._request("/embed", {
+            "model": self.model_name,
+            "texts": [texts] if single else list(texts),
+            "batch_size": kwargs.get("batch_size", 32),
+        })
+        embeddings = np.asarray(result["embeddings"], dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = int(self.encode("dim").shape[-1])
+        return self._dim
+
+
+_registry: Dict[str, Union[LazyEmbedder, RemoteEmbedder]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_embedder(model_name: str = DEFAULT_MODEL,
+                 server_url: Optional[str] = None) -> Union[LazyEmbedder, RemoteEmbedder]:
+    """
+    Embedder compartido por proceso para model_name
+
+    No carga nada: el modelo se carga en el primer encode(). Con server_url
+    (o LUMEN_EMBED_SERVER) retorna un cliente del servidor de embeddings;
+    server_url="" fuerza el modelo local.
+    """
+    if server_url is None:
+        server_url = EMBED_SERVER_URL
+    key = f"{server_url}|{model_name}" if server_url else model_name
+    with _registry_lock:
+        if key not in _registry:
+            if server_url:
+                _registry[key] = RemoteEmbedder(server_url, model_name)
+            else:
+                _registry[key] = LazyEmbedder(model_name)
+        return _registry[key]
+
+
+# === Servidor de embeddings ===
+
+class EmbedHandler(http.server.BaseHTTPRequestHandler):
+    """POST /embed {model, texts, batch_size} -> {embeddings}"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if self.path != "/embed":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            embedder = get_embedder(payload.get("model", DEFAULT_MODEL), server_url="")
+            embeddings = embedder.encode(
+                payload["texts"], batch_size=payload.get("batch_size", 32), convert_to_numpy=True
+            )
+            self._send_json(200, {"embeddings": embeddings.tolist()})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self):
+        if self.path == "/health":
+            models = {name: e.loaded for name, e in _registry.items()}
+            self._send_json(200, {"status": "ok", "models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _send_json(self, status: int, data: Dict):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Silenciar log por request
+
+
+def serve(host: str = "127.0.0.1", port: int = EMBED_SERVER_PORT,
+          preload: str = DEFAULT_MODEL):
+    """Servidor de embeddings: mantiene el modelo caliente para otros procesos"""
+    if preload:
+        get_embedder(preload, server_url="").encode("warmup")
+    server = http.server.ThreadingHTTPServer((host, port), EmbedHandler)
+    print(f"✅ Embedding server: http://{host}:{port}/embed ({preload})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--serve":
+        serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else EMBED_SERVER_PORT)
+    else:
+        print("Usage:")
+        print("  python3 memory_embedder.py --serve [port]")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+LumenAGI Index Manifest v1.0
+Manifest de hashes de contenido para re-indexado incremental
+
+Guarda {fuente: {hash, ...}} junto a la base vectorial. Al re-indexar solo se
+re-embeben las fuentes nuevas o modificadas y se borran las eliminadas.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class IndexManifest:
+    """Manifest JSON de fuentes indexadas y su hash de contenido"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Manifest ilegible ({e}), se re-indexa todo")
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def diff(self, current: Dict[str, str]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Comparar hashes actuales contra el manifest
+
+        Args:
+            current: fuente -> hash del contenido actual
+
+        Returns:
+            (nuevas o modificadas, eliminadas, sin cambios)
+        """
+        changed, unchanged = [], []
+        for source, digest in current.items():
+            if self.entries.get(source, {}).get("hash") == digest:
+                unchanged.append(source)
+            else:
+                changed.append(source)
+        removed = [source for source in self.entries if source not in current]
+        return changed, removed, unchanged
+
+    def update(self, source: str, digest: str, **info):
+        self.entries[source] = {"hash": digest, **info}
+
+    def remove(self, source: str):
+        self.entries.pop(source, None)
+
+    def clear(self):
+        self.entries = {}
+
+    def save(self):
+        """Escritura atómica (tmp + rename) para no dejar un manifest a medias"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+        os.replace(tmp, self.path)
@@ -8,8 +8,11 @@ All local - no external APIs required.
 
 import os
 import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable
+
+from memory_chunking import chunk_markdown, merge_chunk_hits
+from memory_embedder import get_embedder
+from memory_manifest import IndexManifest
 
 # Configuration
 SKILLS_DIR = "/home/lumen/lumenagi-v3.0/skills"
@@ -28,18 +31,17 @@ class LumenMemory:
     
     def __init__(self, persist_dir: str = CHROMA_DB_DIR):
         self.persist_dir = persist_dir
-        # Use sentence-transformers to load nomic-embed-text
-        print("📦 Loading nomic-embed-text model (384 dims)...")
-        self.embedder = SentenceTransformer(
-            "nomic-ai/nomic-embed-text-v1",
-            trust_remote_code=True
-        )
-        self.dim = self.embedder.get_sentence_embedding_dimension()
-        print(f"✅ Model loaded: {self.dim} dimensions")
+        # Process-wide nomic-embed-text, loaded on first encode
+        self.embedder = get_embedder(EMBEDDING_MODEL)
         
         # Initialize ChromaDB
         os.makedirs(persist_dir, exist_ok=True)
         self.client = chromadb.PersistentClient(path=persist_dir)
+    
+    @property
+    def dim(self) -> int:
+        """Embedding dimensions (loads the model if it is not loaded yet)."""
+        return self.embedder.get_sentence_embedding_dimension()
         
     def get_or_create_collection(self, name: str = "skills"):
         """Get or create a collection with cosine similarity."""
@@ -70,18 +72,92 @@ class LumenMemory:
         prefixed = f"search_query: {query}"
         return self.embedder.encode(prefixed).tolist()
     
-    def load_skills(self, skills_dir: str = SKILLS_DIR) -> int:
-        """Load all skill files into ChromaDB."""
+    def index_documents(self, documents: Iterable[Dict], collection_name: str = "skills",
+                        batch_size: int = 16) -> int:
+        """
+        Bulk-ingest documents: encode in batches, write with one upsert per batch.
+
+        Args:
+            documents: Iterable of dicts with id, content and metadata.
+            collection_name: Target ChromaDB collection.
+            batch_size: Documents per forward pass / upsert.
+
+        Returns:
+            Number of documents written.
+        """
+        collection = self.get_or_create_collection(collection_name)
+        total = 0
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                total += self._upsert_batch(collection, batch)
+                batch = []
+        if batch:
+            total += self._upsert_batch(collection, batch)
+        return total
+
+    def _upsert_batch(self, collection, batch: List[Dict]) -> int:
+        """Embed a batch in one forward pass and upsert it."""
+        # Document prefix for nomic-embed-text
+        embeddings = self.embedder.encode(
+            [f"search_document: {doc['content']}" for doc in batch],
+            batch_size=len(batch)
+        ).tolist()
+        collection.upsert(
+            ids=[doc["id"] for doc in batch],
+            embeddings=embeddings,
+            documents=[doc["content"] for doc in batch],
+            metadatas=[doc["metadata"] for doc in batch]
+        )
+        return len(batch)
+
+    def load_skills(self, skills_dir: str = SKILLS_DIR, batch_size: int = 16,
+                    incremental: bool = True) -> int:
+        """
+        Load skill files into ChromaDB.
+
+        With incremental=True only files whose content hash changed since the
+        last run are re-embedded; deleted files are dropped from the index.
+        incremental=False clears the collection and rebuilds everything.
+        """
         collection = self.get_or_create_collection("skills")
+        manifest = IndexManifest(os.path.join(self.persist_dir, "skills_manifest.json"))
+        
+        if not incremental or collection.count() == 0:
+            # Clear existing
+            existing = collection.get()
+            if existing['ids']:
+                collection.delete(ids=existing['ids'])
+                print(f"🗑️ Cleared {len(existing['ids'])} existing documents")
+            manifest.clear()
         
-        # Clear existing
-        existing = collection.get()
-        if existing['ids']:
-            collection.delete(ids=existing['ids'])
-            print(f"🗑️ Cleared {len(existing['ids'])} existing documents")
+        contents = self._read_skill_files(skills_dir)
+        hashes = {filename: IndexManifest.content_hash(c) for filename, c in contents.items()}
+        changed, removed, unchanged = manifest.diff(hashes)
         
-        total_indexed = 0
+        # Drop stale chunks of modified and deleted files
+        for filename in changed + removed:
+            collection.delete(where={"filename": filename})
+            manifest.remove(filename)
         
+        documents = list(self._iter_skill_documents(
+            skills_dir, {filename: contents[filename] for filename in changed}
+        ))
+        total_chunks = self.index_documents(documents, "skills", batch_size)
+        
+        for filename in changed:
+            chunks = sum(1 for doc in documents if doc["metadata"]["parent_id"] == filename)
+            manifest.update(filename, hashes[filename], chunks=chunks)
+        manifest.save()
+        
+        print(f"\n✅ Skills: {len(changed)} re-indexed ({total_chunks} chunks), "
+              f"{len(removed)} removed, {len(unchanged)} unchanged")
+        return len(contents)
+
+    def _read_skill_files(self, skills_dir: str) -> Dict[str, str]:
+        """Read SKILL_FILES from disk: filename -> content."""
+        contents = {}
         for filename in SKILL_FILES:
             filepath = os.path.join(skills_dir, filename)
             if not os.path.exists(filepath):
@@ -89,11 +165,13 @@ class LumenMemory:
                 continue
                 
             with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Create document with prefix for nomic-embed-text
-            doc_prefix = f"search_document: {content}"
-            embedding = self.embedder.encode(doc_prefix).tolist()
+                contents[filename] = f.read()
+        return contents
+
+    def _iter_skill_documents(self, skills_dir: str, contents: Dict[str, str]) -> Iterable[Dict]:
+        """Yield one {id, content, metadata} document per heading-aware chunk of each skill file."""
+        for filename, content in contents.items():
+            filepath = os.path.join(skills_dir, filename)
             
             # Extract title from first h1 or use filename
             title = filename.replace('.md', '')
@@ -102,23 +180,22 @@ class LumenMemory:
                     title = line.replace('# ', '').strip()
                     break
             
-            # Add to collection with explicit embedding
-            collection.add(
-                ids=[filename],
-                embeddings=[embedding],
-                documents=[content],
-                metadatas=[{
-                    "filename": filename,
-                    "title": title,
-                    "source": filepath
-                }]
-            )
+            chunks = chunk_markdown(content)
+            for chunk in chunks:
+                yield {
+                    "id": f"{filename}#{chunk.index}",
+                    "content": chunk.text,
+                    "metadata": {
+                        "filename": filename,
+                        "title": title,
+                        "source": filepath,
+                        "parent_id": filename,
+                        "chunk_index": chunk.index,
+                        "heading": chunk.heading
+                    }
+                }
             
-            print(f"📝 Indexed: {title} ({filename})")
-            total_indexed += 1
-        
-        print(f"\n✅ Total skills indexed: {total_indexed}")
-        return total_indexed
+            print(f"📝 Indexed: {title} ({filename}, {len(chunks)} chunks)")
     
     def query(self, query_text: str, n_results: int = 3) -> List[Dict]:
         """Query the vector memory for skills."""
@@ -127,20 +204,29 @@ class LumenMemory:
         # Embed query with search_query prefix
         query_embedding = self.embed_query(query_text)
         
+        # Over-fetch chunks so several hits on one file don't crowd out others
         results = collection.query(
             query_embeddings=[query_embedding],
-            n_results=n_results,
+            n_results=n_results * 4,
             include=["documents", "metadatas", "distances"]
         )
         
+        docs = merge_chunk_hits(
+            results['ids'][0],
+            results['documents'][0],
+            results['metadatas'][0],
+            [1 - d for d in results['distances'][0]],
+            limit=n_results
+        )
+        
         matches = []
-        for i in range(len(results['ids'][0])):
+        for doc in docs:
             matches.append({
-                "id": results['ids'][0][i],
-                "document": results['documents'][0][i][:200] + "...",
-                "metadata": results['metadatas'][0][i],
-                "distance": results['distances'][0][i],
-                "similarity_score": 1 - results['distances'][0][i]
+                "id": doc["parent_id"],
+                "document": doc["content"][:200] + "...",
+                "metadata": doc["metadata"],
+                "distance": 1 - doc["score"],
+                "similarity_score": doc["score"]
             })
         
         return matches
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+LumenAGI Semantic Cache v1.0
+Cache de resultados RAG por similitud de embedding de la query
+
+Paráfrasis de la misma pregunta ("cómo reinicio Qwen" / "how do I restart
+Qwen") caen sobre la misma entrada si el coseno supera el threshold, así se
+evita el round-trip a ChromaDB. Índice en memoria: una matriz NumPy de
+embeddings normalizados, eviction LRU.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Índice vectorial pequeño de queries recientes -> resultado
+
+    - threshold: similitud coseno mínima para reutilizar un resultado
+    - namespace: separa resultados no intercambiables (ej: context_type)
+    - ttl: segundos de vida de cada entrada
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 256, ttl: float = 600.0):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), se crea con el 1er add
+        self._namespaces: List[Optional[str]] = [None] * self.max_entries
+        self._values: List[Any] = [None] * self.max_entries
+        self._expires = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def lookup(self, embedding, namespace: str = "") -> Optional[Tuple[Any, float]]:
+        """
+        Resultado cacheado más similar a embedding
+
+        Returns:
+            (resultado, similitud) si supera el threshold, si no None
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self.counters["misses"] += 1
+                return None
+
+            now = time.monotonic()
+            valid = np.array([ns == namespace for ns in self._namespaces]) & (self._expires > now)
+            if not valid.any():
+                self.counters["misses"] += 1
+                return None
+
+            similarities = np.where(valid, self._vectors @ query, -np.inf)
+            slot = int(np.argmax(similarities))
+            similarity = float(similarities[slot])
+            if similarity < self.threshold:
+                self.counters["misses"] += 1
+                return None
+
+            self._last_used[slot] = now
+            self.counters["hits"] += 1
+            return self._values[slot], similarity
+
+    def add(self, embedding, value: Any, namespace: str = ""):
+        """Guardar un resultado; reemplaza la entrada expirada o menos usada"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._reset()
+
+            now = time.monotonic()
+            # Slots libres/expirados primero (last_used = -inf), luego el LRU
+            priority = np.where(self._expires > now, self._last_used, -np.inf)
+            slot = int(np.argmin(priority))
+
+            self._vectors[slot] = vector
+            self._namespaces[slot] = namespace
+            self._values[slot] = value
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = now
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return int((self._expires > time.monotonic()).sum())
+
+    def _reset(self):
+        self._namespaces = [None] * self.max_entries
+        self._values = [None] * self.max_entries
+        self._expires[:] = 0
+        self._last_used[:] = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "entries": len(self),
+            "threshold": self.threshold,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            **self.counters
+        }
@@ -9,15 +9,20 @@ ChromaDB para almacenamiento vectorial local
 
 import json
 import hashlib
+import importlib.util
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
-import numpy as np
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 
-try:
-    from sentence_transformers import SentenceTransformer
-    CHROMA_AVAILABLE = True
-except ImportError:
-    CHROMA_AVAILABLE = False
+from memory_chunking import Chunk, chunk_markdown, chunk_transcript, merge_chunk_hits
+from memory_embedder import get_embedder
+from memory_manifest import IndexManifest
+
+# Solo comprobar que está instalado: importarlo carga torch (LazyEmbedder lo hace al primer encode)
+CHROMA_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+if not CHROMA_AVAILABLE:
     print("⚠️ sentence-transformers no instalado")
 
 try:
@@ -28,6 +33,21 @@ except ImportError:
     print("⚠️ chromadb no instalado")
 
 
+_chroma_clients: Dict[str, Any] = {}
+
+
+def _get_chroma_client(persist_dir: Path):
+    """PersistentClient compartido por path: abrir la DB una sola vez por proceso"""
+    key = str(persist_dir.resolve())
+    if key not in _chroma_clients:
+        print("💾 Inicializando ChromaDB...")
+        _chroma_clients[key] = chromadb.PersistentClient(
+            path=key,
+            settings=Settings(anonymized_telemetry=False)
+        )
+    return _chroma_clients[key]
+
+
 class LumenMemory:
     """
     Sistema de memoria vectorial para LumenAGI
@@ -37,23 +57,29 @@ class LumenMemory:
     - Almacenamiento ChromaDB local
     - RAG (Retrieval Augmented Generation) sobre skills
     - Búsqueda semántica en documentos
+    - Chunking: un embedding por sección/ventana, hits agrupados por documento
     """
     
+    # Chunks recuperados por cada documento pedido (antes de agrupar por padre)
+    CHUNK_OVERSAMPLE = 4
+    
+    # Documentos por colección en search_all / rag_query(context_type="all")
+    FANOUT_RESULTS = {"skills": 3, "conversations": 2, "memory": 2}
+    
     def __init__(self, persist_dir: str = "./memory_db"):
         self.persist_dir = Path(persist_dir)
         self.persist_dir.mkdir(exist_ok=True)
         
-        # Inicializar modelo de embeddings (nomic-embed-text)
-        # 384 dimensiones, optimizado para retrieval
-        print("🧠 Cargando nomic-embed-text...")
-        self.model = SentenceTransformer('nomic-ai/nomic-embed-text-v1.5', trust_remote_code=True)
+        # Versión del índice compartida entre instancias y procesos (cron de
+        # re-indexado incluido): archivo en persist_dir que cambia en cada escritura
+        self._version_path = self.persist_dir / "index_version"
         
-        # Inicializar ChromaDB
-        print("💾 Inicializando ChromaDB...")
-        self.client = chromadb.PersistentClient(
-            path=str(self.persist_dir),
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # Modelo de embeddings (nomic-embed-text) compartido por proceso
+        # 384 dimensiones, optimizado para retrieval. Se carga en el primer encode()
+        self.model = get_embedder('nomic-ai/nomic-embed-text-v1.5')
+        
+        # ChromaDB: un cliente por persist_dir, compartido entre instancias
+        self.client = _get_chroma_client(self.persist_dir)
         
         # Colecciones
         self.skills_collection = self.client.get_or_create_collection(
@@ -71,8 +97,25 @@ class LumenMemory:
             metadata={"description": "Long-term curated memories"}
         )
         
+        # Pool para consultar colecciones en paralelo (search_all)
+        self._query_pool: Optional[ThreadPoolExecutor] = None
+        
         print(f"✅ Memory System ready: {self.persist_dir}")
     
+    @property
+    def index_version(self) -> str:
+        """Versión actual del índice; los caches de queries la comparan por igualdad"""
+        try:
+            return self._version_path.read_text()
+        except OSError:
+            return ""
+    
+    def _bump_index_version(self):
+        """Nueva versión tras una escritura (tmp + rename: los lectores nunca ven un archivo a medias)"""
+        tmp = self._version_path.with_name(f"{self._version_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(f"{time.time_ns()}-{os.getpid()}")
+        os.replace(tmp, self._version_path)
+    
     def _generate_id(self, text: str, source: str) -> str:
         """Generar ID único basado en contenido"""
         content = f"{source}:{text[:100]}"
@@ -89,66 +132,169 @@ class LumenMemory:
         
         Returns:
             ID del documento insertado
+        
+        Raises:
+            ValueError: content vacío (no hay chunks que indexar)
         """
-        doc_id = self._generate_id(content, f"skill:{name}")
+        doc_id, records = self._skill_records(name, content, metadata)
+        if not records:
+            raise ValueError(f"Skill '{name}' sin contenido para indexar")
+        self._upsert_batches(self.skills_collection, records)
+        
+        print(f"💾 Skill '{name}' indexado (ID: {doc_id[:8]}...)")
+        return doc_id
+    
+    def add_skills(self, skills: Iterable[Dict[str, Any]], batch_size: int = 32) -> List[str]:
+        """
+        Ingesta masiva de skills: encode por batches + upsert por batch
         
-        # Generar embedding
-        embedding = self.model.encode(content, convert_to_numpy=True).tolist()
+        Args:
+            skills: Iterable de dicts {name, content, metadata (opcional)}
+            batch_size: Chunks por forward pass / upsert
         
-        # Metadata
+        Returns:
+            IDs de los documentos insertados, en orden (los skills vacíos se omiten)
+        """
+        records = (
+            record
+            for s in skills
+            for record in self._skill_records(s['name'], s['content'], s.get('metadata'))[1]
+        )
+        ids = self._upsert_batches(self.skills_collection, records, batch_size)
+        print(f"💾 {len(ids)} skills indexados (batches de {batch_size})")
+        return ids
+    
+    def remove_skill(self, name: str):
+        """Eliminar todos los chunks de un skill"""
+        self.skills_collection.delete(where={"name": name})
+        self._bump_index_version()
+    
+    def _skill_records(self, name: str, content: str,
+                       metadata: Dict[str, Any] = None
+                       ) -> Tuple[str, List[Tuple[str, str, str, Dict[str, Any]]]]:
+        """
+        ID del documento y registros (id, texto a embeber, documento a guardar,
+        metadata) por chunk de un skill; sin registros si content está vacío
+        """
+        doc_id = self._generate_id(content, f"skill:{name}")
         doc_metadata = {
             "type": "skill",
             "name": name,
             "source": f"skills/{name}.md",
             **(metadata or {})
         }
+        return doc_id, self._chunk_records(doc_id, chunk_markdown(content), doc_metadata)
+    
+    def _chunk_records(self, parent_id: str, chunks: List[Chunk],
+                       metadata: Dict[str, Any]) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+        """Un registro por chunk, con metadata del documento padre"""
+        return [
+            (f"{parent_id}:{chunk.index}", chunk.text, chunk.text, {
+                **metadata,
+                "parent_id": parent_id,
+                "chunk_index": chunk.index,
+                "chunk_count": len(chunks),
+                "heading": chunk.heading
+            })
+            for chunk in chunks
+        ]
+    
+    def _upsert_batches(self, collection, records: Iterable[Tuple[str, str, str, Dict[str, Any]]],
+                        batch_size: int = 32) -> List[str]:
+        """
+        Embeber y escribir registros en batches
         
-        # Insertar
-        self.skills_collection.add(
-            ids=[doc_id],
-            embeddings=[embedding],
-            documents=[content[:8000]],  # Límite de ChromaDB
-            metadatas=[doc_metadata]
-        )
+        Un solo model.encode y un solo collection.upsert por batch,
+        en vez de un forward pass y un add por documento.
         
-        print(f"💾 Skill '{name}' indexado (ID: {doc_id[:8]}...)")
-        return doc_id
+        Returns:
+            IDs de documentos padre escritos, en orden y sin repetir
+        """
+        parent_ids = {}
+        batch = []
+        for record in records:
+            batch.append(record)
+            parent_ids.setdefault(record[3].get("parent_id", record[0]))
+            if len(batch) >= batch_size:
+                self._flush_batch(collection, batch)
+                batch = []
+        if batch:
+            self._flush_batch(collection, batch)
+        return list(parent_ids)
+    
+    def _flush_batch(self, collection, batch: List[Tuple[str, str, str, Dict[str, Any]]]) -> List[str]:
+        """Encode + upsert de un batch"""
+        ids = [r[0] for r in batch]
+        embeddings = self.model.encode(
+            [r[1] for r in batch], batch_size=len(batch), convert_to_numpy=True
+        ).tolist()
+        collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=[r[2] for r in batch],
+            metadatas=[r[3] for r in batch]
+        )
+        self._bump_index_version()
+        return ids
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding de una query (reutilizable entre búsquedas)"""
+        return self.model.encode(query, convert_to_numpy=True).tolist()
     
-    def search_skills(self, query: str, n_results: int = 3) -> List[Dict[str, Any]]:
+    def search_skills(self, query: str, n_results: int = 3,
+                      query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """
         Buscar skills relevantes para una query
         
         Args:
             query: Texto de búsqueda
             n_results: Cuántos resultados retornar
+            query_embedding: Embedding ya calculado de la query (evita re-encode)
         
         Returns:
             Lista de skills con score de relevancia
         """
+        skills = []
+        for doc in self._query_documents(self.skills_collection, query, n_results,
+                                         query_embedding):
+            skills.append({
+                "id": doc['parent_id'],
+                "name": doc['metadata'].get('name', 'unknown'),
+                "content": doc['content'],
+                "score": doc['score'],
+                "metadata": doc['metadata'],
+                "chunks": [c['index'] for c in doc['chunks']]
+            })
+        
+        return skills
+    
+    def _query_documents(self, collection, query: str, n_results: int,
+                         query_embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Buscar chunks y agruparlos en documentos padre
+        
+        Pide n_results * CHUNK_OVERSAMPLE chunks para que varios hits del
+        mismo documento no dejen fuera a otros documentos relevantes.
+        """
         # Generar embedding de la query
-        query_embedding = self.model.encode(query, convert_to_numpy=True).tolist()
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
         
-        # Buscar
-        results = self.skills_collection.query(
+        results = collection.query(
             query_embeddings=[query_embedding],
-            n_results=n_results,
+            n_results=n_results * self.CHUNK_OVERSAMPLE,
             include=["documents", "metadatas", "distances"]
         )
         
-        # Formatear resultados
-        skills = []
-        if results['ids'][0]:
-            for i, doc_id in enumerate(results['ids'][0]):
-                skill = {
-                    "id": doc_id,
-                    "name": results['metadatas'][0][i].get('name', 'unknown'),
-                    "content": results['documents'][0][i],
-                    "score": 1 - results['distances'][0][i],  # Convertir distancia a score
-                    "metadata": results['metadatas'][0][i]
-                }
-                skills.append(skill)
-        
-        return skills
+        if not results['ids'][0]:
+            return []
+        return merge_chunk_hits(
+            results['ids'][0],
+            results['documents'][0],
+            results['metadatas'][0],
+            [1 - d for d in results['distances'][0]],  # Convertir distancia a score
+            limit=n_results
+        )
     
     def add_conversation(self, session_id: str, messages: List[Dict], summary: str = None):
         """
@@ -159,78 +305,160 @@ class LumenMemory:
             messages: Lista de mensajes {role, content, timestamp}
             summary: Resumen opcional de la conversación
         """
-        # Combinar mensajes en un documento
-        conversation_text = "\n".join([
-            f"{m.get('role', 'unknown')}: {m.get('content', '')}"
-            for m in messages
-        ])
-        
-        if summary:
-            conversation_text = f"SUMMARY: {summary}\n\n{conversation_text}"
-        
-        doc_id = f"conv:{session_id}"
-        embedding = self.model.encode(conversation_text, convert_to_numpy=True).tolist()
-        
-        self.conversations_collection.add(
-            ids=[doc_id],
-            embeddings=[embedding],
-            documents=[conversation_text[:8000]],
-            metadatas=[{
-                "type": "conversation",
-                "session_id": session_id,
-                "message_count": len(messages)
-            }]
+        self._upsert_batches(
+            self.conversations_collection,
+            self._conversation_records(session_id, messages, summary)
         )
         
         print(f"💾 Conversación '{session_id}' indexada")
     
-    def search_conversations(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Buscar en historial de conversaciones"""
-        query_embedding = self.model.encode(query, convert_to_numpy=True).tolist()
+    def add_conversations(self, conversations: Iterable[Dict[str, Any]],
+                          batch_size: int = 32) -> List[str]:
+        """
+        Ingesta masiva de conversaciones (mismo pipeline que add_skills)
         
-        results = self.conversations_collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            include=["documents", "metadatas", "distances"]
+        Args:
+            conversations: Iterable de dicts {session_id, messages, summary (opcional)}
+            batch_size: Chunks por forward pass / upsert
+        """
+        records = (
+            record
+            for c in conversations
+            for record in self._conversation_records(c['session_id'], c['messages'], c.get('summary'))
         )
-        
+        ids = self._upsert_batches(self.conversations_collection, records, batch_size)
+        print(f"💾 {len(ids)} conversaciones indexadas (batches de {batch_size})")
+        return ids
+    
+    def _conversation_records(self, session_id: str, messages: List[Dict],
+                              summary: str = None) -> List[Tuple[str, str, str, Dict[str, Any]]]:
+        """Registros por ventana de mensajes de una conversación"""
+        return self._chunk_records(f"conv:{session_id}", chunk_transcript(messages, summary), {
+            "type": "conversation",
+            "session_id": session_id,
+            "message_count": len(messages)
+        })
+    
+    def search_conversations(self, query: str, n_results: int = 5,
+                             query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Buscar en historial de conversaciones"""
         conversations = []
-        if results['ids'][0]:
-            for i, doc_id in enumerate(results['ids'][0]):
-                conv = {
-                    "id": doc_id,
-                    "session_id": results['metadatas'][0][i].get('session_id'),
-                    "content": results['documents'][0][i],
-                    "score": 1 - results['distances'][0][i]
-                }
-                conversations.append(conv)
+        for doc in self._query_documents(self.conversations_collection, query, n_results,
+                                         query_embedding):
+            conversations.append({
+                "id": doc['parent_id'],
+                "session_id": doc['metadata'].get('session_id'),
+                "content": doc['content'],
+                "score": doc['score']
+            })
         
         return conversations
     
-    def rag_query(self, query: str, context_type: str = "skills") -> Dict[str, Any]:
+    def search_memory(self, query: str, n_results: int = 3,
+                      query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """Buscar en memorias curadas de largo plazo"""
+        memories = []
+        for doc in self._query_documents(self.memory_collection, query, n_results,
+                                         query_embedding):
+            memories.append({
+                "id": doc['parent_id'],
+                "content": doc['content'],
+                "score": doc['score'],
+                "metadata": doc['metadata']
+            })
+        
+        return memories
+    
+    def search_all(self, query: str, n_results: Dict[str, int] = None,
+                   query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """
+        Fan-out: un solo embedding, las colecciones consultadas en paralelo
+        
+        Args:
+            query: Texto de búsqueda
+            n_results: Resultados por colección (default: FANOUT_RESULTS)
+            query_embedding: Embedding ya calculado de la query
+        
+        Returns:
+            Dict {skills, conversations, memory, merged}. merged contiene todos
+            los hits con 'source' y 'normalized_score' (min-max global sobre
+            los hits de todas las colecciones), mejor primero.
+        """
+        n_results = {**self.FANOUT_RESULTS, **(n_results or {})}
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        
+        searches = {
+            "skills": self.search_skills,
+            "conversations": self.search_conversations,
+            "memory": self.search_memory
+        }
+        futures = {
+            source: self._get_query_pool().submit(
+                search, query, n_results[source], query_embedding
+            )
+            for source, search in searches.items()
+        }
+        results = {source: future.result() for source, future in futures.items()}
+        
+        # Mismo embedding y misma métrica en todas las colecciones: una sola escala
+        merged = [{**hit, "source": source} for source, hits in results.items() for hit in hits]
+        for hit, score in zip(merged, self._normalize_scores([h['score'] for h in merged])):
+            hit["normalized_score"] = score
+        merged.sort(key=lambda h: (h['normalized_score'], h['score']), reverse=True)
+        
+        return {**results, "merged": merged}
+    
+    @staticmethod
+    def _normalize_scores(scores: List[float]) -> List[float]:
+        """
+        Min-max a [0, 1]; con un solo hit (o todos iguales) todos valen 1.0
+        """
+        if not scores:
+            return []
+        low, high = min(scores), max(scores)
+        if high - low < 1e-9:
+            return [1.0] * len(scores)
+        return [(s - low) / (high - low) for s in scores]
+    
+    def _get_query_pool(self) -> ThreadPoolExecutor:
+        if self._query_pool is None:
+            self._query_pool = ThreadPoolExecutor(max_workers=len(self.FANOUT_RESULTS),
+                                                  thread_name_prefix="memory-query")
+        return self._query_pool
+    
+    def rag_query(self, query: str, context_type: str = "skills",
+                  query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """
         RAG completo: retrieve + augment + generate context
         
         Args:
             query: Pregunta del usuario
             context_type: 'skills', 'conversations', o 'all'
+            query_embedding: Embedding ya calculado de la query
         
         Returns:
             Dict con contexto recuperado y query mejorada
         """
         context_parts = []
         
-        if context_type in ["skills", "all"]:
-            skills = self.search_skills(query, n_results=3)
+        if context_type == "all":
+            # Un solo encode + las tres colecciones en paralelo
+            for hit in self.search_all(query, query_embedding=query_embedding)['merged']:
+                if hit['score'] > 0.7:  # Umbral de relevancia (score crudo)
+                    context_parts.append(self._format_context(hit))
+        
+        if context_type == "skills":
+            skills = self.search_skills(query, n_results=3, query_embedding=query_embedding)
             for skill in skills:
                 if skill['score'] > 0.7:  # Umbral de relevancia
-                    context_parts.append(f"SKILL: {skill['name']}\n{skill['content'][:500]}")
+                    context_parts.append(self._format_context({**skill, "source": "skills"}))
         
-        if context_type in ["conversations", "all"]:
-            convs = self.search_conversations(query, n_results=2)
+        if context_type == "conversations":
+            convs = self.search_conversations(query, n_results=2, query_embedding=query_embedding)
             for conv in convs:
                 if conv['score'] > 0.7:
-                    context_parts.append(f"PREVIOUS CONTEXT:\n{conv['content'][:300]}")
+                    context_parts.append(self._format_context({**conv, "source": "conversations"}))
         
         # Construir contexto
         context = "\n\n---\n\n".join(context_parts) if context_parts else "No relevant context found."
@@ -242,11 +470,30 @@ class LumenMemory:
             "augmented_prompt": f"Context:\n{context}\n\nQuestion: {query}\n\nAnswer based on the context above:"
         }
     
+    @staticmethod
+    def _format_context(hit: Dict[str, Any]) -> str:
+        """Bloque de contexto para un hit según su colección"""
+        if hit['source'] == "skills":
+            return f"SKILL: {hit['name']}\n{hit['content'][:500]}"
+        if hit['source'] == "conversations":
+            return f"PREVIOUS CONTEXT:\n{hit['content'][:300]}"
+        return f"MEMORY:\n{hit['content'][:300]}"
+    
+    def _count_documents(self, collection) -> int:
+        """Documentos padre distintos en una colección chunked"""
+        result = collection.get(include=["metadatas"])
+        return len({
+            (metadata or {}).get("parent_id", doc_id)
+            for doc_id, metadata in zip(result['ids'], result['metadatas'])
+        })
+    
     def stats(self) -> Dict[str, Any]:
         """Estadísticas del sistema de memoria"""
         return {
-            "skills_count": self.skills_collection.count(),
-            "conversations_count": self.conversations_collection.count(),
+            "skills_count": self._count_documents(self.skills_collection),
+            "skills_chunks": self.skills_collection.count(),
+            "conversations_count": self._count_documents(self.conversations_collection),
+            "conversations_chunks": self.conversations_collection.count(),
             "memory_count": self.memory_collection.count(),
             "embedding_model": "nomic-embed-text-v1.5",
             "embedding_dims": 384,
@@ -254,29 +501,54 @@ class LumenMemory:
         }
 
 
-def index_all_skills(memory: LumenMemory, skills_dir: str = "./skills"):
+def index_all_skills(memory: LumenMemory, skills_dir: str = "./skills", batch_size: int = 32,
+                     force: bool = False):
     """
-    Indexar todos los archivos de skills en el directorio
+    Indexar los archivos de skills del directorio (incremental)
+    
+    Mantiene un manifest de hashes en persist_dir: solo re-embebe skills
+    nuevos o modificados y borra los eliminados. force=True re-indexa todo.
     """
     skills_path = Path(skills_dir)
     if not skills_path.exists():
         print(f"⚠️ Directorio {skills_dir} no existe")
         return
     
-    for skill_file in skills_path.glob("*.md"):
-        name = skill_file.stem
-        content = skill_file.read_text()
-        
-        # Extraer metadata del markdown
-        metadata = {"file_size": len(content)}
-        if "## What It Does" in content:
-            metadata["has_description"] = True
-        if "## Code" in content:
-            metadata["has_code"] = True
-        
-        memory.add_skill(name, content, metadata)
+    manifest = IndexManifest(memory.persist_dir / "skills_manifest.json")
+    if force or memory.skills_collection.count() == 0:
+        manifest.clear()
+    
+    contents = {f.stem: f.read_text() for f in sorted(skills_path.glob("*.md"))}
+    hashes = {name: IndexManifest.content_hash(c) for name, c in contents.items()}
+    changed, removed, unchanged = manifest.diff(hashes)
+    
+    # Chunks viejos de skills modificados/eliminados (o de un índice sin manifest)
+    for name in changed + removed:
+        memory.remove_skill(name)
+        manifest.remove(name)
+    
+    def iter_skills():
+        for name in changed:
+            content = contents[name]
+            
+            # Extraer metadata del markdown
+            metadata = {"file_size": len(content)}
+            if "## What It Does" in content:
+                metadata["has_description"] = True
+            if "## Code" in content:
+                metadata["has_code"] = True
+            
+            yield {"name": name, "content": content, "metadata": metadata}
+    
+    if changed:
+        memory.add_skills(iter_skills(), batch_size=batch_size)
+    
+    for name in changed:
+        manifest.update(name, hashes[name])
+    manifest.save()
     
-    print(f"✅ Indexados {memory.stats()['skills_count']} skills")
+    print(f"✅ Skills: {len(changed)} re-indexados, {len(removed)} eliminados, "
+          f"{len(unchanged)} sin cambios")
 
 
 # Demo
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Metric History v1.0 — Históricos de métricas multi-resolución sobre NumPy
+Reemplaza los deque de floats/dicts de los dashboards (60-300 puntos, todo lo
+anterior a 5 minutos se perdía):
+
+- RingBuffer: array NumPy de capacidad fija; append O(1) y los últimos n
+  puntos siempre como vista contigua (cada fila se escribe dos veces)
+- TieredSeries: una métrica en varios tiers
+    1 s  x 300   (5 min, muestras crudas del collector a 1 Hz)
+    10 s x 360   (1 h, rollup min/avg/max)
+    60 s x 1440  (24 h, rollup min/avg/max)
+  Compatible con deque (append, iteración, len, maxlen) sobre el tier fino,
+  así DeltaStream y los emitters la usan sin cambios.
+  Las ventanas incluyen el bucket en curso de cada tier (parcial) y un lock
+  por serie separa append (thread del emitter) de las lecturas (/api/history).
+
+Uso:
+    gpu = TieredSeries()
+    gpu.append(87.0)
+    gpu.window(3600)     # tier de 10 s: {'resolution', 't', 'avg', 'min', 'max'}
+    gpu.rollup(86400)    # {'min', 'avg', 'max'} de las últimas 24 h
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (resolución en segundos, puntos); el primero guarda las muestras crudas
+DEFAULT_TIERS: Tuple[Tuple[int, int], ...] = ((1, 300), (10, 360), (60, 1440))
+
+AVG, MIN, MAX, COUNT = range(4)
+
+
+class RingBuffer:
+    """
+    Ring de filas de ancho fijo
+
+    El array tiene 2 x capacity filas y cada append escribe la fila en i e
+    i + capacity: los últimos n puntos son siempre data[end + capacity - n:
+    end + capacity], una vista sin copia en orden cronológico.
+    """
+
+    def __init__(self, capacity: int, width: int = 1, dtype=np.float64):
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, width), dtype=dtype)
+        self._end = 0  # Próxima posición a escribir, en [0, capacity)
+        self.count = 0  # Total de appends (no se reinicia al dar la vuelta)
+
+    def append(self, row):
+        self._data[self._end] = row
+        self._data[self._end + self.capacity] = row
+        self._end = (self._end + 1) % self.capacity
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def last(self, n: Optional[int] = None) -> np.ndarray:
+        """Vista (n, width) de los últimos n puntos, del más viejo al más nuevo"""
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        stop = self._end + self.capacity
+        return self._data[stop - n:stop]
+
+
+class Tier:
+    """
+    Un nivel de resolución: timestamps + (avg, min, max, count) por punto
+
+    El tier crudo agrega cada muestra tal cual; los demás acumulan el bucket
+    en curso y lo cierran cuando llega una muestra del bucket siguiente.
+    """
+
+    def __init__(self, resolution: float, capacity: int, raw: bool = False):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.raw = raw
+        self.times = RingBuffer(capacity)
+        self.stats = RingBuffer(capacity, width=4)
+        self._bucket: Optional[float] = None
+        self._sum = 0.0
+        self._count = 0
+        self._min = self._max = 0.0
+
+    def add(self, ts: float, value: float):
+        if self.raw:
+            self.times.append(ts)
+            self.stats.append((value, value, value, 1))
+            return
+        bucket = ts // self.resolution
+        if bucket != self._bucket:
+            self.flush()
+            self._bucket = bucket
+            self._min = self._max = value
+        self._sum += value
+        self._count += 1
+        self._min = min(self._min, value)
+        self._max = max(self._max, value)
+
+    def flush(self):
+        """Cerrar el bucket en curso (si tiene muestras)"""
+        if not self._count:
+            return
+        self.times.append(self._bucket * self.resolution)
+        self.stats.append((self._sum / self._count, self._min, self._max, self._count))
+        self._sum = 0.0
+        self._count = 0
+
+    @property
+    def span(self) -> float:
+        return self.resolution * self.capacity
+
+    def since(self, start: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (times, stats) de los puntos con timestamp >= start, incluido el bucket
+        en curso (parcial) para que la ventana llegue hasta la última muestra
+        """
+        times = self.times.last()[:, 0]
+        first = int(np.searchsorted(times, start, side="left"))
+        times, stats = times[first:], self.stats.last()[first:]
+        if self._count and self._bucket * self.resolution >= start:
+            times = np.append(times, self._bucket * self.resolution)
+            stats = np.vstack([stats, (self._sum / self._count, self._min, self._max, self._count)])
+        return times, stats
+
+
+class TieredSeries:
+    """
+    Histórico de una métrica en varias resoluciones
+
+    Args:
+        tiers: (resolución en s, puntos) de más fino a más grueso; el primero
+            guarda las muestras crudas (una por append)
+    """
+
+    def __init__(self, tiers: Sequence[Tuple[float, int]] = DEFAULT_TIERS):
+        self.tiers = [Tier(resolution, capacity, raw=(i == 0))
+                      for i, (resolution, capacity) in enumerate(tiers)]
+        self._lock = threading.Lock()
+
+    def append(self, value: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for tier in self.tiers:
+                tier.add(ts, value)
+
+    # Interfaz de deque sobre el tier fino (DeltaStream, emitters)
+    @property
+    def maxlen(self) -> int:
+        return self.tiers[0].capacity
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.tiers[0].stats)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.values().tolist())
+
+    def values(self, n: Optional[int] = None) -> np.ndarray:
+        """Copia de los últimos n valores crudos"""
+        with self._lock:
+            return self.tiers[0].stats.last(n)[:, AVG].copy()
+
+    def tier_for(self, seconds: float) -> Tier:
+        """Tier más fino que cubre la ventana (el más grueso si ninguno alcanza)"""
+        for tier in self.tiers:
+            if tier.span >= seconds:
+                return tier
+        return self.tiers[-1]
+
+    def window(self, seconds: float, now: Optional[float] = None) -> Dict[str, Any]:
+        """Puntos de la ventana en la resolución adecuada (listas para JSON)"""
+        now = time.time() if now is None else now
+        tier = self.tier_for(seconds)
+        with self._lock:
+            times, stats = tier.since(now - seconds)
+            return {
+                "resolution": tier.resolution,
+                "t": times.tolist(),
+                "avg": stats[:, AVG].tolist(),
+                "min": stats[:, MIN].tolist(),
+                "max": stats[:, MAX].tolist(),
+            }
+
+    def rollup(self, seconds: float, now: Optional[float] = None) -> Optional[Dict[str, float]]:
+        """min / avg (ponderado por muestras) / max de la ventana; None sin datos"""
+        now = time.time() if now is None else now
+        with self._lock:
+            _, stats = self.tier_for(seconds).since(now - seconds)
+            if not len(stats):
+                return None
+            counts = stats[:, COUNT]
+            return {
+                "min": float(stats[:, MIN].min()),
+                "avg": float((stats[:, AVG] * counts).sum() / counts.sum()),
+                "max": float(stats[:, MAX].max()),
+            }
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+Metrics Collector v1.0 — Un solo muestreo de métricas para todos los dashboards
+El collector toma GPU (NVML), sistema (psutil) y modelos Ollama (/api/ps) una
+vez por intervalo y publica cada muestra en un ring buffer en memoria
+compartida (/dev/shm). Cualquier número de procesos Flask/SocketIO lo lee sin
+volver a muestrear: el costo de monitoreo no depende de cuántos dashboards o
+pestañas haya abiertos.
+
+- Un único collector por máquina: lo elige un flock sobre el archivo .lock.
+  Puede ser el daemon (--serve) o, si no corre, el primer dashboard que lo pida
+- Si el proceso collector muere, el kernel libera el lock y el siguiente
+  lector que note el ring sin actualizar toma el relevo
+- Lectura con seq por slot (estilo seqlock): nunca devuelve un slot a medio escribir
+
+Uso:
+    feed = get_metrics_feed()
+    sample = feed.next(last_seq, timeout=5)   # bloquea hasta la próxima muestra
+    gpu = primary_gpu(sample)                 # GPUSample o None
+
+CLI:
+    python metrics_collector.py --serve [--interval 1.0]
+    python metrics_collector.py --tail
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+    print("⚠️ psutil no instalado (métricas de sistema deshabilitadas)")
+
+sys.path.insert(0, str(Path(__file__).parent))
+from gpu_telemetry import GPUSample, GPUSampler
+from ollama_client import get_client
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+DEFAULT_RING_PATH = os.environ.get("LUMEN_METRICS_RING", os.path.join(_SHM_DIR, "lumen_metrics"))
+
+DEFAULT_SLOTS = 64
+DEFAULT_SLOT_SIZE = 32 * 1024
+
+# Procesos que los dashboards muestran (clave, nombre visible, regex sobre la línea de comando)
+WATCHED_PROCESSES = [
+    ("ollama", "🦙 Ollama", r"ollama"),
+    ("dashboard", "📊 Dashboard", r"python.*dashboard"),
+    ("gateway", "🔌 OpenClaw", r"openclaw"),
+    ("browser", "🌐 Chromium", r"chrome.*chrome-shelf"),
+]
+
+_MAGIC = b"LUMENMX1"
+_HEADER = struct.Struct("<8sIIQd")  # magic, slots, slot_size, head_seq, heartbeat
+_SLOT = struct.Struct("<QI")        # seq, length
+
+
+class MetricsRing:
+    """
+    Ring buffer de muestras JSON sobre un archivo mmap (memoria compartida)
+
+    Un escritor, N lectores. Cada slot lleva su seq: el escritor lo pone en 0
+    antes de escribir y en el seq nuevo al terminar; el lector descarta el slot
+    si el seq cambió durante la copia.
+    """
+
+    def __init__(self, path: str = DEFAULT_RING_PATH, slots: int = DEFAULT_SLOTS,
+                 slot_size: int = DEFAULT_SLOT_SIZE, writer: bool = False):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.writer = writer
+        self._mm: Optional[mmap.mmap] = None
+        self._inode = None
+
+    @property
+    def size(self) -> int:
+        return _HEADER.size + self.slots * self.slot_size
+
+    def open(self) -> bool:
+        """Mapear el archivo; False si (como lector) todavía no existe o no está inicializado"""
+        if self.writer:
+            if not self._matching_file():
+                self._create_file()
+            fd = os.open(self.path, os.O_RDWR)
+            try:
+                self._mm = mmap.mmap(fd, self.size)
+                self._inode = os.fstat(fd).st_ino
+            finally:
+                os.close(fd)
+            return True
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            stat = os.fstat(fd)
+            if stat.st_size < _HEADER.size:
+                return False
+            mm = mmap.mmap(fd, stat.st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, slots, slot_size, _, _ = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or mm.size() < _HEADER.size + slots * slot_size:
+            mm.close()
+            return False
+        self._mm, self._inode = mm, stat.st_ino
+        self.slots, self.slot_size = slots, slot_size
+        return True
+
+    def _matching_file(self) -> bool:
+        """El archivo existe con esta geometría: el escritor lo reusa en su lugar"""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(_HEADER.size)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            return False
+        if len(header) < _HEADER.size or size != self.size:
+            return False
+        magic, slots, slot_size, _, _ = _HEADER.unpack(header)
+        return (magic, slots, slot_size) == (_MAGIC, self.slots, self.slot_size)
+
+    def _create_file(self):
+        """
+        Ring vacío en un archivo temporal y os.replace sobre path
+
+        Nunca se trunca el archivo en uso: un lector con el mapeo viejo recibiría
+        SIGBUS; con otro inode, stale_mapping() le indica que vuelva a abrir.
+        """
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, _HEADER.pack(_MAGIC, self.slots, self.slot_size, 0, 0.0), 0)
+        finally:
+            os.close(fd)
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def stale_mapping(self) -> bool:
+        """El archivo fue recreado (otro inode): hay que volver a abrir"""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    # === Header ===
+
+    def head(self) -> int:
+        return _HEADER.unpack_from(self._mm, 0)[3]
+
+    def heartbeat(self) -> float:
+        return _HEADER.unpack_from(self._mm, 0)[4]
+
+    # === Escritura / lectura ===
+
+    def _offset(self, seq: int) -> int:
+        return _HEADER.size + (seq % self.slots) * self.slot_size
+
+    def publish(self, sample: Dict[str, Any]) -> int:
+        """Escribir una muestra en el siguiente slot; retorna su seq"""
+        seq = self.head() + 1
+        sample["seq"] = seq
+        payload = json.dumps(sample, separators=(",", ":"), default=str).encode()
+        if len(payload) > self.slot_size - _SLOT.size:
+            raise ValueError(f"Muestra de {len(payload)} bytes excede el slot ({self.slot_size})")
+
+        offset = self._offset(seq)
+        _SLOT.pack_into(self._mm, offset, 0, 0)  # Slot inválido mientras se escribe
+        start = offset + _SLOT.size
+        self._mm[start:start + len(payload)] = payload
+        _SLOT.pack_into(self._mm, offset, seq, len(payload))
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self.slots, self.slot_size, seq, time.time())
+        return seq
+
+    def read(self, seq: int) -> Optional[Dict[str, Any]]:
+        """Muestra `seq` si sigue en el ring y no se está sobrescribiendo"""
+        if seq <= 0:
+            return None
+        offset = self._offset(seq)
+        seq_before, length = _SLOT.unpack_from(self._mm, offset)
+        if seq_before != seq or length > self.slot_size - _SLOT.size:
+            return None
+        start = offset + _SLOT.size
+        payload = self._mm[start:start + length]
+        if _SLOT.unpack_from(self._mm, offset)[0] != seq:
+            return None  # Sobrescrito durante la copia
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+
+class MetricsCollector:
+    """
+    Muestreo único de GPU + sistema + Ollama, publicado en un MetricsRing
+
+    Solo corre si obtiene el lock del ring (un collector por máquina).
+    """
+
+    def __init__(self, ring_path: str = DEFAULT_RING_PATH, interval: float = 1.0,
+                 gpu_sampler: Optional[GPUSampler] = None):
+        self.ring_path = ring_path
+        self.interval = interval
+        self.gpu_sampler = gpu_sampler
+        self._lock_fd: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._watched = [(key, name, re.compile(pattern)) for key, name, pattern in WATCHED_PROCESSES]
+
+    # === Elección ===
+
+    def acquire(self, block: bool = False) -> bool:
+        """Tomar el lock de collector; False si otro proceso ya lo tiene"""
+        fd = os.open(self.ring_path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # Cerrar el fd libera el flock
+            self._lock_fd = None
+
+    # === Muestreo ===
+
+    def sample(self) -> Dict[str, Any]:
+        """Una muestra completa (sin seq; lo asigna el ring)"""
+        if self.gpu_sampler is None:
+            self.gpu_sampler = GPUSampler(min_interval=0)
+        now = datetime.now()
+        sample: Dict[str, Any] = {
+            "ts": now.timestamp(),
+            "time": now.strftime("%H:%M:%S"),
+            "gpu": [gpu.to_dict() for gpu in self.gpu_sampler.sample()],
+            "system": None,
+            "top_procs": [],
+            "processes": {},
+            "ollama": self._ollama_models(),
+        }
+        if PSUTIL_AVAILABLE:
+            sample["system"] = self._system()
+            sample["top_procs"], sample["processes"] = self._processes()
+        return sample
+
+    def _system(self) -> Optional[Dict[str, Any]]:
+        try:
+            # interval=None: uso desde la muestra anterior, sin bloquear el loop
+            mem = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            disk = psutil.disk_usage("/")
+            net = psutil.net_io_counters()
+            return {
+                "cpu": psutil.cpu_percent(interval=None),
+                "per_cpu": psutil.cpu_percent(interval=None, percpu=True),
+                "cores": psutil.cpu_count(),
+                "ram_percent": mem.percent, "ram_used": mem.used,
+                "ram_total": mem.total, "ram_available": mem.available,
+                "swap_percent": swap.percent, "swap_used": swap.used,
+                "disk_percent": disk.percent, "disk_used": disk.used, "disk_total": disk.total,
+                "load": os.getloadavg() if hasattr(os, "getloadavg") else (0, 0, 0),
+                "net_sent": net.bytes_sent, "net_recv": net.bytes_recv,
+            }
+        except Exception as e:
+            print(f"[Collector] Sistema: {e}")
+            return None
+
+    def _processes(self):
+        """Top procesos por CPU + primer proceso de cada WATCHED_PROCESSES (un solo recorrido)"""
+        top, watched = [], {}
+        for proc in psutil.process_iter(["pid", "name", "cpu_percent", "memory_percent", "cmdline"]):
+            info = proc.info
+            cpu, mem = info["cpu_percent"] or 0.0, info["memory_percent"] or 0.0
+            if cpu > 1 or mem > 1:
+                top.append({"pid": info["pid"], "name": info["name"],
+                            "cpu_percent": cpu, "memory_percent": mem})
+            cmd = " ".join(info["cmdline"] or []) or (info["name"] or "")
+            for key, name, pattern in self._watched:
+                if key not in watched and pattern.search(cmd):
+                    watched[key] = {"name": name, "pid": info["pid"], "cpu": round(cpu, 1),
+                                    "mem": round(mem, 1), "cmd": cmd[:30]}
+        top.sort(key=lambda p: p["cpu_percent"], reverse=True)
+        return top[:8], watched
+
+    @staticmethod
+    def _ollama_models() -> List[Dict[str, Any]]:
+        try:
+            data = get_client().ps(timeout=3)
+        except Exception:
+            return []
+        return [{
+            "name": m.get("name", "unknown"),
+            "size": m.get("size", 0),
+            "size_vram": m.get("size_vram", 0),
+            "expires_at": m.get("expires_at", "-"),
+            "processor": m.get("details", {}).get("processor", "GPU"),
+        } for m in data.get("models", [])]
+
+    # === Loop ===
+
+    def run(self):
+        """Muestrear y publicar cada `interval` hasta stop() (requiere el lock)"""
+        ring = MetricsRing(self.ring_path, writer=True)
+        ring.open()
+        if PSUTIL_AVAILABLE:
+            psutil.cpu_percent(interval=None)  # Primera llamada: referencia para la siguiente
+            psutil.cpu_percent(interval=None, percpu=True)
+        next_tick = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                try:
+                    ring.publish(self.sample())
+                except Exception as e:
+                    print(f"[Collector] {e}")
+                next_tick += self.interval
+                self._stop.wait(max(0.0, next_tick - time.monotonic()))
+        finally:
+            ring.close()
+            self.release()
+
+    def start(self) -> bool:
+        """Arrancar en un thread si este proceso gana el lock"""
+        if self._thread is not None:
+            return True
+        if not self.acquire():
+            return False
+        self._thread = threading.Thread(target=self.run, daemon=True, name="metrics-collector")
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class MetricsFeed:
+    """
+    Lector del ring para dashboards
+
+    Si no hay collector vivo (ring inexistente o sin heartbeat en `stale_s`),
+    intenta serlo este proceso; si otro tiene el lock, solo espera.
+    """
+
+    def __init__(self, ring_path: str = DEFAULT_RING_PATH, interval: float = 1.0,
+                 stale_s: float = 5.0, poll_s: float = 0.05, autostart: bool = True):
+        self.ring_path = ring_path
+        self.interval = interval
+        self.stale_s = stale_s
+        self.poll_s = poll_s
+        self.autostart = autostart
+        self.collector: Optional[MetricsCollector] = None
+        self._ring = MetricsRing(ring_path)
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def _ensure(self) -> bool:
+        """Ring abierto y con collector; False si aún no hay datos"""
+        with self._lock:
+            if self._opened and self._ring.stale_mapping():
+                self._ring.close()
+                self._opened = False
+            if not self._opened or time.time() - self._ring.heartbeat() > self.stale_s:
+                if self.autostart and self.collector is None:
+                    collector = MetricsCollector(self.ring_path, self.interval)
+                    if collector.start():
+                        self.collector = collector
+                if not self._opened:
+                    self._opened = self._ring.open()
+            return self._opened
+
+    def head(self) -> int:
+        return self._ring.head() if self._ensure() else 0
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Última muestra publicada; si aún no hay, espera hasta dos intervalos"""
+        if self._ensure():
+            sample = self._ring.read(self._ring.head())
+            if sample is not None:
+                return sample
+        return self.next(0, timeout=self.interval * 2)
+
+    def next(self, after: int = 0, timeout: float = 5.0) -> Optional[Dict[str, Any]]:
+        """Primera muestra más nueva que `after` (la última si hay varias); None tras timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._ensure():
+                head = self._ring.head()
+                if head != after:  # head < after: ring recreado
+                    sample = self._ring.read(head)
+                    if sample is not None:
+                        return sample
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_s)
+
+    def history(self, n: int) -> List[Dict[str, Any]]:
+        """Hasta `n` muestras más recientes, de la más vieja a la más nueva"""
+        if not self._ensure():
+            return []
+        head = self._ring.head()
+        samples = (self._ring.read(seq) for seq in range(max(1, head - n + 1), head + 1))
+        return [s for s in samples if s is not None]
+
+
+def primary_gpu(sample: Optional[Dict[str, Any]]) -> Optional[GPUSample]:
+    """GPU 0 de una muestra del feed"""
+    if not sample or not sample.get("gpu"):
+        return None
+    return GPUSample(**sample["gpu"][0])
+
+
+_feed: Optional[MetricsFeed] = None
+_feed_lock = threading.Lock()
+
+
+def get_metrics_feed() -> MetricsFeed:
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = MetricsFeed()
+    return _feed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LumenAGI metrics collector")
+    parser.add_argument("--serve", action="store_true", help="Correr el collector (daemon)")
+    parser.add_argument("--tail", action="store_true", help="Mostrar las muestras publicadas")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--ring", default=DEFAULT_RING_PATH)
+    args = parser.parse_args()
+
+    if args.serve:
+        collector = MetricsCollector(args.ring, args.interval)
+        if not collector.acquire():
+            print(f"⏳ Otro proceso es el collector ({args.ring}.lock); esperando el relevo...")
+            collector.acquire(block=True)
+        print(f"📡 Collector activo: {args.ring} cada {args.interval}s")
+        try:
+            collector.run()
+        except KeyboardInterrupt:
+            pass
+    elif args.tail:
+        feed = MetricsFeed(args.ring, autostart=False)
+        seq = 0
+        try:
+            while True:
+                sample = feed.next(seq, timeout=10)
+                if sample is None:
+                    print("⚠️ Sin muestras (¿collector corriendo?)")
+                    continue
+                seq = sample["seq"]
+                gpu = primary_gpu(sample)
+                system = sample.get("system") or {}
+                print(f"#{seq} {sample['time']} GPU:{gpu.util_gpu if gpu else '-'}% "
+                      f"CPU:{system.get('cpu', '-')}% modelos:{len(sample['ollama'])}")
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Model Scheduler v1.0 — Elección de modelo por latencia y costo
+Telemetría en vivo por modelo (latencia, tokens/s, costo) desde las llamadas reales
+
+- ModelSpec: precios y priors de cada modelo (hasta tener telemetría)
+- ModelScheduler.track(model): mide cada llamada y alimenta las stats
+- ModelScheduler.choose(candidatos, ...): predice tiempo de completion y costo
+  de cada candidato y elige; salta modelos sobrecargados, con errores
+  recientes o descargados de VRAM (cargar Qwen 32B cuesta ~20s)
+
+Uso:
+    scheduler = get_scheduler()
+    decision = scheduler.choose(["ollama/qwen2.5:32b", "ollama/kimi-k2.5:cloud"],
+                                prompt_tokens=800, max_tokens=1500, budget=0.05)
+    with scheduler.track(decision.model) as call:
+        result = get_client().generate(...)
+        call.ollama(result)
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from job_queue import LOCAL_PARALLEL
+
+
+@dataclass
+class ModelSpec:
+    """Modelo disponible y sus priors"""
+    name: str                    # "ollama/qwen2.5:32b", "openai/gpt-4o"
+    local: bool = False          # Corre en la GPU local (cuenta VRAM y cola)
+    input_cost: float = 0.0      # USD por 1M tokens de prompt
+    output_cost: float = 0.0     # USD por 1M tokens generados
+    tokens_per_s: float = 30.0   # Prior de velocidad de generación
+    first_token_s: float = 1.0   # Prior de latencia hasta el primer token
+    load_s: float = 0.0          # Tiempo de carga en VRAM si no está cargado
+    max_inflight: int = 4        # Requests que atiende en paralelo (más = cola)
+
+    @property
+    def ollama_name(self) -> str:
+        return self.name.split("/", 1)[-1]
+
+
+DEFAULT_MODELS = [
+    ModelSpec("ollama/qwen2.5:32b", local=True, tokens_per_s=35.0, first_token_s=0.8,
+              load_s=20.0, max_inflight=LOCAL_PARALLEL),
+    ModelSpec("ollama/kimi-k2.5:cloud", tokens_per_s=40.0, first_token_s=2.0, max_inflight=8),
+    ModelSpec("openai/gpt-4o", input_cost=2.5, output_cost=10.0, tokens_per_s=70.0,
+              first_token_s=0.6, max_inflight=16),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de tokens (~4 caracteres por token)"""
+    return max(1, len(text) // 4)
+
+
+def format_cost(usd: float, local: bool = False) -> str:
+    """Costo legible (compatible con _parse_cost de los coordinators)"""
+    if usd <= 0:
+        return "FREE (local)" if local else "FREE"
+    return f"~${usd:.4f}"
+
+
+@dataclass
+class Prediction:
+    """Estimación para un modelo"""
+    model: str
+    seconds: float
+    cost: float
+    available: bool = True
+    reason: str = ""
+
+    @property
+    def cost_str(self) -> str:
+        return format_cost(self.cost)
+
+
+@dataclass
+class ScheduleDecision:
+    """Modelo elegido y las predicciones de todos los candidatos"""
+    model: str
+    predicted_s: float
+    predicted_cost: float
+    reason: str
+    fallback: bool = False  # True si no es el candidato preferido
+    candidates: List[Prediction] = field(default_factory=list)
+
+
+class ModelStats:
+    """Ventana móvil de llamadas a un modelo"""
+
+    def __init__(self, window: int = 50):
+        self.samples: "deque[Dict[str, float]]" = deque(maxlen=window)
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error_at = 0.0
+        self.total_tokens = 0
+        self.total_cost = 0.0
+
+    def _values(self, key: str) -> List[float]:
+        return [s[key] for s in self.samples if s.get(key) is not None]
+
+    def mean(self, key: str) -> Optional[float]:
+        values = self._values(key)
+        return statistics.fmean(values) if values else None
+
+    def p95(self, key: str) -> Optional[float]:
+        values = sorted(self._values(key))
+        return values[min(len(values) - 1, int(len(values) * 0.95))] if values else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "latency_avg_s": self.mean("latency_s"),
+            "latency_p95_s": self.p95("latency_s"),
+            "tokens_per_s": self.mean("tokens_per_s"),
+            "first_token_s": self.mean("first_token_s"),
+            "total_tokens": self.total_tokens,
+            "total_cost": round(self.total_cost, 6),
+        }
+
+
+class CallTracker:
+    """Resultado de una llamada en curso (lo completa el caller dentro de track())"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.eval_s: Optional[float] = None
+        self.first_token_s: Optional[float] = None
+        self.ok = True
+
+    def ollama(self, response: Dict[str, Any]):
+        """Tomar conteos y tiempos de la respuesta final de Ollama (durations en ns)"""
+        self.prompt_tokens = response.get("prompt_eval_count", self.prompt_tokens) or 0
+        self.completion_tokens = response.get("eval_count", self.completion_tokens) or 0
+        if response.get("eval_duration"):
+            self.eval_s = response["eval_duration"] / 1e9
+        if response.get("prompt_eval_duration") is not None:
+            self.first_token_s = (response.get("load_duration", 0)
+                                  + response["prompt_eval_duration"]) / 1e9
+
+    def failed(self):
+        self.ok = False
+
+
+class ModelScheduler:
+    """
+    Telemetría por modelo + elección por tiempo predicho y presupuesto
+
+    Args:
+        seconds_per_dollar: cuántos segundos de espera vale 1 USD al comparar
+        switch_ratio: un candidato no preferido debe mejorar el score en este
+            porcentaje para reemplazar al preferido (evita oscilar)
+        error_threshold / cooldown_s: tras N errores seguidos el modelo queda
+            fuera de la elección durante cooldown_s
+        ps_ttl: segundos de cache de /api/ps (modelos cargados en VRAM)
+        overload_factor: con inflight >= max_inflight * overload_factor el
+            modelo se considera sobrecargado (antes, la cola solo suma tiempo)
+        job_queue: JobQueue cuyos requests esperando cuentan como carga del modelo
+    """
+
+    def __init__(self, specs: Optional[List[ModelSpec]] = None, window: int = 50,
+                 seconds_per_dollar: float = 600.0, switch_ratio: float = 0.25,
+                 error_threshold: int = 3, cooldown_s: float = 60.0, ps_ttl: float = 10.0,
+                 overload_factor: float = 2.0, client=None, job_queue=None):
+        self.specs: Dict[str, ModelSpec] = {}
+        self.window = window
+        self.seconds_per_dollar = seconds_per_dollar
+        self.switch_ratio = switch_ratio
+        self.error_threshold = error_threshold
+        self.cooldown_s = cooldown_s
+        self.ps_ttl = ps_ttl
+        self.overload_factor = overload_factor
+        self.client = client
+        self.job_queue = job_queue
+        self._stats: Dict[str, ModelStats] = {}
+        self._loaded: Optional[Set[str]] = None
+        self._loaded_at = float("-inf")
+        self._lock = threading.Lock()
+        for spec in specs if specs is not None else DEFAULT_MODELS:
+            self.register(spec)
+
+    def register(self, spec: ModelSpec):
+        with self._lock:
+            self.specs[spec.name] = spec
+            self._stats.setdefault(spec.name, ModelStats(self.window))
+
+    def _spec(self, model: str) -> ModelSpec:
+        if model not in self.specs:
+            self.register(ModelSpec(model, local=False))
+        return self.specs[model]
+
+    def stats(self, model: str) -> ModelStats:
+        self._spec(model)
+        return self._stats[model]
+
+    # === Telemetría ===
+
+    @contextmanager
+    def track(self, model: str) -> Iterator[CallTracker]:
+        """
+        Medir una llamada: inflight durante la llamada, latencia y tokens al terminar
+
+        Una excepción dentro del bloque (o call.failed()) cuenta como error.
+        """
+        stats = self.stats(model)
+        call = CallTracker()
+        with self._lock:
+            stats.inflight += 1
+        start = time.monotonic()
+        try:
+            yield call
+        except Exception:
+            call.ok = False
+            raise
+        finally:
+            with self._lock:
+                stats.inflight -= 1
+            self.record(model, time.monotonic() - start, call.completion_tokens,
+                        prompt_tokens=call.prompt_tokens, ok=call.ok,
+                        eval_s=call.eval_s, first_token_s=call.first_token_s)
+
+    def record(self, model: str, latency_s: float, completion_tokens: int = 0,
+               prompt_tokens: int = 0, ok: bool = True, eval_s: Optional[float] = None,
+               first_token_s: Optional[float] = None):
+        """Registrar una llamada terminada (para llamadas no medidas con track())"""
+        spec = self._spec(model)
+        stats = self._stats[model]
+        cost = (prompt_tokens * spec.input_cost + completion_tokens * spec.output_cost) / 1e6
+        with self._lock:
+            stats.requests += 1
+            if not ok:
+                stats.errors += 1
+                stats.consecutive_errors += 1
+                stats.last_error_at = time.monotonic()
+                return
+            stats.consecutive_errors = 0
+            stats.total_tokens += prompt_tokens + completion_tokens
+            stats.total_cost += cost
+
+            generated, generation_s = completion_tokens, eval_s
+            if generation_s is None and first_token_s is not None:
+                # Stream: el primer token llegó en first_token_s, el resto después
+                generated, generation_s = completion_tokens - 1, latency_s - first_token_s
+            stats.samples.append({
+                "latency_s": latency_s,
+                "first_token_s": first_token_s,
+                "tokens_per_s": (generated / generation_s
+                                 if generated > 0 and generation_s and generation_s > 0
+                                 else None),
+            })
+
+    # === Estado de los modelos ===
+
+    def is_local(self, model: str) -> bool:
+        spec = self.specs.get(model)
+        return bool(spec and spec.local)
+
+    def loaded_models(self) -> Optional[Set[str]]:
+        """Modelos cargados en VRAM según /api/ps (None si Ollama no responde)"""
+        now = time.monotonic()
+        if now - self._loaded_at < self.ps_ttl:
+            return self._loaded
+        try:
+            client = self.client
+            if client is None:
+                from ollama_client import get_client
+                client = get_client()
+            models = client.ps(timeout=2).get("models", [])
+            loaded = {m.get("name") or m.get("model") for m in models}
+        except Exception:
+            loaded = None
+        self._loaded, self._loaded_at = loaded, now
+        return loaded
+
+    def mark_loaded(self, model: str):
+        """Un modelo local acaba de responder: está en VRAM"""
+        if self._loaded is not None:
+            self._loaded.add(self._spec(model).ollama_name)
+
+    def predict(self, model: str, prompt_tokens: int = 500, max_tokens: int = 1000) -> Prediction:
+        """Tiempo hasta completar y costo esperado de una llamada"""
+        spec = self._spec(model)
+        stats = self._stats[model]
+        available, reason = True, ""
+
+        tokens_per_s = stats.mean("tokens_per_s") or spec.tokens_per_s
+        first_token_s = stats.mean("first_token_s") or spec.first_token_s
+        seconds = first_token_s + max_tokens / max(tokens_per_s, 1e-3)
+
+        # Cola: requests por delante de este en el mismo modelo (en vuelo + esperando turno)
+        load = stats.inflight + (self.job_queue.depth(model) if self.job_queue else 0)
+        if load >= spec.max_inflight:
+            latency = stats.mean("latency_s") or seconds
+            seconds += latency * (load - spec.max_inflight + 1) / spec.max_inflight
+            reason = f"{load} en vuelo/cola"
+            if load >= spec.max_inflight * self.overload_factor:
+                available, reason = False, f"sobrecargado ({load} en vuelo/cola)"
+
+        if spec.local:
+            loaded = self.loaded_models()
+            if loaded is None:
+                available, reason = False, "Ollama no responde"
+            elif spec.ollama_name not in loaded:
+                seconds += spec.load_s
+                reason = reason or "no cargado en VRAM"
+
+        if (stats.consecutive_errors >= self.error_threshold
+                and time.monotonic() - stats.last_error_at < self.cooldown_s):
+            available, reason = False, f"{stats.consecutive_errors} errores seguidos"
+
+        cost = (prompt_tokens * spec.input_cost + max_tokens * spec.output_cost) / 1e6
+        return Prediction(model, seconds, cost, available, reason)
+
+    # === Elección ===
+
+    def choose(self, candidates: List[str], prompt_tokens: int = 500, max_tokens: int = 1000,
+               budget: Optional[float] = None, deadline_s: Optional[float] = None) -> ScheduleDecision:
+        """
+        Elegir modelo entre candidatos (en orden de preferencia)
+
+        score = segundos predichos + costo * seconds_per_dollar. Se descartan
+        los no disponibles, los que exceden budget (USD) y, si hay alguno que
+        cumple, los que no llegan a deadline_s. El preferido se mantiene salvo
+        que otro mejore su score en más de switch_ratio.
+        """
+        if not candidates:
+            raise ValueError("Sin modelos candidatos")
+        predictions = [self.predict(m, prompt_tokens, max_tokens) for m in candidates]
+
+        def score(p: Prediction) -> float:
+            return p.seconds + p.cost * self.seconds_per_dollar
+
+        pool = [p for p in predictions if p.available]
+        if not pool:
+            # Todos fuera: el menos malo (normalmente el que menos cola tiene)
+            best = min(predictions, key=score)
+            return self._decision(best, predictions, f"todos no disponibles, {best.reason}")
+        if budget is not None:
+            within = [p for p in pool if p.cost <= budget]
+            if not within:
+                best = min(pool, key=lambda p: p.cost)
+                return self._decision(best, predictions, f"ninguno dentro de ${budget}: el más barato")
+            pool = within
+        if deadline_s is not None:
+            pool = [p for p in pool if p.seconds <= deadline_s] or pool
+
+        preferred = pool[0]
+        best = min(pool, key=score)
+        if best is not preferred and score(best) < score(preferred) * (1 - self.switch_ratio):
+            first = predictions[0]
+            why = first.reason or f"~{first.seconds:.0f}s vs ~{best.seconds:.0f}s"
+            return self._decision(best, predictions, f"{first.model}: {why}")
+        if preferred is not predictions[0]:
+            first = predictions[0]
+            why = first.reason or "fuera de presupuesto/deadline"
+            return self._decision(preferred, predictions, f"{first.model}: {why}")
+        return self._decision(preferred, predictions, "preferido")
+
+    def _decision(self, chosen: Prediction, predictions: List[Prediction], reason: str) -> ScheduleDecision:
+        return ScheduleDecision(
+            model=chosen.model,
+            predicted_s=chosen.seconds,
+            predicted_cost=chosen.cost,
+            reason=reason,
+            fallback=chosen is not predictions[0],
+            candidates=predictions
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Stats de todos los modelos (para dashboards)"""
+        with self._lock:
+            return {name: {**stats.to_dict(), "local": self.specs[name].local}
+                    for name, stats in self._stats.items()}
+
+
+# Singleton compartido por proceso
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> ModelScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from job_queue import get_job_queue
+                _scheduler = ModelScheduler(job_queue=get_job_queue())
+    return _scheduler
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Ollama Client v1.0 — Cliente HTTP con pool de conexiones keep-alive
+Compartido por coordinators, dashboards, benchmark y reportes
+
+- OllamaClient: síncrono, thread-safe (http.client), para llamadas bloqueantes
+- AsyncOllamaClient: asyncio, streaming de tokens como async iterator
+
+Destino: LUMEN_OLLAMA_URL si está definida; si no, el proxy de job_queue.py
+(:11435) cuando está corriendo, así todos los procesos (coordinators, cron,
+keepalive) pasan por la misma cola con prioridad; si no, Ollama directo.
+
+Solo librería estándar — sin pip, sin subprocess curl.
+"""
+
+import asyncio
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import urllib.parse
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+OLLAMA_URL = "http://localhost:11434"
+
+# Proxy con la cola central (python3 job_queue.py --serve)
+QUEUE_PROXY_PORT = 11435
+QUEUE_PROXY_URL = f"http://127.0.0.1:{QUEUE_PROXY_PORT}"
+
+# Header con la prioridad del request (lo lee el proxy; Ollama lo ignora)
+PRIORITY_HEADER = "X-Lumen-Priority"
+
+
+def default_url() -> str:
+    """LUMEN_OLLAMA_URL, o el proxy de la cola si escucha, o Ollama directo"""
+    url = os.environ.get("LUMEN_OLLAMA_URL")
+    if url:
+        return url
+    try:
+        socket.create_connection(("127.0.0.1", QUEUE_PROXY_PORT), timeout=0.2).close()
+        return QUEUE_PROXY_URL
+    except OSError:
+        return OLLAMA_URL
+
+
+class OllamaError(Exception):
+    """Error devuelto por Ollama o fallo de transporte"""
+
+
+class OllamaClient:
+    """
+    Cliente síncrono para Ollama con pool de conexiones keep-alive
+
+    - Máximo `max_connections` requests simultáneos (los demás esperan turno)
+    - Los GET de metadata (ps, tags) tienen sus propios `metadata_connections`
+      slots: no esperan detrás de generaciones largas
+    - Conexiones HTTP/1.1 reutilizadas entre requests y entre threads
+    - `timeout` por defecto, sobreescribible por request (ej: dashboards 3s)
+    """
+
+    def __init__(self, base_url: Optional[str] = None, max_connections: int = 4,
+                 timeout: float = 120.0, metadata_connections: int = 2):
+        parsed = urllib.parse.urlsplit(base_url or default_url())
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 80
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._metadata_slots = threading.BoundedSemaphore(max(1, metadata_connections))
+
+    @property
+    def proxied(self) -> bool:
+        """Apunta al proxy de la cola: la admisión la hace el proxy, no este proceso"""
+        return self.port == QUEUE_PROXY_PORT
+
+    # === API pública ===
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = None, priority: Optional[str] = None,
+                 **extra) -> Dict[str, Any]:
+        """POST /api/generate sin streaming — retorna la respuesta completa de Ollama"""
+        payload = {"model": model, "prompt": prompt, "stream": False,
+                   "options": options or {}, **extra}
+        return self.request("POST", "/api/generate", payload, timeout=timeout, priority=priority)
+
+    def chat(self, model: str, messages: List[Dict[str, str]],
+             options: Optional[Dict[str, Any]] = None,
+             timeout: Optional[float] = None, **extra) -> Dict[str, Any]:
+        """POST /api/chat sin streaming"""
+        payload = {"model": model, "messages": messages, "stream": False,
+                   "options": options or {}, **extra}
+        return self.request("POST", "/api/chat", payload, timeout=timeout)
+
+    def ps(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """GET /api/ps — modelos cargados en VRAM"""
+        return self.request("GET", "/api/ps", timeout=timeout)
+
+    def tags(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """GET /api/tags — modelos instalados"""
+        return self.request("GET", "/api/tags", timeout=timeout)
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None, priority: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Request JSON genérico
+
+        Raises:
+            OllamaError: HTTP != 200, timeout o fallo de conexión
+        """
+        timeout = self.timeout if timeout is None else timeout
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = _headers(body is not None, priority)
+
+        # GET = metadata (ps, tags): slots aparte de los POST de generación
+        slots = self._metadata_slots if method == "GET" else self._slots
+        if not slots.acquire(timeout=timeout):
+            raise OllamaError(f"Sin conexiones libres hacia Ollama tras {timeout}s")
+        try:
+            conn, reused = self._checkout(timeout)
+            try:
+                try:
+                    response = self._send(conn, method, path, body, headers)
+                except (http.client.RemoteDisconnected, ConnectionError):
+                    if not reused:
+                        raise
+                    # Ollama cerró la conexión ociosa: reintentar una vez con una nueva
+                    conn.close()
+                    conn = self._new_connection(timeout)
+                    response = self._send(conn, method, path, body, headers)
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise OllamaError(f"Error de conexión con Ollama: {e}") from e
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        finally:
+            slots.release()
+
+        if response.status != 200:
+            raise OllamaError(f"HTTP {response.status} en {path}: "
+                              f"{data[:200].decode(errors='replace')}")
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise OllamaError(f"Respuesta no-JSON de Ollama en {path}: {data[:200]!r}") from e
+
+    def stream(self, path: str, payload: Dict[str, Any], timeout: Optional[float] = None,
+               priority: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        POST con streaming: cada línea NDJSON de la respuesta como dict
+
+        Usa una conexión propia (no vuelve al pool) y ocupa un slot mientras dura.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        body = json.dumps(payload).encode()
+        if not self._slots.acquire(timeout=timeout):
+            raise OllamaError(f"Sin conexiones libres hacia Ollama tras {timeout}s")
+        conn = self._new_connection(timeout)
+        try:
+            try:
+                response = self._send(conn, "POST", path, body, _headers(True, priority))
+                if response.status != 200:
+                    raise OllamaError(f"HTTP {response.status} en {path}: "
+                                      f"{response.read()[:200].decode(errors='replace')}")
+                for line in response:
+                    if line.strip():
+                        yield json.loads(line)
+            except (OSError, http.client.HTTPException) as e:
+                raise OllamaError(f"Error de conexión con Ollama: {e}") from e
+        finally:
+            conn.close()
+            self._slots.release()
+
+    def close(self):
+        """Cerrar todas las conexiones ociosas del pool"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # === Pool ===
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _checkout(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    @staticmethod
+    def _send(conn, method, path, body, headers) -> http.client.HTTPResponse:
+        conn.request(method, path, body=body, headers=headers)
+        return conn.getresponse()
+
+
+class AsyncOllamaClient:
+    """
+    Cliente asyncio para Ollama con pool de conexiones keep-alive
+
+    - Máximo `max_connections` requests en vuelo (semáforo)
+    - Reutiliza conexiones ociosas entre requests
+    - `timeout` es de inactividad: máximo de segundos entre bytes recibidos
+    """
+
+    def __init__(self, base_url: Optional[str] = None, max_connections: int = 4,
+                 timeout: float = 120.0):
+        parsed = urllib.parse.urlsplit(base_url or default_url())
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 80
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    @property
+    def proxied(self) -> bool:
+        return self.port == QUEUE_PROXY_PORT
+
+    # === API pública ===
+
+    async def stream_generate(self, model: str, prompt: str,
+                              options: Optional[Dict[str, Any]] = None,
+                              priority: Optional[str] = None, **extra) -> AsyncIterator[str]:
+        """
+        Stream de tokens de /api/generate
+
+        Uso:
+            async for token in client.stream_generate("qwen2.5:32b", prompt):
+                print(token, end="", flush=True)
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True,
+                   "options": options or {}, **extra}
+        async for chunk in self.stream_json("POST", "/api/generate", payload, priority):
+            if chunk.get("error"):
+                raise OllamaError(chunk["error"])
+            if chunk.get("response"):
+                yield chunk["response"]
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                       priority: Optional[str] = None, **extra) -> Dict[str, Any]:
+        """
+        Generación completa: consume el stream y retorna el chunk final de
+        Ollama (eval_count, context, ...) con el texto completo en 'response'
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True,
+                   "options": options or {}, **extra}
+        parts, final = [], {}
+        async for chunk in self.stream_json("POST", "/api/generate", payload, priority):
+            if chunk.get("error"):
+                raise OllamaError(chunk["error"])
+            parts.append(chunk.get("response", ""))
+            final = chunk
+        return {**final, "response": "".join(parts)}
+
+    async def stream_json(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                          priority: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Request HTTP que emite cada línea NDJSON de la respuesta como dict"""
+        buffer = b""
+        async for data in self._request(method, path, payload, priority):
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+        if buffer.strip():
+            yield json.loads(buffer)
+
+    async def aclose(self):
+        """Cerrar todas las conexiones ociosas del pool"""
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+    # === Transporte HTTP/1.1 ===
+
+    def _bind_loop(self):
+        """Las conexiones pertenecen a un event loop — resetear el pool si cambia"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            for _, writer in self._idle:
+                try:
+                    writer.close()
+                except RuntimeError:
+                    pass  # Loop anterior ya cerrado
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+
+    async def _io(self, awaitable):
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def _open(self):
+        return await self._io(asyncio.open_connection(self.host, self.port))
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]],
+                       priority: Optional[str] = None) -> AsyncIterator[bytes]:
+        self._bind_loop()
+        body = json.dumps(payload).encode() if payload is not None else b""
+
+        async with self._semaphore:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._open()
+            reusable = False
+            try:
+                try:
+                    status, headers = await self._send(reader, writer, method, path, body, priority)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    if not reused:
+                        raise
+                    # Ollama cerró la conexión ociosa: reintentar una vez con una nueva
+                    writer.close()
+                    reader, writer = await self._open()
+                    status, headers = await self._send(reader, writer, method, path, body, priority)
+
+                if status != 200:
+                    detail = b"".join([d async for d in self._read_body(reader, headers)])
+                    raise OllamaError(f"HTTP {status} en {path}: "
+                                      f"{detail[:200].decode(errors='replace')}")
+
+                async for data in self._read_body(reader, headers):
+                    yield data
+                reusable = headers.get("connection", "").lower() != "close"
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                raise OllamaError(f"Error de conexión con Ollama: {e}") from e
+            finally:
+                if reusable:
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+
+    async def _send(self, reader, writer, method: str, path: str, body: bytes,
+                    priority: Optional[str] = None) -> Tuple[int, Dict[str, str]]:
+        head = (f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                "Content-Type: application/json\r\n"
+                + (f"{PRIORITY_HEADER}: {priority}\r\n" if priority else "")
+                + f"Content-Length: {len(body)}\r\n"
+                "Connection: keep-alive\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await self._io(writer.drain())
+
+        status_line = await self._io(reader.readline())
+        if not status_line:
+            raise ConnectionError("Conexión cerrada por Ollama")
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self._io(reader.readline())
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if ("content-length" not in headers
+                and headers.get("transfer-encoding", "").lower() != "chunked"):
+            headers["connection"] = "close"  # Body hasta EOF: no reutilizable
+        return status, headers
+
+    async def _read_body(self, reader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await self._io(reader.readline())
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while (await self._io(reader.readline())) not in (b"\r\n", b"\n", b""):
+                        pass  # Trailers
+                    return
+                data = await self._io(reader.readexactly(size + 2))
+                yield data[:-2]
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                data = await self._io(reader.read(min(remaining, 65536)))
+                if not data:
+                    raise ConnectionError("Respuesta de Ollama incompleta")
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await self._io(reader.read(65536))
+                if not data:
+                    return
+                yield data
+
+
+def _headers(has_body: bool, priority: Optional[str]) -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"} if has_body else {}
+    if priority:
+        headers[PRIORITY_HEADER] = priority
+    return headers
+
+
+# Singletons compartidos por proceso
+_client = None
+_async_client = None
+
+
+def get_client() -> OllamaClient:
+    global _client
+    if _client is None:
+        _client = OllamaClient()
+    return _client
+
+
+def get_async_client() -> AsyncOllamaClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOllamaClient()
+    return _async_client
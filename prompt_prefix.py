@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Prompt Prefix v1.0 — Prefijos de sistema estables para reusar el KV cache
+Los prompts de los agentes SWARM se separan en:
+
+- system: preámbulo estático por agente (rol, reglas, tools), construido una
+  sola vez por proceso y byte a byte idéntico entre subtareas
+- prompt: la parte variable (tarea, input, formato de salida), siempre al final
+
+Ollama conserva el KV cache de cada slot y reutiliza el prefijo de tokens más
+largo que coincide con el request anterior: con el preámbulo primero y sin
+cambios, solo se procesa la parte variable (prompt_eval_count baja). keep_alive
+mantiene el modelo (y su cache) cargado entre subtareas.
+
+Uso:
+    prompt = SplitPrompt(get_prefix_cache().get(("research",), build), tarea)
+    client.generate(model, prompt.prompt, options, **prompt.ollama_kwargs())
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Tiempo que Ollama mantiene el modelo en VRAM tras cada request
+KEEP_ALIVE = os.environ.get("LUMEN_KEEP_ALIVE", "30m")
+
+SWARM_PREAMBLE = "Eres un agente del sistema SWARM LumenAGI."
+
+
+@dataclass(frozen=True)
+class SplitPrompt:
+    """Prompt separado en prefijo de sistema (estable) y parte variable"""
+    system: str
+    prompt: str
+
+    def __str__(self) -> str:
+        """Texto completo, para modelos sin campo system (Claude, estimaciones)"""
+        return f"{self.system}\n\n{self.prompt}" if self.system else self.prompt
+
+    def ollama_kwargs(self) -> Dict[str, Any]:
+        """Campos extra para /api/generate (system + keep_alive)"""
+        kwargs: Dict[str, Any] = {"keep_alive": KEEP_ALIVE}
+        if self.system:
+            kwargs["system"] = self.system
+        return kwargs
+
+
+class PrefixCache:
+    """
+    Prefijos de sistema por clave (agente, tools...), construidos una vez
+
+    Devuelve siempre el mismo string para la misma clave, así el prefijo que
+    recibe Ollama no cambia entre subtareas.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], str]) -> str:
+        with self._lock:
+            prefix = self._prefixes.get(key)
+            if prefix is not None:
+                self.hits += 1
+                return prefix
+            self.misses += 1
+            prefix = self._prefixes[key] = build()
+            return prefix
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"prefixes": len(self._prefixes), "hits": self.hits, "misses": self.misses}
+
+
+_prefix_cache: Optional[PrefixCache] = None
+_prefix_cache_lock = threading.Lock()
+
+
+def get_prefix_cache() -> PrefixCache:
+    global _prefix_cache
+    if _prefix_cache is None:
+        with _prefix_cache_lock:
+            if _prefix_cache is None:
+                _prefix_cache = PrefixCache()
+    return _prefix_cache
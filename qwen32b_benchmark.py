@@ -4,12 +4,16 @@ Benchmark Qwen 2.5 32B para uso Multi-Agente
 Prueba: Contexto, Coding, Razonamiento, Following Instructions
 """
 
-import subprocess
 import time
 import json
 
+from ollama_client import OllamaClient, OllamaError
+
 MODEL = "qwen2.5:32b"
 
+# Una sola conexión keep-alive para todo el benchmark
+client = OllamaClient(max_connections=1, timeout=120)
+
 TESTS = [
     {
         "name": "Context Retention",
@@ -74,38 +78,25 @@ def run_test(test):
     
     start_time = time.time()
     
-    # Build the curl command
-    data = {
-        "model": MODEL,
-        "stream": False,
-        "options": {
-            "num_ctx": 4096,
-            "temperature": 0.7,
-            "num_predict": test['expected_tokens']
-        },
-        "messages": [
-            {"role": "user", "content": test['prompt']}
-        ]
+    options = {
+        "num_ctx": 4096,
+        "temperature": 0.7,
+        "num_predict": test['expected_tokens']
     }
-    
-    cmd = [
-        "curl", "-s", "http://localhost:11434/api/chat",
-        "-H", "Content-Type: application/json",
-        "-d", json.dumps(data)
+    messages = [
+        {"role": "user", "content": test['prompt']}
     ]
     
-    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-    elapsed = time.time() - start_time
-    
     try:
-        response = json.loads(result.stdout)
+        response = client.chat(MODEL, messages, options=options)
         content = response.get('message', {}).get('content', 'ERROR: No content')
         tokens_eval = response.get('eval_count', 0)
         tokens_prompt = response.get('prompt_eval_count', 0)
-    except:
-        content = f"ERROR parsing response: {result.stdout[:500]}"
+    except OllamaError as e:
+        content = f"ERROR calling Ollama: {e}"
         tokens_eval = 0
         tokens_prompt = 0
+    elapsed = time.time() - start_time
     
     print(f"\n⏱️  Time: {elapsed:.2f}s")
     print(f"📝 Tokens prompt: {tokens_prompt}")
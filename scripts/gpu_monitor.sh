@@ -1,12 +1,12 @@
 #!/bin/bash
 # Monitoreo de GPU durante test multi-agente
+# Un solo proceso con NVML abierto (gpu_telemetry.py) en vez de un nvidia-smi por segundo
+
+LUMEN_DIR="$(cd "$(dirname "$0")/.." && pwd)"
 
 echo "⏱️ Iniciando monitoreo GPU..."
 echo "Timestamp,GPU Util %,VRAM Used MiB,Temperature" > /tmp/gpu_monitor.log
 
-for i in {1..60}; do
-    nvidia-smi --query-gpu=timestamp,utilization.gpu,memory.used,temperature.gpu --format=csv,noheader,nounits >> /tmp/gpu_monitor.log
-    sleep 1
-done
+python3 "$LUMEN_DIR/gpu_telemetry.py" --watch 1 --count 60 >> /tmp/gpu_monitor.log
 
-echo "✅ Monitoreo completado"
\ No newline at end of file
+echo "✅ Monitoreo completado"
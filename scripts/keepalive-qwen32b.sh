@@ -11,9 +11,16 @@ if [ -z "$QWEN_PID" ]; then
 fi
 
 # Enviar ping para mantener vivo
+# Por el proxy de job_queue.py (si corre, o LUMEN_OLLAMA_URL) el ping va como
+# background: nunca se adelanta a requests interactivos en la GPU
+if [ -z "$LUMEN_OLLAMA_URL" ] && curl -s -f -m 1 http://127.0.0.1:11435/queue/stats > /dev/null; then
+    LUMEN_OLLAMA_URL=http://127.0.0.1:11435
+fi
+OLLAMA_URL=${LUMEN_OLLAMA_URL:-http://localhost:11434}
 PAYLOAD='{"model":"qwen2.5:32b","prompt":"ping","stream":false,"options":{"num_predict":1}}'
-RESPONSE=$(curl -s -m 30 http://localhost:11434/api/generate \
+RESPONSE=$(curl -s -f -m 30 "$OLLAMA_URL/api/generate" \
     -H "Content-Type: application/json" \
+    -H "X-Lumen-Priority: background" \
     -d "$PAYLOAD" 2>&1)
 
 if [ $? -eq 0 ]; then
@@ -4,8 +4,15 @@ Enhanced Tool Detection — v2.0 with more patterns and confidence scoring
 Added: git, docker, sql, api, deploy patterns
 """
 
-import re
-from typing import Dict, List, Tuple
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from tool_registry import ToolDefinition, get_registry
 
 # Enhanced patterns with confidence scores
 TOOL_PATTERNS = {
@@ -56,32 +63,36 @@ TOOL_PATTERNS = {
     },
 }
 
+# Patrones compilados una vez en el registry compartido (junto a los de ToolSelector)
+_registry = get_registry()
+_registry.register_many(
+    ToolDefinition.from_config(tool, config, group="enhanced")
+    for tool, config in TOOL_PATTERNS.items()
+)
+
+# Columnas de detect_tools_batch (tools built-in; tool_names() incluye las hot-loaded)
+TOOL_NAMES = list(TOOL_PATTERNS)
+
+def tool_names() -> List[str]:
+    """Tools del grupo enhanced: built-in + cargadas desde tool_definitions.json"""
+    return _registry.names(group="enhanced")
+
 def detect_tools(text: str) -> List[Tuple[str, float]]:
     """Detect tools with confidence scores"""
-    text_lower = text.lower()
-    detected = []
-    
-    for tool, config in TOOL_PATTERNS.items():
-        score = 0.0
-        
-        # Check regex patterns
-        for pattern in config["patterns"]:
-            if re.search(pattern, text, re.IGNORECASE):
-                score += config["confidence"]
-                break
-        
-        # Check keywords (boost confidence)
-        keyword_matches = sum(1 for kw in config["keywords"] if kw in text_lower)
-        if keyword_matches >= 2:
-            score += 0.15
-        
-        if score > 0.5:
-            detected.append((tool, min(score, 1.0)))
+    detected = list(_registry.score(text, group="enhanced").items())
     
     # Sort by confidence
     detected.sort(key=lambda x: x[1], reverse=True)
     return detected
 
+def detect_tools_batch(texts: List[str], tools: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Scores de N textos como matriz (N x len(tools)), tools = tool_names() por defecto
+
+    Mismo scoring que detect_tools; 0.0 donde la tool no se detecta.
+    """
+    return _registry.score_batch(texts, tools if tools is not None else tool_names())
+
 # Backward compatible interface
 def detect_tool_confidence(text: str) -> Dict[str, float]:
     """Return dict of tool->confidence for existing code"""
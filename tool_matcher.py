@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Multi-Pattern Matcher para detección de tools
+Todas las señales (PATTERNS, duración, ...) en un solo recorrido del texto
+
+Los patrones de tools son alternancias de keywords (\\b(buscar|research|...)\\b).
+En vez de ~30 regex recorriendo el texto completo:
+
+- Keywords literales -> automáton por tokens: el texto se tokeniza una vez
+  y cada token consulta un dict (keyword de una o varias palabras; las de
+  varias palabras exigen un solo espacio entre tokens, igual que la regex)
+- Alternativas que son regex de verdad (https?://, fine.?tune, *.py) ->
+  regex residuales precompiladas, una por patrón (una alternancia
+  común perdería matches solapados entre patrones)
+
+Cada keyword cuenta para todos los patrones que la contienen, y keywords
+solapadas ("genera script" / "script") cuentan las dos.
+"""
+
+import re
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+WORD_RE = re.compile(r"\w+")
+LITERAL_RE = re.compile(r"\w+(?: \w+)*")
+KEYWORD_GROUP_RE = re.compile(r"^\\b\((.*)\)\\b$")
+
+
+def split_alternatives(pattern: str) -> List[str]:
+    """
+    Alternativas de un patrón \\b(a|b|c)\\b; [pattern] si no tiene esa forma
+    """
+    match = KEYWORD_GROUP_RE.match(pattern)
+    if not match:
+        return [pattern]
+    body = match.group(1)
+    alternatives, depth, start, i = [], 0, 0, 0
+    while i < len(body):
+        char = body[i]
+        if char == "\\":
+            i += 1  # Saltar el carácter escapado
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+            if depth < 0:
+                return [pattern]  # \b(a)...(b)\b: no es un solo grupo
+        elif char == "|" and depth == 0:
+            alternatives.append(body[start:i])
+            start = i + 1
+        i += 1
+    alternatives.append(body[start:])
+    return alternatives
+
+
+class MultiPatternMatcher:
+    """
+    Matcher de un solo scan sobre grupos de patrones
+
+    Args:
+        groups: clave (ej: ToolCategory) -> lista de patrones regex
+        flags: flags de las regex residuales (IGNORECASE por defecto)
+    """
+
+    def __init__(self, groups: Dict[Hashable, List[str]], flags: int = re.IGNORECASE):
+        self.groups = {key: list(patterns) for key, patterns in groups.items()}
+        self.labels: List[Tuple[Hashable, int]] = []
+
+        keyword_signals: Dict[Tuple[str, ...], List[int]] = {}
+        self.residual: List[Tuple[int, re.Pattern]] = []
+        for key, patterns in self.groups.items():
+            for index, pattern in enumerate(patterns):
+                signal = len(self.labels)
+                self.labels.append((key, index))
+                alternatives = split_alternatives(pattern)
+                if alternatives == [pattern]:
+                    self.residual.append((signal, re.compile(pattern, flags)))
+                    continue
+                regex_alternatives = []
+                for alternative in alternatives:
+                    if LITERAL_RE.fullmatch(alternative.lower()):
+                        tokens = tuple(WORD_RE.findall(alternative.lower()))
+                        signals = keyword_signals.setdefault(tokens, [])
+                        if signal not in signals:
+                            signals.append(signal)
+                    else:
+                        regex_alternatives.append(alternative)
+                if regex_alternatives:
+                    self.residual.append((signal, re.compile(
+                        f"\\b(?:{'|'.join(regex_alternatives)})\\b", flags
+                    )))
+
+        # Primer token -> [(secuencia completa, señales)]
+        self.keywords: Dict[str, List[Tuple[Tuple[str, ...], Tuple[int, ...]]]] = {}
+        for tokens, signals in keyword_signals.items():
+            self.keywords.setdefault(tokens[0], []).append((tokens, tuple(signals)))
+
+    def scan(self, text: str) -> Dict[Hashable, List[int]]:
+        """
+        Un solo recorrido del texto
+
+        Returns:
+            clave -> conteo de matches por patrón (solo claves con algún match)
+        """
+        counts: Dict[Hashable, List[int]] = {}
+        for signal, count in enumerate(self.scan_signals(text)):
+            if count:
+                key, index = self.labels[signal]
+                if key not in counts:
+                    counts[key] = [0] * len(self.groups[key])
+                counts[key][index] = count
+        return counts
+
+    def scan_batch(self, texts: Iterable[str]) -> np.ndarray:
+        """Matriz (textos x patrones) de conteos; columnas en el orden de self.labels"""
+        rows = [self.scan_signals(text) for text in texts]
+        if not rows:
+            return np.zeros((0, len(self.labels)), dtype=np.int32)
+        return np.array(rows, dtype=np.int32)
+
+    def membership(self, keys: List[Hashable]) -> np.ndarray:
+        """Matriz (patrones x keys): 1 si el patrón pertenece a la key"""
+        columns = {key: i for i, key in enumerate(keys)}
+        matrix = np.zeros((len(self.labels), len(keys)), dtype=np.int32)
+        for signal, (key, _) in enumerate(self.labels):
+            if key in columns:
+                matrix[signal, columns[key]] = 1
+        return matrix
+
+    def scan_signals(self, text: str) -> List[int]:
+        """Conteo de matches por patrón (orden de self.labels)"""
+        hits = [0] * len(self.labels)
+        lower = text.lower()
+
+        matches = list(WORD_RE.finditer(lower))
+        tokens = [m.group() for m in matches]
+        keywords = self.keywords
+        for i, token in enumerate(tokens):
+            candidates = keywords.get(token)
+            if candidates is None:
+                continue
+            for sequence, signals in candidates:
+                if len(sequence) == 1 or (tuple(tokens[i:i + len(sequence)]) == sequence
+                                          and self._single_spaced(lower, matches, i, len(sequence))):
+                    for signal in signals:
+                        hits[signal] += 1
+
+        for signal, regex in self.residual:
+            for _ in regex.finditer(lower):
+                hits[signal] += 1
+        return hits
+
+    @staticmethod
+    def _single_spaced(text: str, matches: List[re.Match], start: int, length: int) -> bool:
+        """Tokens start..start+length separados por un solo espacio (como en la regex)"""
+        for i in range(start, start + length - 1):
+            if text[matches[i].end():matches[i + 1].start()] != " ":
+                return False
+        return True
+
+    def counts(self, text: str) -> Dict[Hashable, int]:
+        """clave -> total de matches"""
+        return {key: sum(per_pattern) for key, per_pattern in self.scan(text).items()}
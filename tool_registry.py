@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Tool Registry v1.0 — Registro único de detección de tools
+Une ToolSelector.PATTERNS y tool_detection_enhanced.TOOL_PATTERNS
+
+- Todos los patrones compilados una vez en un MultiPatternMatcher:
+  un solo scan por request sirve a ToolSelector, detect_tools y al plugin
+- Cada tool trae su propio scoring (ToolDefinition)
+- Hot-loading: definiciones extra desde un JSON (LUMEN_TOOL_DEFINITIONS o
+  tool_definitions.json junto a este archivo), recargado si cambia el mtime
+
+Formato del JSON (mismo que TOOL_PATTERNS):
+    {"kubernetes": {"patterns": ["\\\\bkubectl\\\\b"], "confidence": 0.85,
+                    "keywords": ["cluster", "pod"]}}
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from tool_matcher import MultiPatternMatcher
+
+TOOL_DEFINITIONS_FILE = os.environ.get(
+    "LUMEN_TOOL_DEFINITIONS", str(Path(__file__).parent / "tool_definitions.json")
+)
+
+# Segundos entre chequeos de mtime del archivo de definiciones
+RELOAD_INTERVAL = 2.0
+
+
+@dataclass
+class ToolDefinition:
+    """
+    Una tool detectable y su scoring
+
+    score = confidence (una vez, o por patrón distinto si per_pattern)
+            + keyword_boost si >= min_keywords keywords aparecen en el texto
+    La tool se detecta si score > threshold; el score se limita a max_confidence.
+    """
+    name: str
+    patterns: List[str]
+    confidence: float = 0.8
+    per_pattern: bool = False
+    max_confidence: float = 1.0
+    keywords: List[str] = field(default_factory=list)
+    keyword_boost: float = 0.15
+    min_keywords: int = 2
+    threshold: float = 0.5
+    group: str = "enhanced"
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any], **defaults) -> "ToolDefinition":
+        """Desde el formato de TOOL_PATTERNS / archivo JSON"""
+        known = {f for f in cls.__dataclass_fields__ if f != "name"}
+        unknown = set(config) - known
+        if unknown:
+            raise ValueError(f"Tool '{name}': campos desconocidos {sorted(unknown)}")
+        definition = cls(name=name, **{**defaults, **config})
+        for pattern in definition.patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Tool '{name}': patrón inválido {pattern!r}: {e}") from e
+        return definition
+
+    def score(self, pattern_counts: List[int], text_lower: str) -> float:
+        matched = sum(1 for count in pattern_counts if count)
+        score = self.confidence * (matched if self.per_pattern else min(matched, 1))
+        if self.keywords and sum(1 for kw in self.keywords if kw in text_lower) >= self.min_keywords:
+            score += self.keyword_boost
+        return min(score, self.max_confidence) if score > self.threshold else 0.0
+
+
+class ToolRegistry:
+    """Definiciones de tools + matcher compilado compartido"""
+
+    def __init__(self):
+        self.definitions: Dict[str, ToolDefinition] = {}
+        self.version = 0  # Se incrementa al cambiar las definiciones
+        self._matcher: Optional[MultiPatternMatcher] = None
+        self._lock = threading.RLock()
+        self._watched: Dict[str, Dict[str, Any]] = {}  # path -> {mtime, names, checked}
+
+    # === Definiciones ===
+
+    def register(self, definition: ToolDefinition):
+        """Agregar o reemplazar una tool (sin recompilar si no cambió)"""
+        self.register_many([definition])
+
+    def register_many(self, definitions: Iterable[ToolDefinition]):
+        with self._lock:
+            changed = False
+            for definition in definitions:
+                if self.definitions.get(definition.name) != definition:
+                    self.definitions[definition.name] = definition
+                    changed = True
+            if changed:
+                self._invalidate()
+
+    def unregister(self, name: str):
+        with self._lock:
+            if self.definitions.pop(name, None) is not None:
+                self._invalidate()
+
+    def names(self, group: Optional[str] = None) -> List[str]:
+        return [name for name, d in self.definitions.items() if group is None or d.group == group]
+
+    def _invalidate(self):
+        self._matcher = None
+        self.version += 1
+
+    @property
+    def matcher(self) -> MultiPatternMatcher:
+        """Matcher compilado de todas las definiciones (se recompila tras cambios)"""
+        self.maybe_reload()
+        matcher = self._matcher
+        if matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    self._matcher = MultiPatternMatcher(
+                        {name: d.patterns for name, d in self.definitions.items()}
+                    )
+                matcher = self._matcher
+        return matcher
+
+    # === Hot-loading ===
+
+    def load_file(self, path: str, group: str = "enhanced") -> List[str]:
+        """
+        Cargar definiciones desde JSON; las tools que ya no están en el
+        archivo se eliminan. Con error, las definiciones previas se mantienen.
+
+        Returns:
+            Nombres de las tools del archivo
+        """
+        path = str(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("Se esperaba un objeto {tool: {patterns, ...}}")
+        definitions = [ToolDefinition.from_config(name, config, group=group)
+                       for name, config in data.items()]
+
+        with self._lock:
+            previous = self._watched.get(path, {}).get("names", [])
+            names = [d.name for d in definitions]
+            for name in previous:
+                if name not in names:
+                    self.unregister(name)
+            self.register_many(definitions)
+            self._watched[path] = {"mtime": os.path.getmtime(path), "names": names,
+                                   "checked": time.monotonic(), "group": group}
+        return names
+
+    def watch(self, path: str, group: str = "enhanced"):
+        """Recargar path cuando cambie (chequeo cada RELOAD_INTERVAL segundos)"""
+        with self._lock:
+            self._watched.setdefault(str(path), {"mtime": None, "names": [],
+                                                 "checked": 0.0, "group": group})
+        self.maybe_reload(force=True)
+
+    def maybe_reload(self, force: bool = False):
+        now = time.monotonic()
+        for path, state in list(self._watched.items()):
+            if not force and now - state["checked"] < RELOAD_INTERVAL:
+                continue
+            state["checked"] = now
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if mtime == state["mtime"]:
+                continue
+            if mtime is None:
+                # Archivo eliminado: quitar sus tools
+                with self._lock:
+                    for name in state["names"]:
+                        self.unregister(name)
+                    state.update(mtime=None, names=[])
+                continue
+            try:
+                self.load_file(path, group=state["group"])
+                print(f"🔧 Tool definitions recargadas: {path}")
+            except (OSError, ValueError, TypeError) as e:
+                state["mtime"] = mtime  # No reintentar hasta el próximo cambio
+                print(f"⚠️ Tool definitions inválidas ({path}): {e}")
+
+    # === Scoring ===
+
+    def scan(self, text: str) -> Dict[str, List[int]]:
+        """Un scan del texto: tool -> conteo de matches por patrón"""
+        return self.matcher.scan(text)
+
+    def score(self, text: str, group: Optional[str] = None,
+              signals: Optional[Dict[str, List[int]]] = None) -> Dict[str, float]:
+        """
+        tool -> confianza de las tools detectadas
+
+        Args:
+            signals: resultado de scan(text) ya calculado (evita re-escanear)
+        """
+        if signals is None:
+            signals = self.scan(text)
+        text_lower = text.lower()
+        scores = {}
+        for name, definition in list(self.definitions.items()):
+            if group is not None and definition.group != group:
+                continue
+            counts = signals.get(name)
+            if counts is None and not definition.keywords:
+                continue
+            score = definition.score(counts or [], text_lower)
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def score_batch(self, texts: List[str], names: List[str]) -> np.ndarray:
+        """Scores (textos x names) con operaciones de arrays; 0.0 = no detectada"""
+        texts = list(texts)
+        matcher = self.matcher
+        definitions = [self.definitions[name] for name in names]
+        matched = (matcher.scan_batch(texts) > 0).astype(np.int32) @ matcher.membership(names)
+
+        lowered = [text.lower() for text in texts]
+        keyword_hits = np.zeros((len(texts), len(names)), dtype=np.int32)
+        for j, definition in enumerate(definitions):
+            if definition.keywords:
+                keyword_hits[:, j] = [sum(1 for kw in definition.keywords if kw in text)
+                                      for text in lowered]
+
+        def column(attr: str) -> np.ndarray:
+            return np.array([getattr(d, attr) for d in definitions], dtype=float)
+
+        per_pattern = np.array([d.per_pattern for d in definitions], dtype=bool)
+        has_keywords = np.array([bool(d.keywords) for d in definitions], dtype=bool)
+
+        weight = np.where(per_pattern, matched, np.minimum(matched, 1))
+        scores = weight * column("confidence")
+        scores = scores + np.where(has_keywords & (keyword_hits >= column("min_keywords")),
+                                   column("keyword_boost"), 0.0)
+        return np.where(scores > column("threshold"),
+                        np.minimum(scores, column("max_confidence")), 0.0)
+
+    def to_config(self, group: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Definiciones en formato JSON (para exportar / editar)"""
+        return {
+            name: {k: v for k, v in asdict(d).items() if k != "name"}
+            for name, d in self.definitions.items()
+            if group is None or d.group == group
+        }
+
+
+# Singleton compartido por proceso
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ToolRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ToolRegistry()
+                registry.watch(TOOL_DEFINITIONS_FILE)
+                _registry = registry
+    return _registry
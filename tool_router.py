@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Tool Router v1.0 — Router aprendido de agentes y tools
+Modelo lineal sobre n-gramas hasheados, entrenado offline con NumPy (sin GPU)
+
+- Features: unigramas + bigramas de palabras, hashing con signo (crc32)
+- Un solo W (features x [agentes + tools]): una multiplicación da todos los
+  scores; softmax para el agente, sigmoide por tool
+- Entrenamiento desde logs JSONL de requests y outcomes. Los registros sin
+  agente/tools se etiquetan con el motor de regex (ToolSelector)
+- Si el modelo no existe o no está seguro, ToolSelector usa sus reglas
+- Opt-in (LUMEN_TOOL_ROUTER_ENABLED=1) hasta validarlo contra las reglas:
+  `validate` mide cuánto coincide con rule_based_agent en un log
+
+Formato del log (una línea por request):
+    {"task": "...", "agent": "research", "tools": ["web_search"], "success": true}
+    (también acepta {"title": ..., "body": ...} como requests.jsonl)
+
+Uso:
+    python3 tool_router.py train routing_log.jsonl [--epochs 30]
+    python3 tool_router.py predict "Investiga las últimas noticias de IA"
+    python3 tool_router.py validate routing_log.jsonl
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TOOL_ROUTER_MODEL = os.environ.get(
+    "LUMEN_TOOL_ROUTER", str(Path(__file__).parent / "tool_router_model.npz")
+)
+ROUTING_LOG = os.environ.get(
+    "LUMEN_ROUTING_LOG", str(Path(__file__).parent / "routing_log.jsonl")
+)
+
+# El router solo reemplaza a las reglas si se habilita explícitamente
+TOOL_ROUTER_ENABLED = os.environ.get("LUMEN_TOOL_ROUTER_ENABLED", "0") == "1"
+
+N_FEATURES = 2 ** 14
+WORD_RE = re.compile(r"\w+")
+
+
+def featurize(text: str, n_features: int = N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Features hasheadas de un texto (formato disperso)
+
+    Returns:
+        (índices, valores) con norma L2 = 1
+    """
+    tokens = WORD_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams),
+                         dtype=np.uint32, count=len(grams))
+    indices = (hashes % n_features).astype(np.int64)
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)  # Signo: colisiones se cancelan
+
+    unique, inverse = np.unique(indices, return_inverse=True)
+    values = np.zeros(len(unique), dtype=np.float32)
+    np.add.at(values, inverse, signs)
+    norm = np.linalg.norm(values)
+    return unique, (values / norm if norm > 0 else values)
+
+
+def featurize_batch(texts: List[str], n_features: int = N_FEATURES) -> np.ndarray:
+    """Matriz densa (textos x n_features) — para mini-batches de entrenamiento"""
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    for row, text in enumerate(texts):
+        indices, values = featurize(text, n_features)
+        matrix[row, indices] = values
+    return matrix
+
+
+@dataclass
+class RoutingDecision:
+    """Resultado del router para un texto"""
+    agent: str
+    agent_confidence: float
+    agent_scores: Dict[str, float]
+    tool_scores: Dict[str, float]
+    tools: List[str] = field(default_factory=list)  # Tools con probabilidad >= 0.5
+
+
+class ToolRouter:
+    """
+    Router lineal: logits = x @ W + b
+
+    Columnas de W: agents (softmax) seguidas de tools (sigmoide independiente).
+    """
+
+    def __init__(self, agents: List[str], tools: List[str], n_features: int = N_FEATURES,
+                 min_confidence: float = 0.6):
+        self.agents = list(agents)
+        self.tools = list(tools)
+        self.n_features = n_features
+        self.min_confidence = min_confidence
+        self.W = np.zeros((n_features, len(self.agents) + len(self.tools)), dtype=np.float32)
+        self.b = np.zeros(len(self.agents) + len(self.tools), dtype=np.float32)
+
+    # === Inferencia ===
+
+    def predict(self, text: str) -> RoutingDecision:
+        """Scores de todos los agentes y tools en un solo producto"""
+        indices, values = featurize(text, self.n_features)
+        logits = values @ self.W[indices] + self.b
+        return self._decision(logits)
+
+    def route(self, text: str) -> Optional[RoutingDecision]:
+        """predict() si el agente supera min_confidence; None = usar reglas"""
+        if len(self.agents) < 2:
+            return None  # Con una sola clase la confianza es siempre 1.0
+        decision = self.predict(text)
+        return decision if decision.agent_confidence >= self.min_confidence else None
+
+    def _decision(self, logits: np.ndarray) -> RoutingDecision:
+        n_agents = len(self.agents)
+        agent_probs = _softmax(logits[:n_agents])
+        tool_probs = _sigmoid(logits[n_agents:])
+        best = int(np.argmax(agent_probs))
+        tool_scores = {tool: float(p) for tool, p in zip(self.tools, tool_probs)}
+        return RoutingDecision(
+            agent=self.agents[best],
+            agent_confidence=float(agent_probs[best]),
+            agent_scores={agent: float(p) for agent, p in zip(self.agents, agent_probs)},
+            tool_scores=tool_scores,
+            tools=[tool for tool, p in sorted(tool_scores.items(), key=lambda x: -x[1]) if p >= 0.5]
+        )
+
+    # === Entrenamiento ===
+
+    def fit(self, texts: List[str], agents: List[str], tools: List[List[str]],
+            weights: Optional[List[float]] = None, epochs: int = 30, lr: float = 5.0,
+            l2: float = 1e-5, batch_size: int = 256, seed: int = 0) -> List[float]:
+        """
+        Descenso por gradiente en mini-batches (softmax + BCE)
+
+        Returns:
+            Loss promedio por época
+
+        Raises:
+            ValueError: menos de dos agentes distintos en las etiquetas
+        """
+        if len(self.agents) < 2 or len(set(agents)) < 2:
+            raise ValueError(f"Se necesitan al menos dos agentes para entrenar "
+                             f"(etiquetas: {sorted(set(agents))})")
+        n = len(texts)
+        n_agents = len(self.agents)
+        agent_index = {a: i for i, a in enumerate(self.agents)}
+        tool_index = {t: i for i, t in enumerate(self.tools)}
+
+        y_agent = np.zeros((n, n_agents), dtype=np.float32)
+        y_tools = np.zeros((n, len(self.tools)), dtype=np.float32)
+        for i, (agent, labels) in enumerate(zip(agents, tools)):
+            y_agent[i, agent_index[agent]] = 1.0
+            for tool in labels:
+                if tool in tool_index:
+                    y_tools[i, tool_index[tool]] = 1.0
+        sample_weight = np.asarray(weights if weights is not None else np.ones(n), dtype=np.float32)
+
+        rng = np.random.default_rng(seed)
+        losses = []
+        for _ in range(epochs):
+            order = rng.permutation(n)
+            epoch_loss = 0.0
+            for start in range(0, n, batch_size):
+                batch = order[start:start + batch_size]
+                X = featurize_batch([texts[i] for i in batch], self.n_features)
+                w = sample_weight[batch][:, None]
+                logits = X @ self.W + self.b
+
+                p_agent = _softmax(logits[:, :n_agents])
+                p_tools = _sigmoid(logits[:, n_agents:])
+                grad = np.concatenate([p_agent - y_agent[batch], p_tools - y_tools[batch]], axis=1) * w
+                grad /= max(float(w.sum()), 1e-9)
+
+                self.W -= lr * (X.T @ grad + l2 * self.W)
+                self.b -= lr * grad.sum(axis=0)
+
+                eps = 1e-7
+                epoch_loss += float(-(w * (
+                    (y_agent[batch] * np.log(p_agent + eps)).sum(axis=1, keepdims=True)
+                    + (y_tools[batch] * np.log(p_tools + eps)
+                       + (1 - y_tools[batch]) * np.log(1 - p_tools + eps)).sum(axis=1, keepdims=True)
+                )).sum())
+            losses.append(epoch_loss / max(float(sample_weight.sum()), 1e-9))
+        return losses
+
+    # === Persistencia ===
+
+    def save(self, path: str = TOOL_ROUTER_MODEL):
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, W=self.W, b=self.b, agents=np.array(self.agents),
+                            tools=np.array(self.tools), n_features=self.n_features,
+                            min_confidence=self.min_confidence)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = TOOL_ROUTER_MODEL) -> "ToolRouter":
+        with np.load(path) as data:
+            router = cls(agents=[str(a) for a in data["agents"]],
+                         tools=[str(t) for t in data["tools"]],
+                         n_features=int(data["n_features"]),
+                         min_confidence=float(data["min_confidence"]))
+            router.W = data["W"].astype(np.float32)
+            router.b = data["b"].astype(np.float32)
+        return router
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+def _sigmoid(logits: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+
+
+# === Logs de routing ===
+
+_log_lock = threading.Lock()
+
+
+def log_routing_outcome(task: str, agent: str, tools: List[str], success: bool = True,
+                        latency_s: Optional[float] = None, path: str = ROUTING_LOG, **extra):
+    """Agregar un request y su outcome al log de entrenamiento"""
+    record = {"task": task, "agent": agent, "tools": tools, "success": success,
+              "latency_s": latency_s, "timestamp": time.time(), **extra}
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_training_records(path: str) -> List[Dict[str, Any]]:
+    """Registros {task, agent?, tools?, success?, weight?} de un JSONL"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            text = record.get("task") or " ".join(
+                str(record.get(k, "")) for k in ("title", "body")
+            ).strip()
+            if text:
+                records.append({**record, "task": text})
+    return records
+
+
+def train_router(records: Iterable[Dict[str, Any]], epochs: int = 30,
+                 n_features: int = N_FEATURES) -> ToolRouter:
+    """
+    Entrenar un ToolRouter desde registros de log
+
+    - success=False: el registro no se usa (el agente elegido no sirvió)
+    - Sin agent/tools: etiquetas del motor de regex (destilación de las reglas)
+    """
+    from coordinator_tool_selector import ToolCategory, ToolSelector
+
+    selector = ToolSelector(use_router=False)
+    texts, agents, tools, weights = [], [], [], []
+    for record in records:
+        if record.get("success") is False:
+            continue
+        agent, labels = record.get("agent"), record.get("tools")
+        if agent is None or labels is None:
+            profile = selector.classify_task(record["task"])
+            agent = agent or selector.rule_based_agent(profile)[0]
+            labels = labels if labels is not None else [t.tool.value for t in profile.tools]
+        texts.append(record["task"])
+        agents.append(agent)
+        tools.append(labels)
+        weights.append(float(record.get("weight", 1.0)))
+
+    if not texts:
+        raise ValueError("No hay registros de entrenamiento")
+
+    agent_names = sorted(set(agents))
+    tool_names = [t.value for t in ToolCategory] + sorted(
+        {t for labels in tools for t in labels} - {t.value for t in ToolCategory}
+    )
+    router = ToolRouter(agent_names, tool_names, n_features=n_features)
+    losses = router.fit(texts, agents, tools, weights=weights, epochs=epochs)
+    print(f"✅ Router entrenado: {len(texts)} ejemplos, {len(agent_names)} agentes, "
+          f"loss {losses[0]:.3f} -> {losses[-1]:.3f}")
+    return router
+
+
+def validate_router(router: ToolRouter, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Comparar el router con rule_based_agent sobre registros de log
+
+    Returns:
+        {examples, routed (superan min_confidence), agreement (coincidencia
+        con las reglas entre los routed), coverage}
+    """
+    from coordinator_tool_selector import ToolSelector
+
+    selector = ToolSelector(use_router=False)
+    examples = routed = agree = 0
+    for record in records:
+        examples += 1
+        decision = router.route(record["task"])
+        if decision is None:
+            continue
+        routed += 1
+        rule_agent = selector.rule_based_agent(selector.classify_task(record["task"]))[0]
+        agree += decision.agent == rule_agent
+    return {
+        "examples": examples,
+        "routed": routed,
+        "agreement": agree / routed if routed else 0.0,
+        "coverage": routed / examples if examples else 0.0,
+    }
+
+
+# Router por path, cargado una vez por proceso (None si no hay modelo)
+_routers: Dict[str, Optional[ToolRouter]] = {}
+
+
+def load_router(path: str = TOOL_ROUTER_MODEL) -> Optional[ToolRouter]:
+    if path not in _routers:
+        try:
+            _routers[path] = ToolRouter.load(path)
+        except (OSError, KeyError, ValueError):
+            _routers[path] = None
+    return _routers[path]
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).parent))
+    if len(sys.argv) >= 3 and sys.argv[1] == "train":
+        epochs = int(sys.argv[sys.argv.index("--epochs") + 1]) if "--epochs" in sys.argv else 30
+        router = train_router(load_training_records(sys.argv[2]), epochs=epochs)
+        router.save()
+        print(f"💾 Modelo: {TOOL_ROUTER_MODEL}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "predict":
+        router = load_router()
+        if router is None:
+            print(f"⚠️ Sin modelo en {TOOL_ROUTER_MODEL} (entrenar primero)")
+        else:
+            decision = router.predict(" ".join(sys.argv[2:]))
+            print(f"🤖 {decision.agent} (p={decision.agent_confidence:.2f})")
+            print(f"🔧 {decision.tools}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "validate":
+        router = load_router()
+        if router is None:
+            print(f"⚠️ Sin modelo en {TOOL_ROUTER_MODEL} (entrenar primero)")
+        else:
+            report = validate_router(router, load_training_records(sys.argv[2]))
+            print(f"📊 {report['routed']}/{report['examples']} routeados "
+                  f"(cobertura {report['coverage']:.0%}), "
+                  f"coincidencia con reglas {report['agreement']:.0%}")
+    else:
+        print("Usage:")
+        print("  python3 tool_router.py train <log.jsonl> [--epochs N]")
+        print("  python3 tool_router.py predict <texto>")
+        print("  python3 tool_router.py validate <log.jsonl>")
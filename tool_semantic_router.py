@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Semantic Tool Router v1.0 — Routing por embeddings
+Mismo modelo nomic que LumenMemory: el embedding del request se calcula una
+vez y sirve para el routing y para el RAG que viene después
+
+- Prototipos: frases de ejemplo (español + inglés) por tool y por agente,
+  embebidas una sola vez en el primer uso (un encode en batch)
+- route(embedding): similitud coseno contra los prototipos -> máximo por clase
+- Sin regex: paráfrasis y prompts mezclados ES/EN caen en la misma clase
+
+Los embeddings se calculan igual que LumenMemory.embed_query (sin prefijo),
+así el vector es intercambiable con search_skills/rag_query(query_embedding=...).
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from memory_embedder import DEFAULT_MODEL, get_embedder
+
+# Frases prototipo por tool (claves = ToolCategory.value)
+TOOL_PROTOTYPES: Dict[str, List[str]] = {
+    "web_search": [
+        "busca información actualizada en internet",
+        "investiga las últimas noticias sobre este tema",
+        "search the web for recent news",
+        "look up what this is and how it works",
+    ],
+    "web_fetch": [
+        "extrae el contenido de esta página web",
+        "lee este artículo y resúmelo",
+        "fetch the content of this url",
+        "scrape the documentation page",
+    ],
+    "file_read": [
+        "lee el archivo de configuración y dime qué dice",
+        "muestra el contenido de este archivo",
+        "read this file and explain it",
+        "open the log file and check the errors",
+    ],
+    "file_write": [
+        "guarda el resultado en un archivo nuevo",
+        "crea un archivo de configuración",
+        "write the output to a file",
+        "save this module to disk",
+    ],
+    "code_exec": [
+        "escribe y ejecuta un script de python",
+        "corre los tests y arregla el código",
+        "write a python script and run it",
+        "implement an api endpoint with fastapi",
+    ],
+    "browser": [
+        "automatiza el login en la página web",
+        "haz click en el formulario y toma un screenshot",
+        "automate this web form in the browser",
+        "navigate the site and test the ui",
+    ],
+    "github": [
+        "haz commit y push de los cambios al repositorio",
+        "crea un pull request en github",
+        "commit and push to the git branch",
+        "open a pr on the repo",
+    ],
+    "telegram": [
+        "envía un mensaje por telegram",
+        "notifícame cuando termine",
+        "send me a telegram notification",
+        "broadcast this message to the channel",
+    ],
+    "image": [
+        "genera una imagen de un paisaje",
+        "dibuja un diagrama de la arquitectura",
+        "create an image with flux",
+        "generate a picture for the post",
+    ],
+    "tts": [
+        "lee esto en voz alta",
+        "convierte el texto a audio",
+        "text to speech for this paragraph",
+        "narrate this story with a voice",
+    ],
+    "gpu_compute": [
+        "entrena el modelo con la gpu",
+        "haz fine tuning de un modelo grande",
+        "train a model with cuda",
+        "heavy batch processing and video editing",
+    ],
+}
+
+# Frases prototipo por agente (ids de ToolSelector.recommend_agent)
+AGENT_PROTOTYPES: Dict[str, List[str]] = {
+    "main": [
+        "coordina varias tareas y decide qué hacer",
+        "automatiza la interfaz web paso a paso",
+        "help me plan and organize this project",
+        "this is ambiguous, figure out the best approach",
+    ],
+    "research": [
+        "investiga a fondo y resume los hallazgos",
+        "compara las alternativas y dame un informe",
+        "research this topic and summarize the findings",
+        "what are the latest trends in this field",
+    ],
+    "build-qwen32": [
+        "implementa el script y ejecútalo",
+        "arregla este bug en el código python",
+        "write the code and run the tests",
+        "build and deploy the service",
+    ],
+    "create-qwen32": [
+        "genera una imagen creativa",
+        "escribe un post creativo para redes",
+        "create an illustration for the article",
+        "design a visual for the presentation",
+    ],
+}
+
+
+@dataclass
+class SemanticDecision:
+    """Similitudes de un request contra los prototipos"""
+    agent_scores: Dict[str, float] = field(default_factory=dict)
+    tool_scores: Dict[str, float] = field(default_factory=dict)
+
+
+class SemanticRouter:
+    """
+    Router por similitud de embeddings contra prototipos
+
+    Args:
+        embedder: objeto con encode() (por defecto get_embedder(model_name))
+        tool_threshold: similitud mínima para detectar una tool
+        tool_margin: distancia máxima a la tool más similar (descarta el "ruido
+            de fondo" de similitud entre frases no relacionadas)
+        agent_threshold: similitud mínima para elegir agente
+        agent_margin: ventaja mínima del mejor agente sobre el segundo
+    """
+
+    def __init__(self, embedder=None, model_name: str = DEFAULT_MODEL,
+                 tool_prototypes: Optional[Dict[str, List[str]]] = None,
+                 agent_prototypes: Optional[Dict[str, List[str]]] = None,
+                 tool_threshold: float = 0.6, tool_margin: float = 0.1,
+                 agent_threshold: float = 0.55, agent_margin: float = 0.03):
+        self.embedder = embedder or get_embedder(model_name)
+        self.tool_prototypes = tool_prototypes or TOOL_PROTOTYPES
+        self.agent_prototypes = agent_prototypes or AGENT_PROTOTYPES
+        self.tool_threshold = tool_threshold
+        self.tool_margin = tool_margin
+        self.agent_threshold = agent_threshold
+        self.agent_margin = agent_margin
+
+        # Matriz de prototipos (filas normalizadas), se calcula en el primer route()
+        self._matrix: Optional[np.ndarray] = None
+        self._labels: List[Tuple[str, str]] = []  # fila -> ("tool"|"agent", nombre)
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> List[float]:
+        """Embedding del request (mismo formato que LumenMemory.embed_query)"""
+        return self.embedder.encode(text, convert_to_numpy=True).tolist()
+
+    def _prototypes(self) -> np.ndarray:
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None:
+                    labels, texts = [], []
+                    for kind, prototypes in (("tool", self.tool_prototypes),
+                                             ("agent", self.agent_prototypes)):
+                        for name, phrases in prototypes.items():
+                            for phrase in phrases:
+                                labels.append((kind, name))
+                                texts.append(phrase)
+                    matrix = np.asarray(self.embedder.encode(texts, convert_to_numpy=True),
+                                        dtype=np.float32)
+                    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                    self._labels = labels
+                    self._matrix = matrix / np.where(norms > 0, norms, 1.0)
+        return self._matrix
+
+    def route(self, embedding) -> SemanticDecision:
+        """Similitud máxima por tool y por agente"""
+        matrix = self._prototypes()
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        similarities = matrix @ (query / norm if norm > 0 else query)
+
+        decision = SemanticDecision()
+        for (kind, name), similarity in zip(self._labels, similarities.tolist()):
+            scores = decision.tool_scores if kind == "tool" else decision.agent_scores
+            if similarity > scores.get(name, -1.0):
+                scores[name] = similarity
+        return decision
+
+    def detected_tools(self, tool_scores: Dict[str, float]) -> Dict[str, float]:
+        """tool -> confianza (0.3-0.95) de las tools sobre tool_threshold y cerca de la mejor"""
+        if not tool_scores:
+            return {}
+        floor = max(self.tool_threshold, max(tool_scores.values()) - self.tool_margin)
+        span = max(1.0 - self.tool_threshold, 1e-6)
+        return {
+            name: min(0.95, 0.3 + 0.65 * (similarity - self.tool_threshold) / span)
+            for name, similarity in tool_scores.items()
+            if similarity >= floor
+        }
+
+    def pick_agent(self, agent_scores: Dict[str, float]) -> Optional[Tuple[str, float]]:
+        """(agente, similitud) si el mejor es claro; None para caer a las reglas"""
+        if not agent_scores:
+            return None
+        ranked = sorted(agent_scores.items(), key=lambda x: -x[1])
+        agent, best = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else -1.0
+        if best < self.agent_threshold or best - second < self.agent_margin:
+            return None
+        return agent, best